@@ -1,3 +1,32 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ProviderSyncRun
+
+
+@admin.register(ProviderSyncRun)
+class ProviderSyncRunAdmin(admin.ModelAdmin):
+    """
+    Read only admin of the provider sync runs
+    """
+    list_display = (
+        'provider',
+        'started',
+        'duration',
+        'records_parsed',
+        'created',
+        'updated',
+        'invalid',
+        'error',
+    )
+    list_filter = ('provider', 'not_modified')
+    list_select_related = ('provider',)
+    date_hierarchy = 'started'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,179 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .services import check_date, check_expand
+
+EVENTS_GENERATION_KEY = 'events:generation'
+EVENTS_DATE_PARAMS = ('start_date', 'end_date', 'date_from', 'date_to')
+EVENTS_STAMP_KEY = 'events:stamp'
+EVENTS_AVAILABILITY_KEY = 'events:availability'
+EVENTS_AVAILABILITY_PARAMS = ('min_price', 'max_price', 'available')
+EVENT_STAMP_KEY = 'events:event:{}'
+# Query params of the events list, the ones of EventFilter and of the
+# view, the pagination and the format negotiation. Other params, like
+# cache busters, do not change the list and are left out of the key
+EVENTS_LIST_PARAMS = frozenset((
+    'start_date', 'end_date', 'date_from', 'date_to', 'min_price',
+    'max_price', 'available', 'provider', 'numbered', 'q', 'expand',
+    'cursor', 'page_size', 'format'
+))
+
+
+def get_events_generation():
+    """
+    Get the generation of the cached events lists, a new generation
+    starts from the current time so it never reuses evicted generations
+
+    :return: Generation of the events lists
+    :type return: int
+    """
+    generation = cache.get(EVENTS_GENERATION_KEY)
+    if generation is None:
+        cache.add(EVENTS_GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(EVENTS_GENERATION_KEY, 0)
+    return generation
+
+
+def bump_events_generation():
+    """
+    Invalidate every cached events list moving to a new generation
+    """
+    try:
+        cache.incr(EVENTS_GENERATION_KEY)
+    except ValueError:
+        cache.set(EVENTS_GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def get_events_stamp():
+    """
+    Get the stamp of the last events touched by availability deltas, the
+    lists cached from now on include every delta up to this stamp
+
+    :return: Stamp of the events lists
+    :type return: int
+    """
+    stamp = cache.get(EVENTS_STAMP_KEY)
+    if stamp is None:
+        cache.add(EVENTS_STAMP_KEY, int(time.time() * 1000), None)
+        stamp = cache.get(EVENTS_STAMP_KEY, 0)
+    return stamp
+
+
+def touch_events(event_ids):
+    """
+    Invalidate only the cached events lists with any of the events, and
+    the lists filtered by availability whose events may change. The
+    events are stamped for as long as the lists are cached
+
+    :param event_ids: Ids of the events whose availability changed
+    :type event_ids: iterable
+    """
+    try:
+        stamp = cache.incr(EVENTS_STAMP_KEY)
+    except ValueError:
+        stamp = int(time.time() * 1000)
+        cache.set(EVENTS_STAMP_KEY, stamp, None)
+    stamps = {
+        EVENT_STAMP_KEY.format(event_id): stamp
+        for event_id in event_ids
+    }
+    stamps[EVENTS_AVAILABILITY_KEY] = stamp
+    cache.set_many(stamps, settings.CACHE_DEFAULT_TIME)
+
+
+def get_cached_events(key, query_params):
+    """
+    Get a cached events list unless any of its events, or the availability
+    of the events when the list filters by it, was touched after the list
+    was cached
+
+    :param key: Cache key of the list
+    :type key: str
+    :param query_params: Query params of the request
+    :type query_params: django.http.QueryDict
+    :return: Cached data of the list, None when it is missing or stale
+    :type return: object
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    stamp, event_ids, data = entry
+    keys = [EVENT_STAMP_KEY.format(event_id) for event_id in event_ids]
+    if any(query_params.get(name) for name in EVENTS_AVAILABILITY_PARAMS):
+        keys.append(EVENTS_AVAILABILITY_KEY)
+    if keys and any(
+        touched > stamp for touched in cache.get_many(keys).values()
+    ):
+        return None
+    return data
+
+
+def set_cached_events(key, stamp, event_ids, data):
+    """
+    Cache an events list with the stamp taken before it was queried and
+    the ids of its events
+
+    :param key: Cache key of the list
+    :type key: str
+    :param stamp: Stamp of the events lists before the query
+    :type stamp: int
+    :param event_ids: Ids of the events of the list
+    :type event_ids: list
+    :param data: Data of the list
+    :type data: object
+    """
+    cache.set(key, (stamp, event_ids, data), settings.CACHE_DEFAULT_TIME)
+
+
+def normalize_query_params(query_params):
+    """
+    Normalize the query params of an events list so equivalent requests
+    share the cache entry, dates, expanded relations and searches are
+    formatted, invalid ones and the params unknown to the list ignored
+
+    :param query_params: Query params of the request
+    :type query_params: django.http.QueryDict
+    :return: Sorted and encoded query params
+    :type return: str
+    """
+    params = []
+    for name in sorted(EVENTS_LIST_PARAMS.intersection(query_params)):
+        value = query_params.get(name)
+        if name in EVENTS_DATE_PARAMS:
+            value = check_date(value)
+            value = value.isoformat() if value else None
+        elif name == 'expand':
+            value = ','.join(sorted(check_expand(value)))
+        elif name == 'q':
+            value = ' '.join(value.split())
+        if value:
+            params.append((name, value))
+    return urlencode(params)
+
+
+def get_events_cache_key(query_params, data=False):
+    """
+    Get the cache key of an events list in the current generation, the
+    rendered JSON content and the data of the serializer of a list are
+    cached under different keys
+
+    :param query_params: Query params of the request
+    :type query_params: django.http.QueryDict
+    :param data: Whether the key is of the data instead of the content
+    :type data: bool
+    :return: Cache key
+    :type return: str
+    """
+    params_hash = hashlib.md5(
+        normalize_query_params(query_params).encode('utf-8')
+    ).hexdigest()
+    return 'events:{}:{}{}'.format(
+        get_events_generation(),
+        params_hash,
+        ':data' if data else ''
+    )
@@ -0,0 +1,97 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_provider_client = None
+
+
+class ProviderClient(object):
+    """
+    HTTP client to get the provider resources, connections are kept alive
+    in a pool per host that also bounds the concurrent requests to a host
+    """
+
+    def __init__(self):
+        self.timeout = (
+            settings.INGEST_CONNECT_TIMEOUT,
+            settings.INGEST_READ_TIMEOUT
+        )
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+        adapter = HTTPAdapter(
+            pool_connections=settings.INGEST_POOL_HOSTS,
+            pool_maxsize=settings.INGEST_MAX_CONNECTIONS_PER_HOST,
+            pool_block=True,
+            max_retries=Retry(
+                total=settings.INGEST_RETRIES,
+                backoff_factor=settings.INGEST_RETRY_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                raise_on_status=False
+            )
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None):
+        """
+        Request a resource to stream its content
+
+        :param url: Url of the resource
+        :type url: str
+        :param headers: Extra request headers
+        :type headers: dict
+        :return: Response with the content not consumed yet
+        :type return: requests.Response
+        """
+        return self.session.get(
+            url,
+            headers=headers,
+            stream=True,
+            timeout=self.timeout
+        )
+
+    def close(self):
+        """
+        Close the pooled connections
+        """
+        self.session.close()
+
+
+def iter_response_chunks(response):
+    """
+    Iterate the content of a streamed response in chunks, the response is
+    closed when the iteration ends or it is abandoned so its connection
+    goes back to the pool
+
+    :param response: Streamed response
+    :type response: requests.Response
+    :return: Bytes chunks of the content
+    :type return: generator
+    """
+    try:
+        for chunk in response.iter_content(
+            chunk_size=settings.INGEST_CHUNK_SIZE
+        ):
+            yield chunk
+    finally:
+        response.close()
+
+
+def get_provider_client():
+    """
+    Get the provider client of the process, it is created on first use so
+    every worker process has its own connection pools
+
+    :return: Provider client
+    :type return: event.clients.ProviderClient
+    """
+    global _provider_client
+    if _provider_client is None:
+        _provider_client = ProviderClient()
+    return _provider_client
@@ -1,2 +1,6 @@
 class ProviderURLException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class ProviderLockedException(Exception):
+    pass
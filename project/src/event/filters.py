@@ -0,0 +1,139 @@
+from datetime import timedelta
+from django_filters import rest_framework as filters
+
+from django import forms
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity
+)
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+from .models import Event, EventDate, ProviderSyncRun, Zone
+from .services import check_date, day_start
+
+
+class DayFilter(filters.Filter):
+    """
+    Filter a datetime field by a day in the check_date format, invalid
+    days are ignored and upper bounds include the whole day
+    """
+    field_class = forms.CharField
+
+    def filter(self, qs, value):
+        day = check_date(value)
+        if day is None:
+            return qs
+        if self.lookup_expr == 'lt':
+            day += timedelta(days=1)
+        return qs.filter(**{
+            '{}__{}'.format(self.field_name, self.lookup_expr): day_start(day)
+        })
+
+
+class EventFilter(filters.FilterSet):
+    """
+    Filters of the events list, every filter runs on an indexed or
+    precomputed column. The event dates filters are merged in a single
+    subquery so the same date has to match all of them
+    """
+    start_date = DayFilter(field_name='sale_start_date', lookup_expr='gte')
+    end_date = DayFilter(field_name='sale_end_date', lookup_expr='lt')
+    date_from = DayFilter(field_name='date', lookup_expr='gte')
+    date_to = DayFilter(field_name='date', lookup_expr='lt')
+    min_price = filters.NumberFilter(field_name='max_price', lookup_expr='gte')
+    max_price = filters.NumberFilter(field_name='min_price', lookup_expr='lte')
+    available = filters.BooleanFilter(method='filter_available')
+    provider = filters.UUIDFilter(field_name='provider__uuid')
+    numbered = filters.BooleanFilter(field_name='numbered')
+    q = filters.CharFilter(method='filter_search')
+
+    DATE_FILTERS = ('start_date', 'end_date', 'date_from', 'date_to')
+
+    class Meta:
+        model = Event
+        fields = ()
+
+    def filter_available(self, queryset, name, value):
+        """
+        Filter the events with tickets left, or the sold out ones
+        """
+        if value:
+            return queryset.filter(rest__gt=0)
+        return queryset.filter(rest=0)
+
+    def filter_search(self, queryset, name, value):
+        """
+        Search the events by title and zone names annotating their rank.
+        Postgres matches the stored search vectors and the title trigrams
+        to allow typos, other databases fall back to substring matches
+        """
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(value, config=settings.EVENTS_SEARCH_CONFIG)
+            return queryset.filter(
+                Q(search_vector=query) | Q(title__trigram_similar=value)
+            ).annotate(
+                rank=SearchRank(F('search_vector'), query) +
+                TrigramSimilarity('title', value)
+            )
+
+        zones = Zone.objects.filter(
+            active=True,
+            date__active=True,
+            name__icontains=value
+        )
+        return queryset.filter(
+            Q(title__icontains=value) |
+            Q(id__in=zones.values('date__event_id'))
+        ).annotate(rank=Case(
+            When(title__icontains=value, then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField()
+        ))
+
+    def filter_dates(self, queryset):
+        """
+        Filter the event dates by the date filters
+
+        :param queryset: Event dates to filter
+        :type queryset: django.db.models.QuerySet
+        :return: Filtered event dates
+        :type return: django.db.models.QuerySet
+        """
+        for name in self.DATE_FILTERS:
+            queryset = self.filters[name].filter(
+                queryset,
+                self.form.cleaned_data.get(name)
+            )
+        return queryset
+
+    def filter_queryset(self, queryset):
+        event_dates = self.filter_dates(EventDate.objects.filter(active=True))
+        queryset = queryset.filter(id__in=event_dates.values('event_id'))
+
+        for name, value in self.form.cleaned_data.items():
+            if name not in self.DATE_FILTERS:
+                queryset = self.filters[name].filter(queryset, value)
+        return queryset
+
+
+class ProviderSyncRunFilter(filters.FilterSet):
+    """
+    Filters of the provider sync runs list
+    """
+    provider = filters.UUIDFilter(field_name='provider__uuid')
+    date_from = DayFilter(field_name='started', lookup_expr='gte')
+    date_to = DayFilter(field_name='started', lookup_expr='lt')
+    failed = filters.BooleanFilter(method='filter_failed')
+
+    class Meta:
+        model = ProviderSyncRun
+        fields = ()
+
+    def filter_failed(self, queryset, name, value):
+        """
+        Filter the failed sync runs, or the ended ones
+        """
+        if value:
+            return queryset.exclude(error='')
+        return queryset.filter(error='')
@@ -0,0 +1,601 @@
+import io
+import uuid
+from datetime import datetime
+
+from .schemas import PARENT
+from .services import fingerprint
+
+COPY_NULL = '\\N'
+
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r'
+})
+
+DATE_FIELDS = ['date', 'sale_start_date', 'sale_end_date', 'active']
+ZONE_FIELDS = ['name', 'capacity', 'rest', 'price', 'numbered', 'active']
+
+# Staging tables by name with their columns, rows link to the row of
+# their parent in the staging table above and to the merged rows ids
+STAGING_TABLES = (
+    (
+        'stage_event',
+        (
+            ('stage_row', 'integer'),
+            ('uuid', 'uuid'),
+            ('provider_event_id', 'integer'),
+            ('title', 'text'),
+            ('active', 'boolean'),
+            ('fingerprint', 'varchar(32)'),
+        ),
+        ('event_id', 'integer')
+    ),
+    (
+        'stage_date',
+        (
+            ('stage_row', 'integer'),
+            ('parent_row', 'integer'),
+            ('uuid', 'uuid'),
+            ('provider_date_id', 'integer'),
+            ('date', 'timestamp with time zone'),
+            ('sale_start_date', 'timestamp with time zone'),
+            ('sale_end_date', 'timestamp with time zone'),
+            ('active', 'boolean'),
+            ('fingerprint', 'varchar(32)'),
+        ),
+        ('event_id', 'integer')
+    ),
+    (
+        'stage_zone',
+        (
+            ('stage_row', 'integer'),
+            ('parent_row', 'integer'),
+            ('uuid', 'uuid'),
+            ('provider_zone_id', 'integer'),
+            ('name', 'text'),
+            ('capacity', 'integer'),
+            ('rest', 'integer'),
+            ('price', 'numeric(5, 2)'),
+            ('numbered', 'boolean'),
+            ('active', 'boolean'),
+            ('fingerprint', 'varchar(32)'),
+        ),
+        ('date_id', 'integer')
+    ),
+)
+
+STAGING_INDEXES = (
+    'CREATE INDEX ON stage_event (provider_event_id)',
+    'CREATE INDEX ON stage_event (stage_row)',
+    'CREATE INDEX ON stage_date (stage_row)',
+)
+
+# Transaction advisory lock of the syncs of a provider, keyed in the
+# namespace of the ingest
+LOCK_NAMESPACE = 0x45564e54
+LOCK_PROVIDER = 'SELECT pg_try_advisory_xact_lock(%(namespace)s, %(provider)s)'
+
+# Every merge step runs with the provider id and the current time, the
+# rows written or deactivated are returned to refresh their parents. The
+# rows are created on the unique natural keys, so the rows updated before
+# and the unchanged ones are left as they are
+MERGE_EVENTS = (
+    ('updated', """
+        UPDATE event_event AS target SET
+            title = stage.title,
+            active = stage.active,
+            fingerprint = stage.fingerprint,
+            updated = %(now)s
+        FROM (
+            SELECT DISTINCT ON (provider_event_id) * FROM stage_event
+            ORDER BY provider_event_id, stage_row DESC
+        ) AS stage
+        WHERE target.provider_id = %(provider)s
+            AND target.provider_event_id = stage.provider_event_id
+            AND target.fingerprint <> stage.fingerprint
+        RETURNING target.id
+    """),
+    ('created', """
+        INSERT INTO event_event (
+            uuid, created, updated, title, active, provider_id,
+            provider_event_id, fingerprint, capacity, rest, sold_out,
+            numbered
+        )
+        SELECT DISTINCT ON (stage.provider_event_id)
+            stage.uuid, %(now)s, %(now)s, stage.title, stage.active,
+            %(provider)s, stage.provider_event_id, stage.fingerprint,
+            0, 0, false, false
+        FROM stage_event AS stage
+        ORDER BY stage.provider_event_id, stage.stage_row DESC
+        ON CONFLICT (provider_id, provider_event_id) DO NOTHING
+        RETURNING id
+    """),
+    ('deactivated', """
+        UPDATE event_event AS target SET
+            active = false,
+            fingerprint = '',
+            updated = %(now)s
+        WHERE target.provider_id = %(provider)s
+            AND target.active
+            AND NOT EXISTS (
+                SELECT 1 FROM stage_event AS stage
+                WHERE stage.provider_event_id = target.provider_event_id
+            )
+        RETURNING NULL
+    """),
+)
+
+LINK_EVENTS = """
+    UPDATE stage_event AS stage SET event_id = target.id
+    FROM event_event AS target
+    WHERE target.provider_id = %(provider)s
+        AND target.provider_event_id = stage.provider_event_id;
+    UPDATE stage_date AS stage SET event_id = parent.event_id
+    FROM stage_event AS parent
+    WHERE parent.stage_row = stage.parent_row;
+    CREATE INDEX ON stage_date (event_id, provider_date_id);
+    ANALYZE stage_date
+"""
+
+MERGE_DATES = (
+    ('updated', """
+        UPDATE event_eventdate AS target SET
+            date = stage.date,
+            sale_start_date = stage.sale_start_date,
+            sale_end_date = stage.sale_end_date,
+            active = stage.active,
+            fingerprint = stage.fingerprint,
+            updated = %(now)s
+        FROM (
+            SELECT DISTINCT ON (event_id, provider_date_id) * FROM stage_date
+            ORDER BY event_id, provider_date_id, stage_row DESC
+        ) AS stage
+        WHERE target.event_id = stage.event_id
+            AND target.provider_date_id = stage.provider_date_id
+            AND target.fingerprint <> stage.fingerprint
+        RETURNING target.event_id
+    """),
+    ('created', """
+        INSERT INTO event_eventdate (
+            uuid, created, updated, date, sale_start_date, sale_end_date,
+            active, event_id, provider_date_id, fingerprint, capacity,
+            rest, sold_out, numbered
+        )
+        SELECT DISTINCT ON (stage.event_id, stage.provider_date_id)
+            stage.uuid, %(now)s, %(now)s, stage.date,
+            stage.sale_start_date, stage.sale_end_date, stage.active,
+            stage.event_id, stage.provider_date_id, stage.fingerprint,
+            0, 0, false, false
+        FROM stage_date AS stage
+        ORDER BY stage.event_id, stage.provider_date_id, stage.stage_row DESC
+        ON CONFLICT (event_id, provider_date_id) DO NOTHING
+        RETURNING event_id
+    """),
+    ('deactivated', """
+        UPDATE event_eventdate AS target SET
+            active = false,
+            fingerprint = '',
+            updated = %(now)s
+        FROM event_event AS event
+        WHERE event.id = target.event_id
+            AND event.provider_id = %(provider)s
+            AND target.active
+            AND NOT EXISTS (
+                SELECT 1 FROM stage_date AS stage
+                WHERE stage.event_id = target.event_id
+                    AND stage.provider_date_id = target.provider_date_id
+            )
+        RETURNING target.event_id
+    """),
+)
+
+LINK_DATES = """
+    UPDATE stage_zone AS stage SET date_id = target.id
+    FROM stage_date AS parent, event_eventdate AS target
+    WHERE parent.stage_row = stage.parent_row
+        AND target.event_id = parent.event_id
+        AND target.provider_date_id = parent.provider_date_id;
+    CREATE INDEX ON stage_zone (date_id, provider_zone_id);
+    ANALYZE stage_zone
+"""
+
+MERGE_ZONES = (
+    ('updated', """
+        UPDATE event_zone AS target SET
+            name = stage.name,
+            capacity = stage.capacity,
+            rest = stage.rest,
+            price = stage.price,
+            numbered = stage.numbered,
+            active = stage.active,
+            fingerprint = stage.fingerprint,
+            updated = %(now)s
+        FROM (
+            SELECT DISTINCT ON (date_id, provider_zone_id) * FROM stage_zone
+            ORDER BY date_id, provider_zone_id, stage_row DESC
+        ) AS stage
+        WHERE target.date_id = stage.date_id
+            AND target.provider_zone_id = stage.provider_zone_id
+            AND target.fingerprint <> stage.fingerprint
+        RETURNING target.date_id
+    """),
+    ('created', """
+        INSERT INTO event_zone (
+            uuid, created, updated, name, capacity, rest, price, numbered,
+            active, date_id, provider_zone_id, fingerprint
+        )
+        SELECT DISTINCT ON (stage.date_id, stage.provider_zone_id)
+            stage.uuid, %(now)s, %(now)s, stage.name, stage.capacity,
+            stage.rest, stage.price, stage.numbered, stage.active,
+            stage.date_id, stage.provider_zone_id, stage.fingerprint
+        FROM stage_zone AS stage
+        ORDER BY stage.date_id, stage.provider_zone_id, stage.stage_row DESC
+        ON CONFLICT (date_id, provider_zone_id) DO NOTHING
+        RETURNING date_id
+    """),
+    ('deactivated', """
+        UPDATE event_zone AS target SET
+            active = false,
+            fingerprint = '',
+            updated = %(now)s
+        FROM event_eventdate AS date, event_event AS event
+        WHERE date.id = target.date_id
+            AND event.id = date.event_id
+            AND event.provider_id = %(provider)s
+            AND target.active
+            AND NOT EXISTS (
+                SELECT 1 FROM stage_zone AS stage
+                WHERE stage.date_id = target.date_id
+                    AND stage.provider_zone_id = target.provider_zone_id
+            )
+        RETURNING target.date_id
+    """),
+)
+
+# Availability of the rows below, only the rows where it changed are
+# written
+REFRESH_AVAILABILITY = """
+    UPDATE {table} AS target SET
+        capacity = stats.capacity,
+        rest = stats.rest,
+        min_price = stats.min_price,
+        max_price = stats.max_price,
+        sold_out = stats.capacity > 0 AND stats.rest = 0,
+        numbered = stats.numbered,
+        updated = %(now)s
+    FROM (
+        SELECT
+            parent.id,
+            COALESCE(SUM(child.capacity), 0) AS capacity,
+            COALESCE(SUM(child.rest), 0) AS rest,
+            MIN(child.{min_price}) AS min_price,
+            MAX(child.{max_price}) AS max_price,
+            COALESCE(BOOL_OR(child.numbered), false) AS numbered
+        FROM {table} AS parent
+        LEFT JOIN {children} AS child
+            ON child.{key} = parent.id AND child.active
+        WHERE parent.id = ANY(%(ids)s::integer[])
+        GROUP BY parent.id
+    ) AS stats
+    WHERE target.id = stats.id AND (
+        target.capacity, target.rest, target.min_price, target.max_price,
+        target.numbered
+    ) IS DISTINCT FROM (
+        stats.capacity, stats.rest, stats.min_price, stats.max_price,
+        stats.numbered
+    )
+"""
+
+REFRESH_DATES = REFRESH_AVAILABILITY.format(
+    table='event_eventdate',
+    children='event_zone',
+    key='date_id',
+    min_price='price',
+    max_price='price'
+)
+
+REFRESH_EVENTS = REFRESH_AVAILABILITY.format(
+    table='event_event',
+    children='event_eventdate',
+    key='event_id',
+    min_price='min_price',
+    max_price='max_price'
+)
+
+DATES_EVENTS = """
+    SELECT DISTINCT event_id FROM event_eventdate
+    WHERE id = ANY(%(ids)s::integer[])
+"""
+
+COUNT_STAGED = """
+    SELECT
+        (SELECT COUNT(DISTINCT provider_event_id) FROM stage_event),
+        (SELECT COUNT(*) FROM (
+            SELECT DISTINCT event_id, provider_date_id FROM stage_date
+        ) AS dates),
+        (SELECT COUNT(*) FROM (
+            SELECT DISTINCT date_id, provider_zone_id FROM stage_zone
+        ) AS zones)
+"""
+
+
+def encode_copy_value(value):
+    """
+    Encode a value in the COPY text format
+
+    :param value: Value of a column
+    :type value: object
+    :return: Encoded value
+    :type return: str
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+def encode_copy_rows(rows):
+    """
+    Encode rows in the COPY text format
+
+    :param rows: Values of the rows
+    :type rows: iterable
+    :return: COPY data
+    :type return: io.BytesIO
+    """
+    return io.BytesIO(''.join(
+        '\t'.join(map(encode_copy_value, row)) + '\n' for row in rows
+    ).encode('utf-8'))
+
+
+def create_staging_tables(cursor):
+    """
+    Create the temporary staging tables, they are dropped once merged or
+    when the transaction ends
+
+    :param cursor: Database cursor inside a transaction
+    :type cursor: django.db.backends.utils.CursorWrapper
+    """
+    for table, columns, link in STAGING_TABLES:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE {} ({}) ON COMMIT DROP'.format(
+                table,
+                ', '.join(
+                    '{} {}'.format(name, column_type)
+                    for name, column_type in columns + (link,)
+                )
+            )
+        )
+
+
+def try_lock_provider(cursor, provider_id):
+    """
+    Try to take the lock of the syncs of a provider until the transaction
+    ends
+
+    :param cursor: Cursor of the transaction
+    :type cursor: django.db.backends.utils.CursorWrapper
+    :param provider_id: Id of the provider
+    :type provider_id: int
+    :return: Whether the lock was taken
+    :type return: bool
+    """
+    cursor.execute(
+        LOCK_PROVIDER,
+        {'namespace': LOCK_NAMESPACE, 'provider': provider_id}
+    )
+    return cursor.fetchone()[0]
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    Copy rows into a staging table with COPY FROM STDIN
+
+    :param cursor: Database cursor inside a transaction
+    :type cursor: django.db.backends.utils.CursorWrapper
+    :param table: Staging table
+    :type table: str
+    :param columns: Columns of the rows
+    :type columns: tuple
+    :param rows: Values of the rows
+    :type rows: iterable
+    """
+    cursor.copy_expert(
+        'COPY {} ({}) FROM STDIN'.format(
+            table,
+            ', '.join(name for name, _ in columns)
+        ),
+        encode_copy_rows(rows)
+    )
+
+
+def _get_actives(columns, size):
+    """
+    Get the active column of a level, rows are active unless the resource
+    says otherwise
+
+    :param columns: Columns of the level
+    :type columns: dict
+    :param size: Number of rows of the level
+    :type size: int
+    :return: Active values
+    :type return: list
+    """
+    return [
+        active is not False
+        for active in columns.get('active') or [None] * size
+    ]
+
+
+def get_staged_rows(batch, first_rows):
+    """
+    Get the staging rows of the events, dates and zones of a batch, the
+    rows are numbered across the batches of the resource
+
+    :param batch: Normalized batch of resource data
+    :type batch: event.schemas.ColumnBatch
+    :param first_rows: Number of the first event, date and zone rows of
+        the batch
+    :type first_rows: tuple
+    :return: Staging rows of the events, dates and zones
+    :type return: tuple
+    """
+    first_event, first_date, first_zone = first_rows
+    events = batch.events
+    size = len(events['provider_event_id'])
+    event_rows = [
+        (first_event + row, uuid.uuid4(), provider_event_id) + values +
+        (fingerprint(values),)
+        for row, (provider_event_id, values) in enumerate(zip(
+            events['provider_event_id'],
+            zip(events['title'], _get_actives(events, size))
+        ))
+    ]
+
+    dates = batch.dates
+    size = len(dates['provider_date_id'])
+    date_rows = [
+        (first_date + row, first_event + parent, uuid.uuid4()) +
+        (provider_date_id,) + values + (fingerprint(values),)
+        for row, (parent, provider_date_id, values) in enumerate(zip(
+            dates[PARENT],
+            dates['provider_date_id'],
+            zip(
+                *[dates[field] for field in DATE_FIELDS[:-1]],
+                _get_actives(dates, size)
+            )
+        ))
+    ]
+
+    zones = batch.zones
+    size = len(zones['provider_zone_id'])
+    zone_rows = [
+        (first_zone + row, first_date + parent, uuid.uuid4()) +
+        (provider_zone_id,) + values + (fingerprint(values),)
+        for row, (parent, provider_zone_id, values) in enumerate(zip(
+            zones[PARENT],
+            zones['provider_zone_id'],
+            zip(
+                *[zones[field] for field in ZONE_FIELDS[:-1]],
+                [True] * size
+            )
+        ))
+    ]
+    return event_rows, date_rows, zone_rows
+
+
+def copy_batch(cursor, batch, first_rows):
+    """
+    Copy a normalized batch into the staging tables
+
+    :param cursor: Database cursor inside a transaction
+    :type cursor: django.db.backends.utils.CursorWrapper
+    :param batch: Normalized batch of resource data
+    :type batch: event.schemas.ColumnBatch
+    :param first_rows: Number of the first event, date and zone rows of
+        the batch
+    :type first_rows: tuple
+    :return: Number of the first rows of the next batch
+    :type return: tuple
+    """
+    staged = get_staged_rows(batch, first_rows)
+    for (table, columns, _), rows in zip(STAGING_TABLES, staged):
+        copy_rows(cursor, table, columns, rows)
+    return tuple(
+        first + len(rows) for first, rows in zip(first_rows, staged)
+    )
+
+
+def merge_staging_tables(cursor, provider_id, now):
+    """
+    Merge the staging tables into the events, event dates and zones of a
+    provider with set based statements and drop them. Like the bulk save
+    only the rows whose fingerprint changed are updated and the missing
+    rows are deactivated
+
+    :param cursor: Database cursor inside a transaction
+    :type cursor: django.db.backends.utils.CursorWrapper
+    :param provider_id: Id of the provider
+    :type provider_id: int
+    :param now: Time of the merge
+    :type now: datetime.datetime
+    :return: Merged rows, ids of the written events and ids of the events
+        and dates whose children changed
+    :type return: tuple
+    """
+    params = {'provider': provider_id, 'now': now}
+    for sql in STAGING_INDEXES:
+        cursor.execute(sql)
+    cursor.execute('ANALYZE stage_event')
+
+    def merge(steps):
+        written = {}
+        for name, sql in steps:
+            cursor.execute(sql, params)
+            written[name] = [row[0] for row in cursor.fetchall()]
+        return written
+
+    events = merge(MERGE_EVENTS)
+    cursor.execute(LINK_EVENTS, params)
+    dates = merge(MERGE_DATES)
+    cursor.execute(LINK_DATES, params)
+    zones = merge(MERGE_ZONES)
+
+    cursor.execute(COUNT_STAGED)
+    staged = cursor.fetchone()
+    report = {
+        'created': 0,
+        'updated': 0,
+        'unchanged': 0,
+        'deactivated': 0
+    }
+    for written, count in zip((events, dates, zones), staged):
+        for name in report:
+            report[name] += len(written.get(name, ()))
+        report['unchanged'] += (
+            count - len(written['created']) - len(written['updated'])
+        )
+
+    cursor.execute('DROP TABLE {}'.format(
+        ', '.join(table for table, _, _ in STAGING_TABLES)
+    ))
+    # The planner statistics are stale after a big load
+    cursor.execute('ANALYZE event_event, event_eventdate, event_zone')
+
+    written_events = set(events['created'] + events['updated'])
+    dirty_events = set(
+        dates['created'] + dates['updated'] + dates['deactivated']
+    )
+    dirty_dates = set(
+        zones['created'] + zones['updated'] + zones['deactivated']
+    )
+    return report, written_events, dirty_events, dirty_dates
+
+
+def refresh_availability(cursor, dirty_dates, dirty_events, now):
+    """
+    Refresh with set based statements the availability of the event dates
+    whose zones changed and then of the events whose dates changed
+
+    :param cursor: Database cursor inside a transaction
+    :type cursor: django.db.backends.utils.CursorWrapper
+    :param dirty_dates: Ids of the event dates whose zones changed
+    :type dirty_dates: set
+    :param dirty_events: Ids of the events whose dates changed
+    :type dirty_events: set
+    :param now: Time of the refresh
+    :type now: datetime.datetime
+    :return: Ids of the events whose dates or zones changed
+    :type return: set
+    """
+    params = {'ids': list(dirty_dates), 'now': now}
+    cursor.execute(REFRESH_DATES, params)
+    cursor.execute(DATES_EVENTS, params)
+    dirty_events = dirty_events | {row[0] for row in cursor.fetchall()}
+    cursor.execute(REFRESH_EVENTS, {'ids': list(dirty_events), 'now': now})
+    return dirty_events
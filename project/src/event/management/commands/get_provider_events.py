@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Provider, ProviderResource
+from ...tasks import warm_events_cache_task
+
+
+class Command(BaseCommand):
+    help = "Get the events of the providers and save them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'provider_ids',
+            nargs='*',
+            type=int,
+            help="Ids of the providers, all of them by default"
+        )
+
+    def handle(self, *args, **options):
+        providers = Provider.objects.select_related('provider_resource')
+        if options['provider_ids']:
+            providers = providers.filter(id__in=options['provider_ids'])
+
+        changed = False
+        for provider in providers:
+            report = provider.get_external_events()
+            changed = changed or ProviderResource.has_changes(report)
+            self.stdout.write(
+                "{}: {created} created, {updated} updated, {unchanged} "
+                "unchanged, {deactivated} deactivated, {invalid} "
+                "invalid".format(
+                    provider,
+                    **report
+                )
+            )
+
+        if changed:
+            warm_events_cache_task()
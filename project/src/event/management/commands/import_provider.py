@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...models import Provider, ProviderResource
+from ...tasks import warm_events_cache_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the events of a provider with COPY, for the initial and "
+        "backfill imports of big providers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'provider_id',
+            type=int,
+            help="Id of the provider"
+        )
+        parser.add_argument(
+            '--file',
+            help="Local dump of the provider resource to import instead "
+                 "of its url"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            provider = Provider.objects.select_related(
+                'provider_resource'
+            ).get(id=options['provider_id'])
+        except Provider.DoesNotExist:
+            raise CommandError("Provider {} does not exist".format(
+                options['provider_id']
+            ))
+
+        provider_resource = provider.provider_resource
+        if options['file']:
+            provider_resource.read_resource_file(options['file'])
+
+        started = time.monotonic()
+        if connection.vendor == 'postgresql':
+            report = provider.record_sync(provider_resource.copy_resource)
+        else:
+            self.stderr.write("COPY needs Postgres, saving in bulk instead")
+            report = provider.record_sync(provider_resource.save_resource)
+        duration = time.monotonic() - started
+
+        rows = report['created'] + report['updated'] + report['unchanged']
+        self.stdout.write(
+            "{}: {created} created, {updated} updated, {unchanged} "
+            "unchanged, {deactivated} deactivated, {invalid} invalid".format(
+                provider,
+                **report
+            )
+        )
+        self.stdout.write("{} rows in {:.2f}s, {:.0f} rows/s".format(
+            rows,
+            duration,
+            rows / duration if duration else 0
+        ))
+
+        if ProviderResource.has_changes(report):
+            warm_events_cache_task()
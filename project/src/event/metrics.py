@@ -0,0 +1,145 @@
+from django.db.models import Count, Max, Q
+
+from .models import Provider, ProviderResource, ProviderSyncRun
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+PREFIX = 'events_provider_sync'
+
+METRICS = (
+    ('runs_total', 'counter', "Recorded syncs of the provider"),
+    ('errors_total', 'counter', "Recorded syncs of the provider that failed"),
+    (
+        'last_run_timestamp_seconds',
+        'gauge',
+        "Start of the last sync of the provider"
+    ),
+    ('last_success', 'gauge', "Whether the last sync of the provider ended"),
+    (
+        'last_not_modified',
+        'gauge',
+        "Whether the resource was unchanged in the last sync"
+    ),
+    ('last_duration_seconds', 'gauge', "Duration of the last sync"),
+    (
+        'last_stage_seconds',
+        'gauge',
+        "Time of every stage of the last sync, without the nested stages"
+    ),
+    ('last_bytes', 'gauge', "Bytes of the resource in the last sync"),
+    ('last_records', 'gauge', "Records parsed in the last sync"),
+    ('last_rows', 'gauge', "Rows of the last sync by result"),
+)
+
+
+def escape_label(value):
+    """
+    Escape a label value of the Prometheus text format
+
+    :param value: Label value
+    :type value: str
+    :return: Escaped label value
+    :type return: str
+    """
+    return str(value).replace('\\', '\\\\').replace(
+        '\n', '\\n'
+    ).replace('"', '\\"')
+
+
+def format_sample(name, labels, value):
+    """
+    Format a sample line of the Prometheus text format
+
+    :param name: Name of the metric
+    :type name: str
+    :param labels: Labels of the sample in order
+    :type labels: list
+    :param value: Value of the sample
+    :type value: float
+    :return: Sample line
+    :type return: str
+    """
+    return '{}_{}{{{}}} {}'.format(
+        PREFIX,
+        name,
+        ','.join(
+            '{}="{}"'.format(label, escape_label(label_value))
+            for label, label_value in labels
+        ),
+        float(value)
+    )
+
+
+def get_metric_samples(provider, run):
+    """
+    Get the samples of the metrics of a provider
+
+    :param provider: Provider annotated with its runs and errors
+    :type provider: event.models.Provider
+    :param run: Last sync run of the provider
+    :type run: event.models.ProviderSyncRun
+    :return: Samples of every metric name
+    :type return: dict
+    """
+    labels = [('provider', provider.uuid), ('name', provider.name)]
+    samples = {
+        'runs_total': [(labels, provider.runs)],
+        'errors_total': [(labels, provider.errors)],
+    }
+    if run is None:
+        return samples
+
+    samples.update({
+        'last_run_timestamp_seconds': [(labels, run.started.timestamp())],
+        'last_success': [(labels, 0 if run.error else 1)],
+        'last_not_modified': [(labels, run.not_modified)],
+        'last_duration_seconds': [(labels, run.duration)],
+        'last_stage_seconds': [
+            (labels + [('stage', stage)], getattr(run, stage + '_time'))
+            for stage in ProviderSyncRun.STAGES
+        ],
+        'last_bytes': [(labels, run.bytes_downloaded)],
+        'last_records': [(labels, run.records_parsed)],
+        'last_rows': [
+            (labels + [('result', field)], getattr(run, field))
+            for field in ProviderResource.REPORT_FIELDS
+        ],
+    })
+    return samples
+
+
+def render_metrics():
+    """
+    Render the sync metrics of every provider in the Prometheus text
+    format, the gauges come from the last sync run of each provider
+
+    :return: Metrics
+    :type return: str
+    """
+    providers = Provider.objects.annotate(
+        runs=Count('sync_runs'),
+        errors=Count('sync_runs', filter=Q(sync_runs__error__gt=''))
+    ).order_by('id')
+    last_runs = {
+        run.provider_id: run
+        for run in ProviderSyncRun.objects.filter(
+            id__in=ProviderSyncRun.objects.order_by().values(
+                'provider'
+            ).annotate(last=Max('id')).values('last')
+        )
+    }
+    samples = [
+        get_metric_samples(provider, last_runs.get(provider.id))
+        for provider in providers
+    ]
+
+    lines = []
+    for name, metric_type, help_text in METRICS:
+        lines.append('# HELP {}_{} {}'.format(PREFIX, name, help_text))
+        lines.append('# TYPE {}_{} {}'.format(PREFIX, name, metric_type))
+        for provider_samples in samples:
+            lines.extend(
+                format_sample(name, labels, value)
+                for labels, value in provider_samples.get(name, ())
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,177 @@
+import cProfile
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from itertools import count
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from .services import Telemetry
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME_CHARS = re.compile(r'[^\w.-]+')
+
+
+@contextmanager
+def profile_stage(request, name):
+    """
+    Time a stage of a request when the request is profiled
+
+    :param request: Request
+    :type request: django.http.HttpRequest
+    :param name: Name of the stage
+    :type name: str
+    :return: Counters of the request, a throwaway one when the request
+        is not profiled
+    :type return: collections.Counter
+    """
+    telemetry = getattr(request, 'telemetry', None)
+    if telemetry is None:
+        yield Counter()
+        return
+
+    with telemetry.stage(name):
+        yield telemetry.values
+
+
+def format_server_timing(values, duration):
+    """
+    Format the timings of a request in a Server-Timing header, the time
+    of the request outside the timed stages is reported as app
+
+    :param values: Timings and counters of the request
+    :type values: collections.Counter
+    :param duration: Duration of the request in seconds
+    :type duration: float
+    :return: Header value
+    :type return: str
+    """
+    descriptions = {
+        'db': '{} queries'.format(values['db_queries']),
+        'cache': 'hit' if values['cache_hits'] else 'miss',
+    }
+    metrics = []
+    staged = 0.0
+    for key, value in values.items():
+        if not key.endswith('_time'):
+            continue
+        name = key[:-len('_time')]
+        staged += value
+        metric = '{};dur={:.1f}'.format(name, value * 1000)
+        if name in descriptions:
+            metric += ';desc="{}"'.format(descriptions[name])
+        metrics.append(metric)
+    metrics.append('app;dur={:.1f}'.format(max(duration - staged, 0) * 1000))
+    metrics.append('total;dur={:.1f}'.format(duration * 1000))
+    return ', '.join(metrics)
+
+
+class ProfilingMiddleware(object):
+    """
+    Opt-in instrumentation of the requests with PROFILING_ENABLED. The
+    SQL queries, their time and the stages timed by the views are sent in
+    a Server-Timing header, slow requests are logged with their slowest
+    queries and one request in PROFILING_SAMPLE_RATE is profiled with
+    cProfile into PROFILING_DIR. The content of streamed responses is
+    produced after the request is measured
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.requests = count()
+
+    def __call__(self, request):
+        request.telemetry = Telemetry()
+        queries = []
+
+        def execute_query(execute, sql, params, many, context):
+            started = perf_counter()
+            try:
+                with request.telemetry.stage('db'):
+                    return execute(sql, params, many, context)
+            finally:
+                request.telemetry.values['db_queries'] += 1
+                queries.append((perf_counter() - started, sql))
+
+        sample_rate = settings.PROFILING_SAMPLE_RATE
+        profiler = None
+        if sample_rate and next(self.requests) % sample_rate == 0:
+            profiler = cProfile.Profile()
+
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(execute_query))
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        duration = perf_counter() - started
+
+        response['Server-Timing'] = format_server_timing(
+            request.telemetry.values,
+            duration
+        )
+        if duration >= settings.PROFILING_SLOW_REQUEST_TIME:
+            self.log_slow_request(request, duration, queries)
+        if profiler is not None:
+            self.dump_profile(request, profiler)
+        return response
+
+    def log_slow_request(self, request, duration, queries):
+        """
+        Log a slow request with its slowest SQL queries
+
+        :param request: Request
+        :type request: django.http.HttpRequest
+        :param duration: Duration of the request in seconds
+        :type duration: float
+        :param queries: Duration and SQL of every query of the request
+        :type queries: list
+        """
+        logger.warning(
+            "Slow request %s %s: %.1fms, %s queries in %.1fms%s",
+            request.method,
+            request.get_full_path(),
+            duration * 1000,
+            len(queries),
+            request.telemetry.values['db_time'] * 1000,
+            ''.join(
+                '\n{:.1f}ms {}'.format(query_duration * 1000, sql)
+                for query_duration, sql in sorted(
+                    queries,
+                    key=lambda query: query[0],
+                    reverse=True
+                )[:settings.PROFILING_SLOW_QUERIES]
+            )
+        )
+
+    def dump_profile(self, request, profiler):
+        """
+        Dump the cProfile stats of a request into PROFILING_DIR, the file
+        is named after the time and the path of the request
+
+        :param request: Request
+        :type request: django.http.HttpRequest
+        :param profiler: Profiler of the request
+        :type profiler: cProfile.Profile
+        """
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        name = '{:%Y%m%dT%H%M%S%f}-{}-{}.prof'.format(
+            timezone.now(),
+            request.method,
+            PROFILE_NAME_CHARS.sub('_', request.path.strip('/'))
+        )
+        profiler.dump_stats(os.path.join(settings.PROFILING_DIR, name))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.7 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='providerresource',
+            name='resource_type',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'JSON'), (2, 'XML')], null=True),
+        ),
+    ]
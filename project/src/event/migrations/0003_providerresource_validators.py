@@ -0,0 +1,28 @@
+# Generated by Django 2.2.7 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0002_providerresource_resource_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='providerresource',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='providerresource',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='providerresource',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.7 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0003_providerresource_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='fingerprint',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
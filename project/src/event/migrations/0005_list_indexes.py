@@ -0,0 +1,21 @@
+# Generated by Django 2.2.7 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0004_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['active'], name='event_event_active_224090_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventdate',
+            index=models.Index(fields=['active', 'sale_start_date', 'sale_end_date', 'event'], name='event_event_active_82fc71_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.7 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0005_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['created', 'id'], name='event_event_created_1dd04d_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:00
+
+from django.db import migrations, models
+from django.db.models import Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def aggregate(queryset, function, field):
+    return Subquery(
+        queryset.annotate(value=function(field)).values('value')
+    )
+
+
+def refresh_availability(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    EventDate = apps.get_model('event', 'EventDate')
+    Zone = apps.get_model('event', 'Zone')
+
+    zones = Zone.objects.filter(
+        date=OuterRef('pk'),
+        active=True
+    ).order_by().values('date')
+    EventDate.objects.update(
+        capacity=Coalesce(aggregate(zones, Sum, 'capacity'), 0),
+        rest=Coalesce(aggregate(zones, Sum, 'rest'), 0),
+        min_price=aggregate(zones, Min, 'price'),
+        max_price=aggregate(zones, Max, 'price')
+    )
+    EventDate.objects.filter(capacity__gt=0, rest=0).update(sold_out=True)
+
+    dates = EventDate.objects.filter(
+        event=OuterRef('pk'),
+        active=True
+    ).order_by().values('event')
+    Event.objects.update(
+        capacity=Coalesce(aggregate(dates, Sum, 'capacity'), 0),
+        rest=Coalesce(aggregate(dates, Sum, 'rest'), 0),
+        min_price=aggregate(dates, Min, 'min_price'),
+        max_price=aggregate(dates, Max, 'max_price')
+    )
+    Event.objects.filter(capacity__gt=0, rest=0).update(sold_out=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0006_event_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rest',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='sold_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='rest',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='sold_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(
+            refresh_availability,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+def refresh_numbered(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    EventDate = apps.get_model('event', 'EventDate')
+
+    EventDate.objects.filter(
+        zones__active=True,
+        zones__numbered=True
+    ).update(numbered=True)
+    Event.objects.filter(
+        dates__active=True,
+        dates__numbered=True
+    ).update(numbered=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0007_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='numbered',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='eventdate',
+            name='numbered',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['min_price'], name='event_event_min_pri_8c36b4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['max_price'], name='event_event_max_pri_8a6b2c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['rest'], name='event_event_rest_bb8275_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['numbered'], name='event_event_numbere_24516d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventdate',
+            index=models.Index(fields=['active', 'date', 'event'], name='event_event_active_305cbf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['uuid'], name='event_provi_uuid_d287cb_idx'),
+        ),
+        migrations.RunPython(
+            refresh_numbered,
+            migrations.RunPython.noop
+        ),
+    ]
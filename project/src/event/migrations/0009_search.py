@@ -0,0 +1,65 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:09
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_INDEXES = (
+    'CREATE INDEX event_event_search_vector_gin '
+    'ON event_event USING gin (search_vector)',
+    'CREATE INDEX event_event_title_trgm '
+    'ON event_event USING gin (title gin_trgm_ops)',
+)
+
+REFRESH_SEARCH_VECTORS = """
+    UPDATE event_event SET search_vector =
+        setweight(to_tsvector(%s::regconfig, title), 'A') ||
+        setweight(to_tsvector(%s::regconfig, COALESCE((
+            SELECT STRING_AGG(event_zone.name, ' ')
+            FROM event_zone
+            INNER JOIN event_eventdate
+                ON event_eventdate.id = event_zone.date_id
+            WHERE event_eventdate.event_id = event_event.id
+                AND event_eventdate.active
+                AND event_zone.active
+        ), '')), 'B')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for sql in SEARCH_INDEXES:
+        schema_editor.execute(sql)
+    config = settings.EVENTS_SEARCH_CONFIG
+    schema_editor.execute(REFRESH_SEARCH_VECTORS, (config, config))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX event_event_search_vector_gin')
+    schema_editor.execute('DROP INDEX event_event_title_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0008_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(
+            create_search_indexes,
+            drop_search_indexes
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0009_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='providerresource',
+            name='schema',
+            field=models.TextField(blank=True, help_text='JSON mapping of the resource to the standard form, the default schema is used when it is empty'),
+        ),
+    ]
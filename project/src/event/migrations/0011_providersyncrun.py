@@ -0,0 +1,47 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0010_providerresource_schema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderSyncRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+                ('duration', models.FloatField(default=0)),
+                ('fetch_time', models.FloatField(default=0)),
+                ('parse_time', models.FloatField(default=0)),
+                ('adapt_time', models.FloatField(default=0)),
+                ('write_time', models.FloatField(default=0)),
+                ('bytes_downloaded', models.BigIntegerField(default=0)),
+                ('records_parsed', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('deactivated', models.PositiveIntegerField(default=0)),
+                ('invalid', models.PositiveIntegerField(default=0)),
+                ('not_modified', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_runs', to='event.Provider')),
+            ],
+            options={
+                'ordering': ['-started'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='providersyncrun',
+            index=models.Index(fields=['provider', 'started'], name='event_provi_provide_ae2ac6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='providersyncrun',
+            index=models.Index(fields=['started'], name='event_provi_started_e6c626_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+NATURAL_KEYS = (
+    ('Event', ('provider', 'provider_event_id')),
+    ('EventDate', ('event', 'provider_date_id')),
+    ('Zone', ('date', 'provider_zone_id')),
+)
+
+# Model and foreign key of the rows below each model of NATURAL_KEYS
+CHILDREN = {
+    'Event': ('EventDate', 'event'),
+    'EventDate': ('Zone', 'date'),
+}
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Keep one row by natural key, the active one with the lowest id. The
+    rows below the duplicates are moved to the kept row before deleting
+    them, and as NATURAL_KEYS goes from the events down to the zones the
+    moved rows are deduplicated on their own natural keys afterwards
+    """
+    for model_name, key_fields in NATURAL_KEYS:
+        model = apps.get_model('event', model_name)
+        duplicates = model.objects.order_by().exclude(
+            **{'{}__isnull'.format(key_fields[0]): True}
+        ).values(*key_fields).annotate(rows=Count('id')).filter(rows__gt=1)
+        for key in duplicates:
+            del key['rows']
+            ids = list(model.objects.filter(**key).order_by(
+                '-active',
+                'id'
+            ).values_list('id', flat=True))
+            if model_name in CHILDREN:
+                child_name, parent_field = CHILDREN[model_name]
+                apps.get_model('event', child_name).objects.filter(
+                    **{'{}_id__in'.format(parent_field): ids[1:]}
+                ).update(**{'{}_id'.format(parent_field): ids[0]})
+            model.objects.filter(id__in=ids[1:]).delete()
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # Fire the deferred foreign key checks of the deleted rows, the
+        # tables can not be altered with pending trigger events
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0011_providersyncrun'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('provider', 'provider_event_id'), name='unique_provider_event'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventdate',
+            constraint=models.UniqueConstraint(fields=('event', 'provider_date_id'), name='unique_event_provider_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='zone',
+            constraint=models.UniqueConstraint(fields=('date', 'provider_zone_id'), name='unique_date_provider_zone'),
+        ),
+    ]
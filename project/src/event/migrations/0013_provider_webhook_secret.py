@@ -0,0 +1,18 @@
+# Generated by Django 2.2.7 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0012_natural_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='webhook_secret',
+            field=models.CharField(blank=True, help_text='Secret signing the availability deltas of the provider, the deltas are refused when it is empty', max_length=64),
+        ),
+    ]
@@ -1,114 +1,918 @@
-import json
-import requests
+import logging
+import time
 import uuid
-import xmltodict
+from collections import Counter
+from itertools import repeat
+from requests import RequestException
 from rest_framework import status
 
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.db.models import (
+    Aggregate, F, IntegerField, Max, Min, OuterRef, Subquery, Sum, TextField
+)
+from django.db.models.functions import Cast
+from django.utils import timezone
 
-from .exceptions import ProviderURLException
+from . import loaders, parsers, schemas
+from .cache import bump_events_generation, touch_events
+from .clients import get_provider_client, iter_response_chunks
+from .exceptions import ProviderLockedException, ProviderURLException
+from .routers import stick_to_primary
+from .services import (
+    Telemetry, fingerprint, iter_batches, iter_file_chunks, spool_chunks
+)
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_FIELDS = [
+    'capacity',
+    'rest',
+    'min_price',
+    'max_price',
+    'sold_out',
+    'numbered'
+]
+
+AVAILABILITY_ZONES = {
+    'capacity': Sum('capacity'),
+    'rest': Sum('rest'),
+    'min_price': Min('price'),
+    'max_price': Max('price'),
+    'numbered': Max(Cast('numbered', IntegerField())),
+}
+
+AVAILABILITY_DATES = {
+    'capacity': Sum('capacity'),
+    'rest': Sum('rest'),
+    'min_price': Min('min_price'),
+    'max_price': Max('max_price'),
+    'numbered': Max(Cast('numbered', IntegerField())),
+}
+
+
+def get_availability(aggregates):
+    """
+    Get the availability fields from the aggregates of the children rows
+
+    :param aggregates: Capacity, rest and prices of the children rows
+    :type aggregates: dict
+    :return: Values of the availability fields
+    :type return: dict
+    """
+    capacity = aggregates.get('capacity') or 0
+    rest = aggregates.get('rest') or 0
+    return {
+        'capacity': capacity,
+        'rest': rest,
+        'min_price': aggregates.get('min_price'),
+        'max_price': aggregates.get('max_price'),
+        'sold_out': capacity > 0 and rest == 0,
+        'numbered': bool(aggregates.get('numbered')),
+    }
+
+
+class ZoneNames(Aggregate):
+    """
+    Names of the zones joined by spaces, only available on Postgres
+    """
+    function = 'STRING_AGG'
+    template = "%(function)s(%(expressions)s, ' ')"
+    output_field = TextField()
+
+
+def get_search_vector():
+    """
+    Get the search vector of an event, built from its title and the
+    names of its active zones with a lower weight
+
+    :return: Search vector expression for an event query
+    :type return: django.contrib.postgres.search.SearchVector
+    """
+    zone_names = Zone.objects.filter(
+        date__event=OuterRef('pk'),
+        date__active=True,
+        active=True
+    ).order_by().values('date__event').annotate(
+        names=ZoneNames('name')
+    ).values('names')
+    config = settings.EVENTS_SEARCH_CONFIG
+    return SearchVector('title', weight='A', config=config) + SearchVector(
+        Subquery(zone_names, output_field=TextField()),
+        weight='B',
+        config=config
+    )
+
+
+class AvailabilityModel(models.Model):
+    """
+    Availability of the zones below a row, maintained by the ingest
+    """
+    capacity = models.PositiveIntegerField(default=0)
+    rest = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        blank=True,
+        null=True
+    )
+    max_price = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        blank=True,
+        null=True
+    )
+    sold_out = models.BooleanField(default=False)
+    numbered = models.BooleanField(default=False)
+
+    class Meta:
+        abstract = True
 
 
 class ProviderResource(models.Model):
     """
     Resource of a Provider
     """
-    JSON = 1
-    XML = 2
+    JSON = parsers.JSON
+    XML = parsers.XML
 
-    RESOURCE_TYPES = (
-        (JSON, 'JSON'),
-        (XML, 'XML')
+    REPORT_FIELDS = (
+        'created',
+        'updated',
+        'unchanged',
+        'deactivated',
+        'invalid'
     )
 
+    RESOURCE_TYPES = parsers.RESOURCE_TYPES
+
     url = models.URLField()
+    resource_type = models.PositiveSmallIntegerField(
+        choices=RESOURCE_TYPES,
+        blank=True,
+        null=True
+    )
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    schema = models.TextField(
+        blank=True,
+        help_text="JSON mapping of the resource to the standard form, "
+                  "the default schema is used when it is empty"
+    )
     _data = None
+    _dirty_dates = None
+    _dirty_events = None
+    _report = None
     _resource = None
-    _resource_type = None
+    _telemetry = None
+    _unchanged = False
+    _validators = None
+    _written_events = None
+
+    @property
+    def telemetry(self):
+        """
+        Timings and counters of the stages of the sync of the resource
+
+        :return: Telemetry of the sync
+        :type return: event.services.Telemetry
+        """
+        if self._telemetry is None:
+            self._telemetry = Telemetry()
+        return self._telemetry
 
     def get_external_resource(self):
         """
-        Get resource from the provider url
+        Get the whole resource from the provider url
+        """
+        self.stream_external_resource()
+        self._resource = list(self._resource or [])
+
+    def stream_external_resource(self):
+        """
+        Get resource from the provider url as a stream of records, the
+        response is downloaded and parsed once in chunks and the detected
+        resource type is stored to skip the detection in the next runs.
+
+        The request is conditional on the validators of the last saved
+        response, if the provider does not send validators the hash of
+        the content is compared instead. An unchanged resource is marked
+        as unchanged and it is not parsed.
         """
-        response = requests.get(self.url)
+        try:
+            with self.telemetry.stage('fetch'):
+                response = get_provider_client().get(
+                    self.url,
+                    headers=self._get_conditional_headers()
+                )
+        except RequestException:
+            raise ProviderURLException("Error in provider URL")
+
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            response.close()
+            self._unchanged = True
+            return
+
         if response.status_code != status.HTTP_200_OK:
+            response.close()
             raise ProviderURLException("Error in provider URL")
 
-        try:
-            self._resource = json.loads(response.text)
-            self._resource_type = self.JSON
-        except ValueError:
-            pass
+        self._validators = {
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'content_hash': ''
+        }
+        chunks = self._iter_fetched(iter_response_chunks(response))
+        if not any(self._validators.values()):
+            content_hash, chunks = spool_chunks(chunks)
+            if content_hash == self.content_hash:
+                self._unchanged = True
+                return
+            self._validators['content_hash'] = content_hash
+
+        if self.resource_type is None:
+            try:
+                self.resource_type, chunks = parsers.detect_resource_type(
+                    response.headers.get('Content-Type'),
+                    chunks
+                )
+            except ValueError:
+                response.close()
+                raise
+            self.save(update_fields=['resource_type'])
+
+        self._resource = self._iter_parsed(chunks)
+
+    def read_resource_file(self, path):
+        """
+        Get the resource from a local file instead of the provider url as a
+        stream of records, to replay dumps of the resource offline. The
+        validators of the provider response are kept as they are
+
+        :param path: Path of the file
+        :type path: str
+        """
+        chunks = self._iter_fetched(iter_file_chunks(path))
+        if self.resource_type is None:
+            self.resource_type, chunks = parsers.detect_resource_type(
+                None,
+                chunks
+            )
+        self._resource = self._iter_parsed(chunks)
+
+    def _iter_fetched(self, chunks):
+        """
+        Time the fetch of the resource chunks counting their bytes
+
+        :param chunks: Bytes chunks of the resource
+        :type chunks: iterable
+        :return: Bytes chunks of the resource
+        :type return: generator
+        """
+        return self.telemetry.iter_stage(
+            chunks,
+            'fetch',
+            'bytes_downloaded',
+            len
+        )
+
+    def _iter_parsed(self, chunks):
+        """
+        Parse the resource chunks timing the parse and counting the records
+
+        :param chunks: Bytes chunks of the resource
+        :type chunks: iterable
+        :return: Records of the resource
+        :type return: generator
+        """
+        return self.telemetry.iter_stage(
+            parsers.get_parser(self.resource_type)(chunks),
+            'parse',
+            'records_parsed'
+        )
+
+    def _get_conditional_headers(self):
+        """
+        Get the conditional request headers from the stored validators
+
+        :return: Request headers
+        :type return: dict
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
 
+    def clean(self):
         try:
-            self._resource = xmltodict.parse(response.text)
-            self._resource_type = self.XML
-        except TypeError:
-            raise ValueError
+            schemas.compile_normalizer(self.schema, self.resource_type)
+        except (KeyError, TypeError, ValueError) as exception:
+            raise ValidationError({'schema': str(exception)})
 
     def adapt_resource(self):
         """
-        Adapt the resource data to the standard form
+        Adapt the resource data to the standard form with the compiled
+        schema of the resource, records are normalized into columns in
+        batches of INGEST_BATCH_SIZE while they are read
         """
-        if not self._resource:
-            self.get_external_resource()
+        if not self._resource and not self._unchanged:
+            self.stream_external_resource()
+        if self._unchanged:
+            return
+
+        normalize = schemas.compile_normalizer(
+            self.schema,
+            self.resource_type
+        )
+        batch_size = settings.INGEST_BATCH_SIZE
+        self._data = self.telemetry.iter_stage(
+            (
+                normalize(records, index * batch_size)
+                for index, records in enumerate(
+                    iter_batches(self._resource, batch_size)
+                )
+            ),
+            'adapt'
+        )
 
     def save_resource(self):
         """
-        Save the Provider Resource data
+        Save the Provider Resource data in bulk inside one transaction,
+        only the changed rows are written and the rows missing in the
+        resource are deactivated. The rows with invalid values are
+        reported and handled as missing
+
+        :return: Number of created, updated, unchanged, deactivated and
+            invalid rows
+        :type return: dict
         """
         if not self._data:
             self.adapt_resource()
 
-        for event in self._data:
-            events = self.provider.events.filter(
-                provider_event_id=event['provider_event_id']
+        self._report = Counter({field: 0 for field in self.REPORT_FIELDS})
+        if self._unchanged:
+            return dict(self._report)
+
+        self._dirty_dates = set()
+        self._dirty_events = set()
+        self._written_events = set()
+        seen_events = set()
+        seen_dates = set()
+        seen_zones = set()
+        with self.telemetry.stage('write'), transaction.atomic():
+            self._lock_provider()
+            for batch in self._data:
+                self._report_errors(batch.errors)
+                event_ids = self._save_events(batch.events)
+                date_keys, date_ids = self._save_event_dates(
+                    batch.dates,
+                    event_ids
+                )
+                zone_keys = self._save_zones(batch.zones, date_ids)
+                seen_events.update(batch.events['provider_event_id'])
+                seen_dates.update(date_keys)
+                seen_zones.update(zone_keys)
+
+            self._deactivate_missing(
+                self.provider.events.all(),
+                ['provider_event_id'],
+                seen_events
             )
-            if events.exists():
-                provider_event = events.first()
-            else:
-                provider_event = Event(
-                    title=event['title'],
-                    active=event['active'],
-                    provider=self.provider,
-                    provider_event_id=event['provider_event_id']
+            missing_dates = self._deactivate_missing(
+                EventDate.objects.filter(event__provider=self.provider),
+                ['event_id', 'provider_date_id'],
+                seen_dates
+            )
+            missing_zones = self._deactivate_missing(
+                Zone.objects.filter(date__event__provider=self.provider),
+                ['date_id', 'provider_zone_id'],
+                seen_zones
+            )
+            self._dirty_events.update(key[0] for key in missing_dates)
+            self._dirty_dates.update(key[0] for key in missing_zones)
+            self._refresh_availability()
+            self._refresh_search(self._written_events | self._dirty_events)
+            self._save_validators()
+            if self.has_changes(self._report):
+                transaction.on_commit(stick_to_primary)
+                transaction.on_commit(bump_events_generation)
+        return dict(self._report)
+
+    def copy_resource(self):
+        """
+        Save the Provider Resource data like save_resource, but the rows
+        are copied with COPY into staging tables and merged with set based
+        statements, for the initial and backfill imports of big resources.
+        The availability is refreshed set based too. Only available on
+        Postgres
+
+        :return: Number of created, updated, unchanged, deactivated and
+            invalid rows
+        :type return: dict
+        """
+        if not self._data:
+            self.adapt_resource()
+
+        self._report = Counter({field: 0 for field in self.REPORT_FIELDS})
+        if self._unchanged:
+            return dict(self._report)
+
+        now = timezone.now()
+        with self.telemetry.stage('write'), transaction.atomic(), \
+                connection.cursor() as cursor:
+            self._lock_provider()
+            loaders.create_staging_tables(cursor)
+            first_rows = (0, 0, 0)
+            for batch in self._data:
+                self._report_errors(batch.errors)
+                first_rows = loaders.copy_batch(cursor, batch, first_rows)
+
+            report, written_events, dirty_events, dirty_dates = (
+                loaders.merge_staging_tables(cursor, self.provider.id, now)
+            )
+            self._report.update(report)
+            dirty_events = loaders.refresh_availability(
+                cursor,
+                dirty_dates,
+                dirty_events,
+                now
+            )
+            self._refresh_search(written_events | dirty_events)
+            self._save_validators()
+            if self.has_changes(self._report):
+                transaction.on_commit(stick_to_primary)
+                transaction.on_commit(bump_events_generation)
+        return dict(self._report)
+
+    def apply_deltas(self, deltas):
+        """
+        Apply availability deltas to the active zones of the provider in
+        one bulk update, keyed by the provider ids of the zone, its date
+        and its event. The availability of their dates and events is
+        refreshed and only the cached lists of those events invalidated,
+        the deltas of unknown zones are reported as missing
+
+        :param deltas: Capacity, rest or price of every zone to change
+        :type deltas: list
+        :return: Number of updated, unchanged and missing zones
+        :type return: dict
+        """
+        deltas = {
+            (
+                delta['provider_event_id'],
+                delta['provider_date_id'],
+                delta['provider_zone_id']
+            ): delta
+            for delta in deltas
+        }
+        report = Counter(updated=0, unchanged=0, missing=0)
+        self._dirty_dates = set()
+        self._dirty_events = set()
+        now = timezone.now()
+        with transaction.atomic():
+            zones = Zone.objects.filter(
+                date__event__provider=self.provider,
+                date__event__provider_event_id__in={key[0] for key in deltas},
+                date__provider_date_id__in={key[1] for key in deltas},
+                provider_zone_id__in={key[2] for key in deltas},
+                active=True
+            ).annotate(
+                provider_event_id=F('date__event__provider_event_id'),
+                provider_date_id=F('date__provider_date_id')
+            ).order_by('id').select_for_update(of=('self',))
+            to_update = []
+            for zone in zones:
+                delta = deltas.pop((
+                    zone.provider_event_id,
+                    zone.provider_date_id,
+                    zone.provider_zone_id
+                ), None)
+                if delta is None:
+                    continue
+                changed = [
+                    field for field in Zone.DELTA_FIELDS
+                    if field in delta and getattr(zone, field) != delta[field]
+                ]
+                if not changed:
+                    report['unchanged'] += 1
+                    continue
+                for field in changed:
+                    setattr(zone, field, delta[field])
+                zone.fingerprint = fingerprint(
+                    getattr(zone, field) for field in loaders.ZONE_FIELDS
                 )
-                provider_event.save()
+                zone.updated = now
+                to_update.append(zone)
+                self._dirty_dates.add(zone.date_id)
+            report['updated'] = len(to_update)
+            report['missing'] = len(deltas)
 
-            for date in event['dates']:
-                dates = event.dates.filter(
-                    provider_date_id=date['provider_date_id']
+            if to_update:
+                Zone.objects.bulk_update(
+                    to_update,
+                    list(Zone.DELTA_FIELDS) + ['fingerprint', 'updated'],
+                    batch_size=settings.INGEST_DELTA_MAX_ZONES
                 )
-                if dates.exists():
-                    event_date = dates.first()
-                else:
-                    event_date = EventDate(
-                        event=provider_event,
-                        provider_date_id=date['provider_date_id']
-                    )
+                self._refresh_availability()
+                event_ids = set(self._dirty_events)
+                transaction.on_commit(stick_to_primary)
+                transaction.on_commit(lambda: touch_events(event_ids))
+        return dict(report)
+
+    @staticmethod
+    def has_changes(report):
+        """
+        Get if a sync report wrote any row
+
+        :param report: Sync report
+        :type report: dict
+        :return: Whether any row was created, updated or deactivated
+        :type return: bool
+        """
+        return any(
+            report.get(field)
+            for field in ('created', 'updated', 'deactivated')
+        )
+
+    def _lock_provider(self):
+        """
+        Lock the syncs of the provider until the transaction ends so they
+        never overlap, Postgres takes a transaction advisory lock and the
+        other databases serialize the writing transactions themselves
+
+        :raises ProviderLockedException: Another sync of the provider holds
+            the lock
+        """
+        if connection.vendor != 'postgresql':
+            return
+
+        with connection.cursor() as cursor:
+            locked = loaders.try_lock_provider(cursor, self.provider.id)
+        if not locked:
+            raise ProviderLockedException(
+                "Provider {} is already being synced".format(
+                    self.provider.id
+                )
+            )
+
+    def _report_errors(self, errors):
+        """
+        Report the rows of the resource data with invalid values
+
+        :param errors: Errors of the rows
+        :type errors: list
+        """
+        self._report['invalid'] += len(errors)
+        for error in errors:
+            logger.warning(
+                "Invalid %s in record %s of %s: %s %s",
+                error['level'],
+                error['record'],
+                self.url,
+                error['field'],
+                error['error']
+            )
+
+    def _save_validators(self):
+        """
+        Store the validators of the saved response for the next request
+        """
+        if not self._validators:
+            return
+
+        for field, value in self._validators.items():
+            setattr(self, field, value)
+        self.save(update_fields=list(self._validators))
+
+    def _upsert(self, model, existing, rows, fields):
+        """
+        Insert the new rows and update in batches only the rows whose
+        fingerprint changed
+
+        :param model: Model of the rows
+        :type model: django.db.models.Model
+        :param existing: Stored objects by natural key
+        :type existing: dict
+        :param rows: Values of the fields and of the natural key by
+            natural key
+        :type rows: dict
+        :param fields: Fields filled from the resource data
+        :type fields: list
+        :return: Whether any row was created and the written natural keys
+        :type return: tuple
+        """
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        written = []
 
-                event_date.date = date['date']
-                event_date.sale_start_date = date['sale_start_date']
-                event_date.event_date = date['sale_end_date']
-                date.save()
+        for key, (values, key_values) in rows.items():
+            row_fingerprint = fingerprint(values[field] for field in fields)
+            obj = existing.get(key)
+            if obj is None:
+                written.append(key)
+                to_create.append(model(
+                    fingerprint=row_fingerprint,
+                    **key_values,
+                    **values
+                ))
+            elif obj.fingerprint == row_fingerprint:
+                self._report['unchanged'] += 1
+            else:
+                written.append(key)
+                for field in fields:
+                    setattr(obj, field, values[field])
+                obj.fingerprint = row_fingerprint
+                obj.updated = now
+                to_update.append(obj)
 
-                for zone in date['zones']:
-                    zones = Zone.objects.filter(
-                        provider_zone_id=zone['provider_zone_id']
+        self._report['created'] += len(to_create)
+        self._report['updated'] += len(to_update)
+        batch_size = settings.INGEST_BATCH_SIZE
+        if to_create:
+            # Django 2.2 does not bound a given batch size by the limits of
+            # the database, SQLite inserts at most 500 rows at once
+            model.objects.bulk_create(
+                to_create,
+                batch_size=min(
+                    batch_size,
+                    max(
+                        connection.ops.bulk_batch_size(
+                            model._meta.concrete_fields,
+                            to_create
+                        ),
+                        1
                     )
-                    if zones.exists():
-                        event_zone = zones.first()
-                    else:
-                        event_zone = Zone(
-                            name=zone['name'],
-                            price=zone['price'],
-                            numbered=zone['numbered'],
-                            date=event_date,
-                            provider_zone_id=zone['provider_zone_id'],
-                        )
+                )
+            )
+        if to_update:
+            model.objects.bulk_update(
+                to_update,
+                fields + ['fingerprint', 'updated'],
+                batch_size=batch_size
+            )
+        return bool(to_create), written
 
-                    event_zone.rest = zones['rest']
-                    event_zone.save()
+    def _refresh_availability(self):
+        """
+        Refresh the availability of the event dates whose zones changed and
+        then of the events whose dates changed
+        """
+        batch_size = settings.INGEST_BATCH_SIZE
+        for ids in iter_batches(self._dirty_dates, batch_size):
+            aggregates = Zone.objects.filter(
+                date_id__in=ids,
+                active=True
+            ).order_by().values('date_id').annotate(**AVAILABILITY_ZONES)
+            dates = list(EventDate.objects.filter(id__in=ids))
+            self._apply_availability(EventDate, dates, aggregates, 'date_id')
+            self._dirty_events.update(date.event_id for date in dates)
+
+        for ids in iter_batches(self._dirty_events, batch_size):
+            aggregates = EventDate.objects.filter(
+                event_id__in=ids,
+                active=True
+            ).order_by().values('event_id').annotate(**AVAILABILITY_DATES)
+            events = Event.objects.filter(id__in=ids)
+            self._apply_availability(Event, events, aggregates, 'event_id')
+
+    def _refresh_search(self, event_ids):
+        """
+        Refresh the search vector of the events whose title or zones
+        changed, the search vectors are only stored on Postgres
+
+        :param event_ids: Ids of the events to refresh
+        :type event_ids: set
+        """
+        if connection.vendor != 'postgresql':
+            return
+
+        for ids in iter_batches(event_ids, settings.INGEST_BATCH_SIZE):
+            Event.objects.filter(id__in=ids).update(
+                search_vector=get_search_vector()
+            )
+
+    def _apply_availability(self, model, queryset, aggregates, key):
+        """
+        Update in batch the availability of the rows where it changed
+
+        :param model: Model of the rows
+        :type model: django.db.models.Model
+        :param queryset: Rows to refresh
+        :type queryset: iterable
+        :param aggregates: Availability aggregates of the rows
+        :type aggregates: django.db.models.QuerySet
+        :param key: Field of the aggregates with the id of the row
+        :type key: str
+        """
+        aggregates = {row.pop(key): row for row in aggregates}
+        now = timezone.now()
+        to_update = []
+        for obj in queryset:
+            availability = get_availability(aggregates.get(obj.id, {}))
+            if any(
+                getattr(obj, field) != value
+                for field, value in availability.items()
+            ):
+                for field, value in availability.items():
+                    setattr(obj, field, value)
+                obj.updated = now
+                to_update.append(obj)
+
+        if to_update:
+            model.objects.bulk_update(
+                to_update,
+                AVAILABILITY_FIELDS + ['updated'],
+                batch_size=settings.INGEST_BATCH_SIZE
+            )
+
+    def _deactivate_missing(self, queryset, key_fields, seen):
+        """
+        Deactivate in batches the active rows missing in the resource data
+
+        :param queryset: Rows of the provider
+        :type queryset: django.db.models.QuerySet
+        :param key_fields: Fields of the natural key
+        :type key_fields: list
+        :param seen: Natural keys of the rows in the resource data
+        :type seen: set
+        :return: Natural keys of the deactivated rows
+        :type return: list
+        """
+        missing = []
+        missing_keys = []
+        for row in queryset.filter(active=True).values_list(
+            'id', *key_fields
+        ):
+            key = row[1:] if len(key_fields) > 1 else row[1]
+            if key not in seen:
+                missing.append(row[0])
+                missing_keys.append(key)
+
+        self._report['deactivated'] += len(missing)
+        now = timezone.now()
+        for ids in iter_batches(missing, settings.INGEST_BATCH_SIZE):
+            queryset.model.objects.filter(id__in=ids).update(
+                active=False,
+                fingerprint='',
+                updated=now
+            )
+        return missing_keys
+
+    def _save_events(self, events):
+        """
+        Insert or update the events of a batch of resource data
+
+        :param events: Columns of the events
+        :type events: dict
+        :return: Event id of every row
+        :type return: list
+        """
+        provider_event_ids = events['provider_event_id']
+        provider_events = self.provider.events.filter(
+            provider_event_id__in=set(provider_event_ids)
+        )
+        existing = {
+            event.provider_event_id: event for event in provider_events
+        }
+        rows = {}
+        for provider_event_id, title, active in zip(
+            provider_event_ids,
+            events['title'],
+            events.get('active') or repeat(None)
+        ):
+            rows[provider_event_id] = (
+                {
+                    'title': title,
+                    'active': True if active is None else active
+                },
+                {
+                    'provider': self.provider,
+                    'provider_event_id': provider_event_id
+                }
+            )
+
+        created, written = self._upsert(
+            Event,
+            existing,
+            rows,
+            ['title', 'active']
+        )
+        if created:
+            event_ids = dict(
+                provider_events.values_list('provider_event_id', 'id')
+            )
+        else:
+            event_ids = {key: event.id for key, event in existing.items()}
+        self._written_events.update(event_ids[key] for key in written)
+        return list(map(event_ids.__getitem__, provider_event_ids))
+
+    def _save_event_dates(self, dates, event_ids):
+        """
+        Insert or update the event dates of a batch of resource data
+
+        :param dates: Columns of the event dates
+        :type dates: dict
+        :param event_ids: Event id of every event row
+        :type event_ids: list
+        :return: Natural key (event id, provider date id) and event date
+            id of every row
+        :type return: tuple
+        """
+        keys = [
+            (event_ids[parent], provider_date_id)
+            for parent, provider_date_id in zip(
+                dates[schemas.PARENT],
+                dates['provider_date_id']
+            )
+        ]
+        provider_dates = EventDate.objects.filter(
+            event__provider=self.provider,
+            event_id__in=set(event_ids)
+        )
+        existing = {
+            (date.event_id, date.provider_date_id): date
+            for date in provider_dates
+        }
+        rows = {}
+        for key, date, sale_start_date, sale_end_date, active in zip(
+            keys,
+            dates['date'],
+            dates['sale_start_date'],
+            dates['sale_end_date'],
+            dates.get('active') or repeat(None)
+        ):
+            rows[key] = (
+                {
+                    'date': date,
+                    'sale_start_date': sale_start_date,
+                    'sale_end_date': sale_end_date,
+                    'active': True if active is None else active
+                },
+                {
+                    'event_id': key[0],
+                    'provider_date_id': key[1]
+                }
+            )
+
+        fields = ['date', 'sale_start_date', 'sale_end_date', 'active']
+        created, written = self._upsert(EventDate, existing, rows, fields)
+        self._dirty_events.update(event_id for event_id, _ in written)
+        if created:
+            date_ids = {
+                (event_id, provider_date_id): date_id
+                for date_id, event_id, provider_date_id
+                in provider_dates.values_list(
+                    'id', 'event_id', 'provider_date_id'
+                )
+            }
+        else:
+            date_ids = {key: date.id for key, date in existing.items()}
+        return keys, list(map(date_ids.__getitem__, keys))
+
+    def _save_zones(self, zones, date_ids):
+        """
+        Insert or update the zones of a batch of resource data
+
+        :param zones: Columns of the zones
+        :type zones: dict
+        :param date_ids: Event date id of every event date row
+        :type date_ids: list
+        :return: Zone natural keys (date id, provider zone id)
+        :type return: set
+        """
+        existing = {
+            (zone.date_id, zone.provider_zone_id): zone
+            for zone in Zone.objects.filter(
+                date__event__provider=self.provider,
+                date_id__in=set(date_ids)
+            )
+        }
+        fields = ['name', 'capacity', 'rest', 'price', 'numbered']
+        rows = {}
+        for parent, provider_zone_id, *values in zip(
+            zones[schemas.PARENT],
+            zones['provider_zone_id'],
+            *[zones[field] for field in fields]
+        ):
+            date_id = date_ids[parent]
+            rows[(date_id, provider_zone_id)] = (
+                dict(zip(fields, values), active=True),
+                {
+                    'date_id': date_id,
+                    'provider_zone_id': provider_zone_id
+                }
+            )
+
+        fields.append('active')
+        _, written = self._upsert(Zone, existing, rows, fields)
+        self._dirty_dates.update(date_id for date_id, _ in written)
+        return set(rows)
 
 
 class Provider(models.Model):
@@ -127,9 +931,16 @@ class Provider(models.Model):
         on_delete=models.CASCADE,
         related_name='provider'
     )
+    webhook_secret = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Secret signing the availability deltas of the provider, "
+                  "the deltas are refused when it is empty"
+    )
 
     class Meta:
         ordering = ['created']
+        indexes = [models.Index(fields=['uuid'])]
 
     def __str__(self):
         return self.name
@@ -137,11 +948,92 @@ class Provider(models.Model):
     def get_external_events(self):
         """
         Get provider events and save
+
+        :return: Number of created and updated rows
+        :type return: dict
         """
-        self.provider_resource.save_resource()
+        return self.record_sync(self.provider_resource.save_resource)
 
+    def record_sync(self, sync):
+        """
+        Sync the provider resource recording the timings, counters and
+        report of the sync in a ProviderSyncRun, failed syncs are recorded
+        with their error before it is raised again
+
+        :param sync: Method of the provider resource saving its data
+        :type sync: function
+        :return: Report of the sync
+        :type return: dict
+        """
+        run = ProviderSyncRun(provider=self, started=timezone.now())
+        started = time.monotonic()
+        report = {}
+        try:
+            report = sync()
+        except Exception as exception:
+            run.error = str(exception) or exception.__class__.__name__
+            raise
+        finally:
+            run.duration = time.monotonic() - started
+            run.not_modified = self.provider_resource._unchanged
+            values = self.provider_resource.telemetry.values
+            for field in ProviderSyncRun.TELEMETRY_FIELDS:
+                setattr(run, field, values[field])
+            for field in ProviderResource.REPORT_FIELDS:
+                setattr(run, field, report.get(field, 0))
+            run.save()
+        return report
+
+
+class ProviderSyncRun(models.Model):
+    """
+    Telemetry of a sync of a Provider, the time of every stage excludes
+    the time of the stages it consumes so they add up to the duration
+    """
+    TELEMETRY_FIELDS = (
+        'fetch_time',
+        'parse_time',
+        'adapt_time',
+        'write_time',
+        'bytes_downloaded',
+        'records_parsed'
+    )
+
+    STAGES = ('fetch', 'parse', 'adapt', 'write')
+
+    provider = models.ForeignKey(
+        'Provider',
+        related_name='sync_runs',
+        on_delete=models.CASCADE
+    )
+    started = models.DateTimeField()
+    duration = models.FloatField(default=0)
+    fetch_time = models.FloatField(default=0)
+    parse_time = models.FloatField(default=0)
+    adapt_time = models.FloatField(default=0)
+    write_time = models.FloatField(default=0)
+    bytes_downloaded = models.BigIntegerField(default=0)
+    records_parsed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    deactivated = models.PositiveIntegerField(default=0)
+    invalid = models.PositiveIntegerField(default=0)
+    not_modified = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-started']
+        indexes = [
+            models.Index(fields=['provider', 'started']),
+            models.Index(fields=['started'])
+        ]
+
+    def __str__(self):
+        return "{}, {}".format(self.provider, str(self.started))
 
-class Event(models.Model):
+
+class Event(AvailabilityModel):
     """
     Event definition
     """
@@ -161,16 +1053,34 @@ class Event(models.Model):
         null=True
     )
     provider_event_id = models.PositiveIntegerField()
+    fingerprint = models.CharField(max_length=32, blank=True)
+    # GIN indexes of the search vector and of the title trigrams are
+    # created by the 0009_search migration on Postgres only
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['created']
-        indexes = [models.Index(fields=['provider'])]
+        indexes = [
+            models.Index(fields=['provider']),
+            models.Index(fields=['active']),
+            models.Index(fields=['created', 'id']),
+            models.Index(fields=['min_price']),
+            models.Index(fields=['max_price']),
+            models.Index(fields=['rest']),
+            models.Index(fields=['numbered'])
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['provider', 'provider_event_id'],
+                name='unique_provider_event'
+            )
+        ]
 
     def __str__(self):
         return self.title
 
 
-class EventDate(models.Model):
+class EventDate(AvailabilityModel):
     """
     Event Date definition
     """
@@ -190,10 +1100,23 @@ class EventDate(models.Model):
         on_delete=models.CASCADE,
     )
     provider_date_id = models.PositiveIntegerField()
+    fingerprint = models.CharField(max_length=32, blank=True)
 
     class Meta:
         ordering = ['date']
-        indexes = [models.Index(fields=['event'])]
+        indexes = [
+            models.Index(fields=['event']),
+            models.Index(
+                fields=['active', 'sale_start_date', 'sale_end_date', 'event']
+            ),
+            models.Index(fields=['active', 'date', 'event'])
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'provider_date_id'],
+                name='unique_event_provider_date'
+            )
+        ]
 
     def __str__(self):
         return "{}, {}".format(self.event, str(self.date))
@@ -202,13 +1125,15 @@ class EventDate(models.Model):
         """
         Get if the event is totally sold out
         """
-        return not self.zones.filter(sold__gt=0).exists()
+        return self.sold_out
 
 
 class Zone(models.Model):
     """
     Event Zone definition
     """
+    DELTA_FIELDS = ('capacity', 'rest', 'price')
+
     uuid = models.UUIDField(
         default=uuid.uuid4,
         editable=False
@@ -224,16 +1149,24 @@ class Zone(models.Model):
         default=0
     )
     numbered = models.BooleanField(default=False)
+    active = models.BooleanField(default=True)
     date = models.ForeignKey(
         'EventDate',
         related_name='zones',
         on_delete=models.CASCADE,
     )
     provider_zone_id = models.PositiveIntegerField()
+    fingerprint = models.CharField(max_length=32, blank=True)
 
     class Meta:
         ordering = ['date']
         indexes = [models.Index(fields=['date'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'provider_zone_id'],
+                name='unique_date_provider_zone'
+            )
+        ]
 
     def __str__(self):
         return "{}, {}".format(self.date, self.name)
@@ -0,0 +1,198 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+from functools import reduce
+from operator import or_
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (created, id), every page is a range scan
+    from the cursor position so deep pages cost the same as the first one.
+    Views can key the pages on other unique orderings with a
+    keyset_ordering attribute. Links are relative so the pages can be
+    cached for any host
+    """
+    ordering = ('created', 'id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        """
+        Get the page size from the request, bounded by the max page size
+
+        :param request: Request of the page
+        :type request: rest_framework.request.Request
+        :return: Page size
+        :type return: int
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.EVENTS_PAGE_SIZE
+        return max(1, min(page_size, settings.EVENTS_MAX_PAGE_SIZE))
+
+    def get_ordering(self, view):
+        """
+        Get the ordering keying the pages, its last field must be unique
+
+        :param view: View of the page
+        :type view: rest_framework.views.APIView
+        :return: Ordering fields, descending ones prefixed with '-'
+        :type return: tuple
+        """
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def encode_cursor(self, obj, reverse):
+        """
+        Encode the position of an object in an opaque cursor
+
+        :param obj: Object at the position
+        :type obj: django.db.models.Model
+        :param reverse: Whether the cursor goes backwards
+        :type reverse: bool
+        :return: Cursor
+        :type return: str
+        """
+        position = []
+        for field in self.keyset_ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        position.append(reverse)
+        return urlsafe_b64encode(
+            json.dumps(position).encode('utf-8')
+        ).decode('ascii')
+
+    def decode_cursor(self, request):
+        """
+        Decode the cursor of the request
+
+        :param request: Request of the page
+        :type request: rest_framework.request.Request
+        :return: Values and direction of the position or None
+        :type return: tuple
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+
+        try:
+            position = json.loads(
+                urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            )
+            *values, reverse = position
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(values) != len(self.keyset_ordering):
+            raise NotFound(self.invalid_cursor_message)
+        for index, value in enumerate(values):
+            if isinstance(value, str):
+                try:
+                    value = parse_datetime(value)
+                except ValueError:
+                    raise NotFound(self.invalid_cursor_message)
+            if not isinstance(value, (datetime, int, float)) \
+                    or isinstance(value, bool):
+                raise NotFound(self.invalid_cursor_message)
+            values[index] = value
+        return values, bool(reverse)
+
+    def get_position_filter(self, values, reverse):
+        """
+        Get the filter of the objects after a position in the ordering
+
+        :param values: Values of the ordering fields at the position
+        :type values: list
+        :param reverse: Whether the objects are before the position
+        :type reverse: bool
+        :return: Filter of the objects
+        :type return: django.db.models.Q
+        """
+        conditions = []
+        equal = {}
+        for field, value in zip(self.keyset_ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            conditions.append(Q(
+                **equal,
+                **{'{}__{}'.format(name, lookup): value}
+            ))
+            equal[name] = value
+        return reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset_ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        reverse = position is not None and position[1]
+
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(position[0], reverse)
+            )
+
+        ordering = self.keyset_ordering
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith('-') else '-' + field
+                for field in ordering
+            ]
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_link(self, obj, reverse):
+        url = self.request.get_full_path()
+        if obj is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(obj, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return self.get_link(None, False)
+        return self.get_link(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.get_link(None, False)
+        return self.get_link(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
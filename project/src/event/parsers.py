@@ -0,0 +1,285 @@
+import codecs
+import json
+import re
+from collections import namedtuple
+from xml.etree.ElementTree import XMLPullParser
+
+JSON = 1
+XML = 2
+
+RESOURCE_TYPES = (
+    (JSON, 'JSON'),
+    (XML, 'XML')
+)
+
+ResourceParser = namedtuple(
+    'ResourceParser',
+    ['parse', 'content_types', 'first_bytes']
+)
+
+RESOURCE_PARSERS = {}
+
+JSON_DECODER = json.JSONDecoder()
+JSON_STRING_CHARS = re.compile(r'["\\]')
+JSON_CONTAINER_CHARS = re.compile(r'["\[\]{}]')
+JSON_SCALAR_CHARS = re.compile(r'["\[\]{},\s]')
+
+XML_RECORD_TAG = 'base_event'
+XML_ATTRIBUTE_PREFIX = '@'
+
+
+def register_parser(resource_type, content_types=(), first_bytes=()):
+    """
+    Register a parser for a resource type, the parser receives the bytes
+    chunks of the resource and yields its records
+
+    :param resource_type: Resource type parsed
+    :type resource_type: int
+    :param content_types: Media types of the resource type
+    :type content_types: tuple
+    :param first_bytes: First non whitespace bytes of the resource type
+    :type first_bytes: tuple
+    :return: Decorator of the parser
+    :type return: function
+    """
+    def decorator(parse):
+        RESOURCE_PARSERS[resource_type] = ResourceParser(
+            parse,
+            content_types,
+            first_bytes
+        )
+        return parse
+    return decorator
+
+
+def get_parser(resource_type):
+    """
+    Get the parser of a resource type
+
+    :param resource_type: Resource type to parse
+    :type resource_type: int
+    :return: Parser of the resource type
+    :type return: function
+    """
+    try:
+        return RESOURCE_PARSERS[resource_type].parse
+    except KeyError:
+        raise ValueError("Unknown resource type {}".format(resource_type))
+
+
+def detect_resource_type(content_type, chunks):
+    """
+    Detect the resource type from the Content-Type header or, if it is
+    unknown, from the first non whitespace byte of the resource
+
+    :param content_type: Content-Type header of the response
+    :type content_type: str
+    :param chunks: Bytes chunks of the resource
+    :type chunks: iterable
+    :return: Resource type and the untouched chunks of the resource
+    :type return: tuple
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    for resource_type, parser in RESOURCE_PARSERS.items():
+        if media_type in parser.content_types:
+            return resource_type, chunks
+
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+
+    def replay():
+        yield head
+        yield from chunks
+
+    first_byte = head.lstrip()[:1]
+    for resource_type, parser in RESOURCE_PARSERS.items():
+        if first_byte in parser.first_bytes:
+            return resource_type, replay()
+    raise ValueError("Unknown resource type")
+
+
+def _element_to_dict(element):
+    """
+    Convert an element into a dict with the xmltodict attribute style,
+    children are always grouped in lists by tag
+
+    :param element: Element to convert
+    :type element: xml.etree.ElementTree.Element
+    :return: Element data
+    :type return: dict
+    """
+    data = {
+        XML_ATTRIBUTE_PREFIX + key: value
+        for key, value in element.attrib.items()
+    }
+    for child in element:
+        data.setdefault(child.tag, []).append(_element_to_dict(child))
+    return data
+
+
+@register_parser(
+    XML,
+    content_types=('application/xml', 'text/xml'),
+    first_bytes=(b'<',)
+)
+def iter_xml_records(chunks):
+    """
+    Parse incrementally a XML resource yielding every record element
+
+    :param chunks: Bytes chunks of the resource
+    :type chunks: iterable
+    :return: Records of the resource
+    :type return: generator
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    parents = []
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                parents.append(element)
+                continue
+
+            parents.pop()
+            if element.tag == XML_RECORD_TAG:
+                yield _element_to_dict(element)
+                if parents:
+                    parents[-1].remove(element)
+    parser.close()
+
+
+def _scan_json_record(text, position, state):
+    """
+    Scan the text of a JSON record for its end, resuming the scan of the
+    previous chunks of the record from its state, so every character is
+    scanned once. Containers and strings end at their closing character
+    and the other scalars at the next delimiter
+
+    :param text: Text of the record from the position
+    :type text: str
+    :param position: Position where the scan resumes
+    :type position: int
+    :param state: Depth of the containers and whether the scan is inside a
+        string or just after an escape of a string, updated in place
+    :type state: list
+    :return: Position after the end of the record, None when the record
+        goes on in the next chunks
+    :type return: int
+    """
+    depth, in_string, escaped = state
+    end = None
+    while end is None:
+        if escaped:
+            if position >= len(text):
+                break
+            escaped = False
+            position += 1
+        if in_string:
+            match = JSON_STRING_CHARS.search(text, position)
+            if match is None:
+                position = len(text)
+                break
+            position = match.end()
+            if match.group() == '\\':
+                escaped = True
+                continue
+            in_string = False
+            if not depth:
+                end = position
+            continue
+
+        chars = JSON_CONTAINER_CHARS if depth else JSON_SCALAR_CHARS
+        match = chars.search(text, position)
+        if match is None:
+            position = len(text)
+            break
+        char = match.group()
+        position = match.end()
+        if char == '"':
+            in_string = True
+        elif char in '[{':
+            depth += 1
+        elif not depth:
+            # A delimiter ends a scalar before it
+            end = match.start()
+        elif char in ']}':
+            depth -= 1
+            if not depth:
+                end = position
+    state[:] = depth, in_string, escaped
+    return end
+
+
+@register_parser(
+    JSON,
+    content_types=('application/json', 'text/json'),
+    first_bytes=(b'[',)
+)
+def iter_json_records(chunks):
+    """
+    Parse incrementally a JSON array resource yielding every item. The end
+    of every item is found scanning the chunks once, then the item is
+    decoded at once
+
+    :param chunks: Bytes chunks of the resource
+    :type chunks: iterable
+    :return: Records of the resource
+    :type return: generator
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    text = ''
+    position = 0
+    started = False
+    finished = False
+    # Text of the previous chunks of the item being read and its scan
+    pending = None
+    state = None
+
+    while True:
+        if pending is None:
+            while position < len(text) and text[position] in ' \t\r\n,':
+                position += 1
+
+            if position < len(text):
+                if not started:
+                    if text[position] != '[':
+                        raise ValueError("Resource is not a JSON array")
+                    started = True
+                    position += 1
+                    continue
+
+                if text[position] == ']':
+                    return
+
+                pending = []
+                state = [0, False, False]
+                scanned = position
+            elif finished:
+                raise ValueError("Unexpected end of JSON resource")
+
+        if pending is not None:
+            end = _scan_json_record(text, scanned, state)
+            if end is not None:
+                pending.append(text[position:end])
+                yield JSON_DECODER.decode(''.join(pending))
+                pending = None
+                position = end
+                continue
+            if finished:
+                raise ValueError("Unexpected end of JSON resource")
+            pending.append(text[position:])
+
+        position = 0
+        scanned = 0
+        chunk = next(chunks, None)
+        if chunk is None:
+            text = decoder.decode(b'', final=True)
+            finished = True
+        else:
+            text = decoder.decode(chunk)
@@ -0,0 +1,46 @@
+import hashlib
+import hmac
+from rest_framework.permissions import BasePermission
+
+from django.conf import settings
+
+
+class HasMetricsToken(BasePermission):
+    """
+    Allow the requests with the METRICS_TOKEN as bearer token, for the
+    scrapers of the metrics, and the staff users
+    """
+    keyword = 'Bearer '
+
+    def has_permission(self, request, view):
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        if settings.METRICS_TOKEN and authorization.startswith(self.keyword):
+            return hmac.compare_digest(
+                authorization[len(self.keyword):].encode('utf-8'),
+                settings.METRICS_TOKEN.encode('utf-8')
+            )
+        return bool(request.user and request.user.is_staff)
+
+
+class HasProviderSignature(BasePermission):
+    """
+    Allow the requests to a provider whose body is signed with the
+    webhook secret of the provider, the X-Provider-Signature header has
+    the hex HMAC-SHA256 of the body prefixed with 'sha256='. Providers
+    without a secret refuse every request
+    """
+    prefix = 'sha256='
+
+    def has_object_permission(self, request, view, obj):
+        signature = request.META.get('HTTP_X_PROVIDER_SIGNATURE', '')
+        if not obj.webhook_secret or not signature.startswith(self.prefix):
+            return False
+        expected = hmac.new(
+            obj.webhook_secret.encode('utf-8'),
+            request.body,
+            hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(
+            signature[len(self.prefix):].encode('utf-8'),
+            expected.encode('utf-8')
+        )
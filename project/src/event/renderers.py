@@ -0,0 +1,124 @@
+import json
+from json.encoder import encode_basestring
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from django.conf import settings
+
+from .services import iter_batches
+
+
+def encode_string(value):
+    """
+    Encode a string as the compact JSONRenderer does, line and paragraph
+    separators are escaped to keep the output a javascript subset
+
+    :param value: String to encode
+    :type value: str
+    :return: JSON string
+    :type return: str
+    """
+    return encode_basestring(value).replace(
+        '\u2028', '\\u2028'
+    ).replace('\u2029', '\\u2029')
+
+
+def get_field_encoder(field):
+    """
+    Get a function encoding the values of a serializer field straight
+    into JSON, the output is the same as rendering the representation
+    of the field
+
+    :param field: Serializer field
+    :type field: rest_framework.fields.Field
+    :return: Encoder of the values of the field
+    :type return: function
+    """
+    if isinstance(field, serializers.BooleanField):
+        return lambda value: 'true' if value else 'false'
+    if isinstance(field, serializers.IntegerField):
+        return lambda value: str(int(value))
+    if isinstance(field, serializers.UUIDField) \
+            and field.uuid_format == 'hex_verbose':
+        return lambda value: '"{}"'.format(value)
+    if isinstance(field, serializers.CharField):
+        return lambda value: encode_string(str(value))
+    if isinstance(field, serializers.DecimalField) and getattr(
+        field,
+        'coerce_to_string',
+        api_settings.COERCE_DECIMAL_TO_STRING
+    ) and not field.localize and field.decimal_places is not None:
+        exponent = -field.decimal_places
+
+        def encode_decimal(value):
+            if value.as_tuple().exponent == exponent:
+                return '"{:f}"'.format(value)
+            return encode_string(field.to_representation(value))
+        return encode_decimal
+
+    def encode_value(value):
+        return json.dumps(
+            field.to_representation(value),
+            cls=JSONEncoder,
+            ensure_ascii=False,
+            separators=(',', ':')
+        ).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return encode_value
+
+
+def get_row_encoder(serializer):
+    """
+    Get a function encoding a row with the fields of a flat serializer
+    into the same JSON object that the serializer renders
+
+    :param serializer: Serializer of the rows
+    :type serializer: rest_framework.serializers.Serializer
+    :return: Encoder of the rows, they need an attribute by field source
+    :type return: function
+    """
+    fields = [
+        (
+            '{}:'.format(encode_string(name)),
+            field.source,
+            get_field_encoder(field)
+        )
+        for name, field in serializer.fields.items()
+    ]
+
+    def encode_row(row):
+        parts = []
+        for key, source, encode in fields:
+            value = getattr(row, source)
+            parts.append(key + ('null' if value is None else encode(value)))
+        return '{' + ','.join(parts) + '}'
+    return encode_row
+
+
+def iter_page_json(rows, encode_row, next_link, previous_link):
+    """
+    Encode a page of rows in the paginated JSON chunk by chunk
+
+    :param rows: Rows of the page
+    :type rows: list
+    :param encode_row: Encoder of the rows
+    :type encode_row: function
+    :param next_link: Link to the next page
+    :type next_link: str
+    :param previous_link: Link to the previous page
+    :type previous_link: str
+    :return: JSON bytes chunks
+    :type return: generator
+    """
+    yield '{{"next":{},"previous":{},"results":['.format(
+        'null' if next_link is None else encode_string(next_link),
+        'null' if previous_link is None else encode_string(previous_link)
+    ).encode('utf-8')
+
+    separator = ''
+    for batch in iter_batches(rows, settings.EVENTS_STREAM_CHUNK_ROWS):
+        yield (
+            separator + ','.join(encode_row(row) for row in batch)
+        ).encode('utf-8')
+        separator = ','
+    yield b']}'
@@ -0,0 +1,53 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY_STICKY_KEY = 'databases:primary'
+
+_state = threading.local()
+
+
+def stick_to_primary():
+    """
+    Send the reads of the API to the primary database for the next
+    DATABASE_REPLICA_STICKY_TIME seconds, so the lists queried after an
+    ingest read its writes even when the replica lags behind
+    """
+    cache.set(PRIMARY_STICKY_KEY, True, settings.DATABASE_REPLICA_STICKY_TIME)
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Route the reads inside the block to the DATABASE_REPLICA database,
+    unless there is no replica or the primary is sticky after an ingest.
+    The reads outside the block, like the ones of the ingest itself,
+    always go to the primary
+    """
+    previous = getattr(_state, 'alias', None)
+    if settings.DATABASE_REPLICA and not cache.get(PRIMARY_STICKY_KEY):
+        _state.alias = settings.DATABASE_REPLICA
+    else:
+        _state.alias = None
+    try:
+        yield
+    finally:
+        _state.alias = previous
+
+
+class ReplicaRouter(object):
+    """
+    Route the reads of the read_from_replica blocks to the replica and
+    every other query to the primary database
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'alias', None) or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,513 @@
+import json
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from operator import itemgetter
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import parsers
+
+EVENT = 0
+DATE = 1
+ZONE = 2
+
+LEVEL_NAMES = ('event', 'date', 'zone')
+CHILDREN = ('dates', 'zones')
+
+# Column with the row of the parent of every date and zone of a batch
+PARENT = 'parent'
+
+# Standard fields by name: level of the standard form, default type and
+# whether the resource has to provide them
+STANDARD_FIELDS = {
+    'provider_event_id': (EVENT, 'int', True),
+    'title': (EVENT, 'str', True),
+    'active': (EVENT, 'bool', False),
+    'provider_date_id': (DATE, 'int', True),
+    'date': (DATE, 'datetime', True),
+    'sale_start_date': (DATE, 'datetime', True),
+    'sale_end_date': (DATE, 'datetime', True),
+    'provider_zone_id': (ZONE, 'int', True),
+    'name': (ZONE, 'str', True),
+    'capacity': (ZONE, 'int', True),
+    'rest': (ZONE, 'int', True),
+    'price': (ZONE, 'decimal', True),
+    'numbered': (ZONE, 'bool', True),
+}
+
+DEFAULT_SCHEMA = {
+    'levels': ['base_event', 'event', 'zone'],
+    'fields': {
+        'provider_event_id': 'base_event.@base_event_id',
+        'title': 'base_event.@title',
+        'provider_date_id': 'event.@event_id',
+        'date': 'event.@event_date',
+        'sale_start_date': 'event.@sell_from',
+        'sale_end_date': 'event.@sell_to',
+        'provider_zone_id': 'zone.@zone_id',
+        'name': 'zone.@name',
+        'capacity': 'zone.@capacity',
+        'rest': 'zone.@capacity',
+        'price': 'zone.@max_price',
+        'numbered': 'zone.@numbered',
+    }
+}
+
+TRUE_VALUES = ('true', '1', 'yes')
+FALSE_VALUES = ('false', '0', 'no')
+
+# Largest value of the positive integer fields of the models
+MAX_INT = 2147483647
+
+# Bounds of the decimal fields of the models by standard field
+DECIMAL_BOUNDS = {
+    'price': {'max_digits': 5, 'decimal_places': 2},
+}
+
+Coercer = namedtuple('Coercer', ['build', 'repeated'])
+
+COERCERS = {}
+
+COERCION_ERRORS = (ArithmeticError, TypeError, ValueError)
+EXTRACTION_ERRORS = (AttributeError, IndexError, KeyError, TypeError)
+
+# Batch of records in the standard form split in columns by level, rows
+# with invalid values are left out with their children and reported in
+# the errors
+ColumnBatch = namedtuple(
+    'ColumnBatch',
+    ['events', 'dates', 'zones', 'errors']
+)
+
+SchemaField = namedtuple(
+    'SchemaField',
+    ['name', 'level', 'path_level', 'keys', 'type', 'options', 'required']
+)
+
+
+def register_coercer(name, repeated=False):
+    """
+    Register a coercer of resource values for a field type, the coercer
+    receives the options of the field and returns the coercion function
+
+    :param name: Field type
+    :type name: str
+    :param repeated: Whether the values repeat across the records, the
+        columns are then coerced once by distinct value
+    :type repeated: bool
+    :return: Decorator of the coercer
+    :type return: function
+    """
+    def decorator(build):
+        COERCERS[name] = Coercer(build, repeated)
+        return build
+    return decorator
+
+
+@register_coercer('str')
+def build_str_coercer(options):
+    return str
+
+
+@register_coercer('int')
+def build_int_coercer(options):
+    def coerce_int(value):
+        value = int(value)
+        if not 0 <= value <= MAX_INT:
+            raise ValueError("Out of range")
+        return value
+    return coerce_int
+
+
+@register_coercer('decimal', repeated=True)
+def build_decimal_coercer(options):
+    max_digits = options.get('max_digits')
+    decimal_places = options.get('decimal_places')
+    exponent = None
+    if decimal_places is not None:
+        exponent = Decimal(1).scaleb(-decimal_places)
+
+    def coerce_decimal(value):
+        value = Decimal(value)
+        if not value.is_finite() or value < 0:
+            raise ValueError("Out of range")
+        if exponent is not None:
+            value = value.quantize(exponent)
+        digits = value.as_tuple().digits
+        if max_digits is not None and len(digits) > max_digits:
+            raise ValueError("Out of range")
+        return value
+    return coerce_decimal
+
+
+@register_coercer('bool', repeated=True)
+def build_bool_coercer(options):
+    def coerce_bool(value):
+        if isinstance(value, bool):
+            return value
+        value = str(value).lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise ValueError("Invalid boolean")
+    return coerce_bool
+
+
+@register_coercer('datetime', repeated=True)
+def build_datetime_coercer(options):
+    datetime_format = options.get('format')
+
+    # Feeds repeat the same dates in many records
+    @lru_cache(maxsize=1024)
+    def coerce_datetime(value):
+        if datetime_format:
+            value = datetime.strptime(value, datetime_format)
+        else:
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError("Invalid datetime")
+        if timezone.is_naive(value):
+            return timezone.make_aware(value)
+        return value
+    return coerce_datetime
+
+
+def _build_value_getter(keys, default, required):
+    """
+    Build the getter of the raw value of a field from the record of its
+    path level, required single key paths are plain item getters
+
+    :param keys: Keys of the value inside the record
+    :type keys: tuple
+    :param default: Raw value when the resource does not provide it
+    :type default: object
+    :param required: Whether the resource has to provide the value
+    :type required: bool
+    :return: Getter receiving the record
+    :type return: function
+    """
+    if len(keys) == 1:
+        key = keys[0]
+        if required:
+            return itemgetter(key)
+
+        def get(record):
+            value = record.get(key)
+            return default if value is None else value
+        return get
+
+    def get_nested(record):
+        value = record
+        for key in keys:
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if value is None:
+                break
+            value = value[key] if required else value.get(key)
+        return default if value is None else value
+    return get_nested
+
+
+def _extract_column(get, records):
+    """
+    Extract the raw values of a field from the records of its path level,
+    when any value is missing the records are read again one by one to
+    report the failing rows
+
+    :param get: Getter of the raw value
+    :type get: function
+    :param records: Records of the path level
+    :type records: list
+    :return: Raw values and the errors by row
+    :type return: tuple
+    """
+    try:
+        return list(map(get, records)), {}
+    except EXTRACTION_ERRORS:
+        pass
+
+    column = []
+    errors = {}
+    for row, record in enumerate(records):
+        try:
+            column.append(get(record))
+        except EXTRACTION_ERRORS:
+            column.append(None)
+            errors[row] = "Missing value"
+    return column, errors
+
+
+def _coerce_column(coerce, values, distinct, required):
+    """
+    Coerce a column of raw values in batch, when any value is invalid or
+    a required value is empty the values are coerced again one by one to
+    report the failing rows. Empty optional values are kept empty
+
+    :param coerce: Coercion of the values
+    :type coerce: function
+    :param values: Raw values
+    :type values: list
+    :param distinct: Whether to coerce once every distinct value, for
+        repeated or nullable values
+    :type distinct: bool
+    :param required: Whether the resource has to provide the values
+    :type required: bool
+    :return: Coerced values and the errors by row
+    :type return: tuple
+    """
+    if not required or None not in values:
+        try:
+            if distinct:
+                coerced = {
+                    value: coerce(value)
+                    for value in set(values)
+                    if value is not None
+                }
+                coerced[None] = None
+                return list(map(coerced.__getitem__, values)), {}
+            return list(map(coerce, values)), {}
+        except COERCION_ERRORS:
+            pass
+
+    column = []
+    errors = {}
+    for row, value in enumerate(values):
+        if value is None:
+            column.append(None)
+            if required:
+                errors[row] = "Missing value"
+            continue
+        try:
+            column.append(coerce(value))
+        except COERCION_ERRORS:
+            column.append(None)
+            errors[row] = "Invalid value {!r}".format(value)
+    return column, errors
+
+
+def load_schema(schema):
+    """
+    Load a schema stored as JSON, an empty schema is the default one
+
+    :param schema: Schema in JSON format
+    :type schema: str
+    :return: Schema
+    :type return: dict
+    """
+    if not schema:
+        return DEFAULT_SCHEMA
+    return json.loads(schema)
+
+
+def _compile_fields(schema, resource_type):
+    """
+    Validate a schema and resolve the path of every standard field it
+    provides
+
+    :param schema: Schema in JSON format, empty for the default one
+    :type schema: str
+    :param resource_type: Resource type of the records
+    :type resource_type: int
+    :return: Keys of the levels in the resource and the schema fields
+    :type return: tuple
+    """
+    schema = load_schema(schema)
+    levels = tuple(schema['levels'])
+    if len(levels) != len(CHILDREN) + 1:
+        raise ValueError("The schema needs {} levels".format(
+            len(CHILDREN) + 1
+        ))
+
+    fields = schema['fields']
+    unknown = set(fields) - set(STANDARD_FIELDS)
+    if unknown:
+        raise ValueError("Unknown fields {}".format(sorted(unknown)))
+
+    schema_fields = []
+    for name, (level, field_type, required) in STANDARD_FIELDS.items():
+        options = fields.get(name)
+        if options is None:
+            if required:
+                raise ValueError("Missing field {}".format(name))
+            continue
+        if isinstance(options, str):
+            options = {'path': options}
+        if name in DECIMAL_BOUNDS:
+            options = dict(options, **DECIMAL_BOUNDS[name])
+
+        level_key, *keys = options['path'].split('.')
+        if level_key not in levels or not keys:
+            raise ValueError("Invalid path {}".format(options['path']))
+        path_level = levels.index(level_key)
+        if path_level > level:
+            raise ValueError("Field {} is above {}".format(name, level_key))
+        if resource_type != parsers.XML:
+            keys = [key.lstrip(parsers.XML_ATTRIBUTE_PREFIX) for key in keys]
+
+        field_type = options.get('type', field_type)
+        if field_type not in COERCERS:
+            raise ValueError("Unknown type {}".format(field_type))
+        schema_fields.append(SchemaField(
+            name,
+            level,
+            path_level,
+            tuple(keys),
+            field_type,
+            options,
+            required and 'default' not in options
+        ))
+    return levels, schema_fields
+
+
+@lru_cache(maxsize=None)
+def compile_normalizer(schema, resource_type):
+    """
+    Compile a schema into the function normalizing a batch of records of a
+    resource into a ColumnBatch. The values are extracted and coerced
+    column by column, the fields read from a parent record are coerced
+    once by parent and then spread to its children
+
+    :param schema: Schema in JSON format, empty for the default one
+    :type schema: str
+    :param resource_type: Resource type of the records
+    :type resource_type: int
+    :return: Normalizer receiving the records and the number of the first
+        one in the resource
+    :type return: function
+    """
+    levels, fields = _compile_fields(schema, resource_type)
+    columns = []
+    for field in fields:
+        coercer = COERCERS[field.type]
+        coerce = coercer.build(field.options)
+        default = field.options.get('default')
+        if default is not None:
+            coerce(default)
+        columns.append((
+            field,
+            _build_value_getter(field.keys, default, field.required),
+            coerce,
+            coercer.repeated or not field.required
+        ))
+
+    def normalize(records, first=0):
+        rows = [list(records)]
+        parents = [None]
+        for key in levels[1:]:
+            level_rows = []
+            level_parents = []
+            for row, record in enumerate(rows[-1]):
+                children = record.get(key) or ()
+                if isinstance(children, dict):
+                    children = (children,)
+                level_rows.extend(children)
+                level_parents.extend([row] * len(children))
+            rows.append(level_rows)
+            parents.append(level_parents)
+
+        values = {}
+        errors = [{} for _ in levels]
+        for field, get, coerce, distinct in columns:
+            level_errors = errors[field.path_level]
+            column, missing = _extract_column(get, rows[field.path_level])
+            column, invalid = _coerce_column(
+                coerce,
+                column,
+                distinct,
+                field.required
+            )
+            for row, error in list(missing.items()) + list(invalid.items()):
+                level_errors.setdefault(row, (field.name, error))
+            values[field.name] = column
+
+        kept = _get_kept_rows(rows, parents, errors)
+        batch = [{} for _ in levels]
+        for field in fields:
+            column = values[field.name]
+            for level in range(field.path_level + 1, field.level + 1):
+                column = list(map(column.__getitem__, parents[level]))
+            if kept[field.level] is not None:
+                column = list(map(column.__getitem__, kept[field.level]))
+            batch[field.level][field.name] = column
+        for level in range(1, len(levels)):
+            batch[level][PARENT] = _get_kept_parents(
+                parents[level],
+                kept[level - 1],
+                kept[level]
+            )
+
+        row_errors = []
+        for level, level_errors in enumerate(errors):
+            for row, (name, error) in level_errors.items():
+                record = row
+                for parent_level in range(level, 0, -1):
+                    record = parents[parent_level][record]
+                row_errors.append({
+                    'record': first + record,
+                    'level': LEVEL_NAMES[level],
+                    'field': name,
+                    'error': error
+                })
+        row_errors.sort(key=itemgetter('record'))
+        return ColumnBatch(*batch, errors=row_errors)
+    return normalize
+
+
+def _get_kept_rows(rows, parents, errors):
+    """
+    Get the rows of every level without errors whose parent is kept
+
+    :param rows: Records by level
+    :type rows: list
+    :param parents: Parent rows by level
+    :type parents: list
+    :param errors: Errors by row by level
+    :type errors: list
+    :return: Kept rows by level, None when every row is kept
+    :type return: list
+    """
+    kept = []
+    for level, level_errors in enumerate(errors):
+        parent_kept = kept[-1] if kept else None
+        if not level_errors and parent_kept is None:
+            kept.append(None)
+            continue
+
+        if parent_kept is None:
+            valid_parents = None
+        else:
+            valid_parents = set(parent_kept)
+        kept.append([
+            row for row in range(len(rows[level]))
+            if row not in level_errors and (
+                valid_parents is None or
+                parents[level][row] in valid_parents
+            )
+        ])
+    return kept
+
+
+def _get_kept_parents(parents, parent_kept, kept):
+    """
+    Get the parent column of the kept rows of a level pointing to the kept
+    rows of the parent level
+
+    :param parents: Parent row of every row of the level
+    :type parents: list
+    :param parent_kept: Kept rows of the parent level, None for all
+    :type parent_kept: list
+    :param kept: Kept rows of the level, None for all
+    :type kept: list
+    :return: Parent column
+    :type return: list
+    """
+    if kept is not None:
+        parents = list(map(parents.__getitem__, kept))
+    if parent_kept is None:
+        return parents
+    position = {row: index for index, row in enumerate(parent_kept)}
+    return list(map(position.__getitem__, parents))
@@ -1,11 +1,151 @@
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (
+    DecimalField, IntegerField, ModelSerializer, Serializer, UUIDField,
+    ValidationError
+)
 
-from .models import Event
+from django.conf import settings
 
+from .models import Event, EventDate, ProviderSyncRun, Zone
 
-class EventSerializer(ModelSerializer):
+
+class ExpandableSerializer(ModelSerializer):
+    """
+    Serializer whose expandable fields are only included when their
+    relation is in the expand of the context
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super(ExpandableSerializer, self).get_fields()
+        expand = self.context.get('expand', ())
+        for name, relation in self.expandable_fields.items():
+            if relation not in expand:
+                fields.pop(name)
+        return fields
+
+
+class ZoneSerializer(ModelSerializer):
+
+    class Meta:
+        model = Zone
+        fields = (
+            'uuid',
+            'name',
+            'capacity',
+            'rest',
+            'price',
+            'numbered',
+        )
+        read_only_fields = fields
+
+
+class EventDateSerializer(ExpandableSerializer):
+    zones = ZoneSerializer(many=True, read_only=True, source='active_zones')
+
+    expandable_fields = {'zones': 'zones'}
+
+    class Meta:
+        model = EventDate
+        fields = (
+            'uuid',
+            'date',
+            'sale_start_date',
+            'sale_end_date',
+            'capacity',
+            'rest',
+            'min_price',
+            'max_price',
+            'sold_out',
+            'numbered',
+            'zones',
+        )
+        read_only_fields = fields
+
+
+class EventSerializer(ExpandableSerializer):
+    dates = EventDateSerializer(
+        many=True,
+        read_only=True,
+        source='expanded_dates'
+    )
+
+    expandable_fields = {'dates': 'dates'}
 
     class Meta:
         model = Event
-        fields = ('uuid', 'title', )
-        read_only_fields = ('uuid', 'title', )
+        fields = (
+            'uuid',
+            'title',
+            'capacity',
+            'rest',
+            'min_price',
+            'max_price',
+            'sold_out',
+            'numbered',
+            'dates',
+        )
+        read_only_fields = fields
+
+
+class ProviderSyncRunSerializer(ModelSerializer):
+    provider = UUIDField(source='provider.uuid', read_only=True)
+
+    class Meta:
+        model = ProviderSyncRun
+        fields = (
+            'provider',
+            'started',
+            'duration',
+            'fetch_time',
+            'parse_time',
+            'adapt_time',
+            'write_time',
+            'bytes_downloaded',
+            'records_parsed',
+            'created',
+            'updated',
+            'unchanged',
+            'deactivated',
+            'invalid',
+            'not_modified',
+            'error',
+        )
+        read_only_fields = fields
+
+
+class ZoneDeltaSerializer(Serializer):
+    """
+    Availability delta of a zone keyed by the provider ids of the zone,
+    its date and its event
+    """
+    provider_event_id = IntegerField(min_value=0)
+    provider_date_id = IntegerField(min_value=0)
+    provider_zone_id = IntegerField(min_value=0)
+    capacity = IntegerField(min_value=0, required=False)
+    rest = IntegerField(min_value=0, required=False)
+    price = DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        min_value=0,
+        required=False
+    )
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in Zone.DELTA_FIELDS):
+            raise ValidationError(
+                "A delta needs any of {}".format(', '.join(Zone.DELTA_FIELDS))
+            )
+        return attrs
+
+
+class AvailabilityDeltaSerializer(Serializer):
+    zones = ZoneDeltaSerializer(many=True, allow_empty=False)
+
+    def validate_zones(self, zones):
+        if len(zones) > settings.INGEST_DELTA_MAX_ZONES:
+            raise ValidationError(
+                "Ensure this field has no more than {} deltas".format(
+                    settings.INGEST_DELTA_MAX_ZONES
+                )
+            )
+        return zones
@@ -1,7 +1,16 @@
-from datetime import datetime
+import hashlib
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, time
+from itertools import islice
+from time import perf_counter
+from tempfile import SpooledTemporaryFile
 
+from django.conf import settings
 from django.utils import timezone
 
+EXPAND_RELATIONS = ('dates', 'zones')
+
 
 def check_date(date):
     """
@@ -21,3 +30,171 @@ def check_date(date):
         return None
     except ValueError:
         return None
+
+
+def day_start(date):
+    """
+    Get the first instant of a date in the current timezone, comparing
+    datetimes against it keeps the filters on indexed columns
+
+    :param date: A date
+    :type date: datetime.date
+    :return: First instant of the date
+    :type return: datetime.datetime
+    """
+    return timezone.make_aware(
+        datetime.combine(date, time.min),
+        timezone.get_current_timezone()
+    )
+
+
+def iter_batches(iterable, size):
+    """
+    Split an iterable in lists of a maximum size
+
+    :param iterable: Items to split
+    :type iterable: iterable
+    :param size: Maximum size of every batch
+    :type size: int
+    :return: Batches of items
+    :type return: generator
+    """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def iter_file_chunks(path):
+    """
+    Iterate the content of a local file in chunks of INGEST_CHUNK_SIZE,
+    the file is closed when the iteration ends or it is abandoned
+
+    :param path: Path of the file
+    :type path: str
+    :return: Bytes chunks of the content
+    :type return: generator
+    """
+    with open(path, 'rb') as resource_file:
+        chunk = resource_file.read(settings.INGEST_CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = resource_file.read(settings.INGEST_CHUNK_SIZE)
+
+
+def spool_chunks(chunks):
+    """
+    Consume the bytes chunks of a resource into a temporary file,
+    spooled to disk when it is big, while computing its hash
+
+    :param chunks: Bytes chunks of the resource
+    :type chunks: iterable
+    :return: SHA-256 hex digest of the resource and its replayed chunks
+    :type return: tuple
+    """
+    content_hash = hashlib.sha256()
+    spool = SpooledTemporaryFile(max_size=settings.INGEST_SPOOL_MAX_SIZE)
+    for chunk in chunks:
+        content_hash.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+
+    def replay():
+        with spool:
+            for chunk in iter(
+                lambda: spool.read(settings.INGEST_CHUNK_SIZE), b''
+            ):
+                yield chunk
+
+    return content_hash.hexdigest(), replay()
+
+
+class Telemetry(object):
+    """
+    Timings and counters of the stages of a pipeline of iterators. The
+    time of a stage excludes the time spent in the nested stages it
+    consumes, so the stages of a streamed sync add up to its duration
+    """
+
+    def __init__(self):
+        self.values = Counter()
+        self._nested = 0.0
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of code as a stage
+
+        :param name: Name of the stage
+        :type name: str
+        """
+        nested, self._nested = self._nested, 0.0
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - started
+            self.values['{}_time'.format(name)] += elapsed - self._nested
+            self._nested = nested + elapsed
+
+    def iter_stage(self, iterable, name, counter=None, size=None):
+        """
+        Iterate timing as a stage the getting of every item, the items can
+        be counted too
+
+        :param iterable: Items of the stage
+        :type iterable: iterable
+        :param name: Name of the stage
+        :type name: str
+        :param counter: Name of the counter of the items
+        :type counter: str
+        :param size: Function getting the amount to count by item, one by
+            default
+        :type size: function
+        :return: Items of the stage
+        :type return: generator
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if counter:
+                self.values[counter] += size(item) if size else 1
+            yield item
+
+
+def fingerprint(values):
+    """
+    Get a stable fingerprint of the values of a row
+
+    :param values: Values of the row in a fixed order
+    :type values: iterable
+    :return: MD5 hex digest of the values
+    :type return: str
+    """
+    return hashlib.md5(
+        '\x1f'.join(str(value) for value in values).encode('utf-8')
+    ).hexdigest()
+
+
+def check_expand(expand):
+    """
+    Get the expanded relations requested in a comma separated list,
+    unknown relations are ignored and zones are expanded inside dates
+
+    :param expand: Relations to expand in string format
+    :type expand: str
+    :return: Relations to expand
+    :type return: frozenset
+    """
+    relations = {
+        relation.strip()
+        for relation in (expand or '').split(',')
+    } & set(EXPAND_RELATIONS)
+    if 'zones' in relations:
+        relations.add('dates')
+    return frozenset(relations)
@@ -1,10 +1,188 @@
+import time
+from datetime import datetime, timedelta
+from celery import chord, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
 from celery.schedules import crontab
 from celery.task import periodic_task
+from celery.utils.log import get_task_logger
 
-from .models import Provider
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import reverse
+from django.utils import timezone
+
+from .exceptions import ProviderLockedException
+from .models import Provider, ProviderResource, ProviderSyncRun
+from .views import EventListView
+
+logger = get_task_logger(__name__)
 
 
 @periodic_task(run_every=(crontab(minute='0', hour='3')), name="get_provider_events_task")
 def get_provider_events_task():
-    for provider in Provider.objects.all():
-        provider.get_external_events()
+    """
+    Dispatch the ingest of every provider in parallel, one subtask per
+    provider routed to the INGEST_QUEUE queue, whose worker ingests
+    INGEST_CONCURRENCY providers at the same time, so a slow provider only
+    holds its own worker process. The ingest is summarized once every
+    provider is done. A subtask killed by the hard time limit fails the
+    chord without stopping the other providers, and the summary is then
+    built from the sync runs, reporting the killed providers as errors.
+    The sync runs older than INGEST_SYNC_RUNS_KEEP_DAYS are deleted
+    """
+    ProviderSyncRun.objects.filter(
+        started__lt=timezone.now() - timedelta(
+            days=settings.INGEST_SYNC_RUNS_KEEP_DAYS
+        )
+    ).delete()
+
+    provider_ids = list(Provider.objects.values_list('id', flat=True))
+    if not provider_ids:
+        return
+
+    started = time.time()
+    chord(
+        get_provider_events_subtask.s(provider_id)
+        for provider_id in provider_ids
+    )(
+        summarize_provider_events_task.s(started).on_error(
+            summarize_provider_sync_runs_task.s(provider_ids, started)
+        )
+    )
+
+
+@shared_task(
+    name="get_provider_events_subtask",
+    soft_time_limit=settings.INGEST_PROVIDER_SOFT_TIME_LIMIT,
+    time_limit=settings.INGEST_PROVIDER_TIME_LIMIT
+)
+def get_provider_events_subtask(provider_id):
+    """
+    Ingest the events of a provider, errors are reported in the summary
+    so they do not fail the ingest of the other providers
+
+    :param provider_id: Id of the provider to ingest
+    :type provider_id: int
+    :return: Summary of the provider
+    :type return: dict
+    """
+    summary = {field: 0 for field in ProviderResource.REPORT_FIELDS}
+    summary.update(provider=provider_id, error=None)
+    started = time.monotonic()
+    try:
+        provider = Provider.objects.get(id=provider_id)
+        summary.update(provider.get_external_events())
+    except SoftTimeLimitExceeded:
+        summary['error'] = "Time limit exceeded"
+    except ProviderLockedException as exception:
+        summary['error'] = str(exception)
+    except Exception as exception:
+        logger.exception("Error ingesting provider %s", provider_id)
+        summary['error'] = str(exception)
+    summary['duration'] = time.monotonic() - started
+    return summary
+
+
+@shared_task(name="summarize_provider_events_task")
+def summarize_provider_events_task(providers, started):
+    """
+    Aggregate the summaries of every provider ingest
+
+    :param providers: Summaries of every provider
+    :type providers: list
+    :param started: Timestamp of the dispatch of the ingest
+    :type started: float
+    :return: Summary of the ingest
+    :type return: dict
+    """
+    result = {
+        field: sum(summary.get(field, 0) for summary in providers)
+        for field in ProviderResource.REPORT_FIELDS
+    }
+    result.update(
+        providers=providers,
+        errors=sum(1 for summary in providers if summary['error']),
+        duration=time.time() - started
+    )
+    logger.info(
+        "Ingested %s providers: %s created, %s updated, %s unchanged, "
+        "%s deactivated, %s errors in %.2fs",
+        len(providers),
+        result['created'],
+        result['updated'],
+        result['unchanged'],
+        result['deactivated'],
+        result['errors'],
+        result['duration']
+    )
+    if ProviderResource.has_changes(result):
+        warm_events_cache_task.delay()
+    return result
+
+
+@shared_task(name="summarize_provider_sync_runs_task")
+def summarize_provider_sync_runs_task(task_id, provider_ids, started):
+    """
+    Aggregate the sync runs of an ingest whose chord failed, the providers
+    without a sync run were killed by the hard time limit
+
+    :param task_id: Id of the summary task of the failed chord
+    :type task_id: str
+    :param provider_ids: Ids of the ingested providers
+    :type provider_ids: list
+    :param started: Timestamp of the dispatch of the ingest
+    :type started: float
+    :return: Summary of the ingest
+    :type return: dict
+    """
+    runs = {
+        run.provider_id: run
+        for run in ProviderSyncRun.objects.filter(
+            provider_id__in=provider_ids,
+            started__gte=datetime.fromtimestamp(started, timezone.utc)
+        ).order_by('started')
+    }
+    providers = []
+    for provider_id in provider_ids:
+        summary = {field: 0 for field in ProviderResource.REPORT_FIELDS}
+        summary.update(
+            provider=provider_id,
+            error="Killed by the time limit",
+            duration=0
+        )
+        run = runs.get(provider_id)
+        if run is not None:
+            summary.update(
+                {
+                    field: getattr(run, field)
+                    for field in ProviderResource.REPORT_FIELDS
+                },
+                error=run.error or None,
+                duration=run.duration
+            )
+        providers.append(summary)
+    return summarize_provider_events_task(providers, started)
+
+
+@shared_task(name="warm_events_cache_task")
+def warm_events_cache_task():
+    """
+    Cache the first page of the most requested events lists, the ranges
+    are EVENTS_CACHE_WARM_RANGES days from today
+    """
+    view = EventListView.as_view()
+    today = timezone.localdate()
+    for start_days, end_days in settings.EVENTS_CACHE_WARM_RANGES:
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = reverse('events')
+        request.GET = QueryDict(mutable=True)
+        if start_days is not None:
+            request.GET['start_date'] = str(today + timedelta(start_days))
+        if end_days is not None:
+            request.GET['end_date'] = str(today + timedelta(end_days))
+        request.META['QUERY_STRING'] = request.GET.urlencode()
+        response = view(request)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
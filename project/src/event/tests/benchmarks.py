@@ -0,0 +1,979 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from tempfile import TemporaryDirectory
+import requests
+
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.test import (
+    LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import (
+    Event, EventDate, Provider, ProviderResource, get_search_vector
+)
+from ..parsers import JSON, XML, XML_ATTRIBUTE_PREFIX
+from ..schemas import (
+    CHILDREN, COERCERS, DEFAULT_SCHEMA, STANDARD_FIELDS, compile_normalizer
+)
+from ..services import iter_batches
+from .feeds import (
+    FEED_EXTENSIONS, columns_from_records, iter_feed_records, write_feed
+)
+from .stub_server import StubServer
+
+BENCHMARK_SIZES = [
+    int(size)
+    for size in os.getenv('BENCHMARK_SIZES', '1000,10000,100000').split(',')
+]
+BENCHMARK_REPEAT = int(os.getenv('BENCHMARK_REPEAT', 20))
+BENCHMARK_MAX_RATIO = float(os.getenv('BENCHMARK_MAX_RATIO', 3))
+BENCHMARK_BATCH_SIZE = 5000
+BENCHMARK_FEED_ZONES = int(os.getenv('BENCHMARK_FEED_ZONES', 100000))
+BENCHMARK_FEED_SIZES = [
+    int(size)
+    for size in os.getenv('BENCHMARK_FEED_SIZES', '10000').split(',')
+]
+BENCHMARK_CLIENTS = [
+    int(clients)
+    for clients in os.getenv('BENCHMARK_CLIENTS', '1,4,16').split(',')
+]
+BENCHMARK_REQUESTS = int(os.getenv('BENCHMARK_REQUESTS', 200))
+BENCHMARK_RESULTS = os.getenv('BENCHMARK_RESULTS', 'benchmark_results.json')
+BENCHMARK_BASELINE = os.getenv('BENCHMARK_BASELINE', '')
+BENCHMARK_MAX_REGRESSION = float(os.getenv('BENCHMARK_MAX_REGRESSION', 0.25))
+BENCHMARK_MIN_SECONDS = float(os.getenv('BENCHMARK_MIN_SECONDS', 0.05))
+BENCHMARK_SERVER_WORKERS = int(os.getenv('BENCHMARK_SERVER_WORKERS', 2))
+BENCHMARK_SERVER_PORT = int(os.getenv('BENCHMARK_SERVER_PORT', 8765))
+BENCHMARK_SERVER_TIMEOUT = 30
+
+BENCHMARK_ASGI_WORKER = os.getenv(
+    'BENCHMARK_ASGI_WORKER',
+    'uvicorn.workers.UvicornWorker'
+)
+
+# Gunicorn application and worker class of every deployment
+SERVER_DEPLOYMENTS = (
+    ('wsgi', 'events_platform.wsgi:application', 'sync'),
+    ('asgi', 'events_platform.asgi:application', BENCHMARK_ASGI_WORKER),
+)
+
+# Cache backend of the servers of every deployment, the file based cache
+# is shared by their processes
+SERVER_CACHES = (
+    ('uncached', 'django.core.cache.backends.dummy.DummyCache'),
+    ('cached', 'django.core.cache.backends.filebased.FileBasedCache'),
+)
+
+RESULTS = {}
+
+
+def measure(function, repeat=BENCHMARK_REPEAT):
+    """
+    Get the median duration of a function
+
+    :param function: Function to measure
+    :type function: function
+    :param repeat: Number of measures
+    :type repeat: int
+    :return: Median duration in seconds
+    :type return: float
+    """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def measure_peak_memory(function):
+    """
+    Get the peak of memory allocated by a function
+
+    :param function: Function to measure
+    :type function: function
+    :return: Peak of allocated memory in bytes
+    :type return: int
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(values, fraction):
+    """
+    Get the value below which a fraction of the values fall
+
+    :param values: Values
+    :type values: list
+    :param fraction: Fraction of the values between 0 and 1
+    :type fraction: float
+    :return: Percentile of the values
+    :type return: float
+    """
+    values = sorted(values)
+    return values[int(round(fraction * (len(values) - 1)))]
+
+
+def check_regressions(name, metrics, baseline):
+    """
+    Compare the metrics of a benchmark with the baseline ones, the rates
+    ending in _per_second regress when they drop more than
+    BENCHMARK_MAX_REGRESSION and the other metrics when they grow more.
+    Durations shorter than BENCHMARK_MIN_SECONDS are noise and ignored
+
+    :param name: Name of the benchmark
+    :type name: str
+    :param metrics: Metrics of the benchmark
+    :type metrics: dict
+    :param baseline: Metrics of every benchmark in the baseline
+    :type baseline: dict
+    :return: Descriptions of the regressions
+    :type return: list
+    """
+    regressions = []
+    for metric, value in sorted(metrics.items()):
+        base = baseline.get(name, {}).get(metric)
+        if not base or metric.endswith('_seconds') and max(
+            value,
+            base
+        ) < BENCHMARK_MIN_SECONDS:
+            continue
+        if metric.endswith('_per_second'):
+            regression = 1 - value / base
+        else:
+            regression = value / base - 1
+        if regression > BENCHMARK_MAX_REGRESSION:
+            regressions.append(
+                "{} {}: {:.4g} against {:.4g} in the baseline".format(
+                    name,
+                    metric,
+                    value,
+                    base
+                )
+            )
+    return regressions
+
+
+def record_result(name, **metrics):
+    """
+    Record the metrics of a benchmark in the BENCHMARK_RESULTS JSON file
+    and check them against the results in the BENCHMARK_BASELINE file
+
+    :param name: Name of the benchmark
+    :type name: str
+    :return: Descriptions of the regressions against the baseline
+    :type return: list
+    """
+    RESULTS[name] = metrics
+    if BENCHMARK_RESULTS:
+        with open(BENCHMARK_RESULTS, 'w') as fl:
+            json.dump(
+                {
+                    'environment': {
+                        'database': connection.vendor,
+                        'python': platform.python_version(),
+                        'date': timezone.now().isoformat()
+                    },
+                    'results': RESULTS
+                },
+                fl,
+                indent=2,
+                sort_keys=True
+            )
+
+    if not BENCHMARK_BASELINE:
+        return []
+    with open(BENCHMARK_BASELINE) as fl:
+        baseline = json.load(fl)['results']
+    return check_regressions(name, metrics, baseline)
+
+
+def read_json(response):
+    """
+    Read the JSON content of a response, streamed lists included
+    """
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+def analyze():
+    """
+    Refresh the planner statistics after a bulk load
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE event_event')
+            cursor.execute('ANALYZE event_eventdate')
+
+
+def create_catalogue(zones):
+    """
+    Sync a new provider with a synthetic feed of the given size
+    """
+    with TemporaryDirectory() as directory:
+        name = write_feed(directory, XML, zones)
+        provider_resource = ProviderResource.objects.create(
+            url='http://localhost/{}'.format(name)
+        )
+        provider = Provider.objects.create(
+            name=name,
+            provider_resource=provider_resource
+        )
+        provider_resource.read_resource_file(os.path.join(directory, name))
+        provider.record_sync(provider_resource.save_resource)
+    analyze()
+
+
+def request_lists(urls, client, clients):
+    """
+    Request the lists of a client in turns, return their latencies
+    """
+    latencies = []
+    with requests.Session() as session:
+        for index in range(client, BENCHMARK_REQUESTS, clients):
+            started = time.perf_counter()
+            response = session.get(urls[index % len(urls)])
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+    return latencies
+
+
+def load_lists(urls, clients):
+    """
+    Request the lists with concurrent clients
+
+    :param urls: Urls of the lists
+    :type urls: list
+    :param clients: Number of concurrent clients
+    :type clients: int
+    :return: Latencies of the requests and duration of the load
+    :type return: tuple
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = [
+            latency
+            for client_latencies in executor.map(
+                lambda client: request_lists(urls, client, clients),
+                range(clients)
+            )
+            for latency in client_latencies
+        ]
+    return latencies, time.perf_counter() - started
+
+
+def get_process_rss(pid):
+    """
+    Get the resident memory of a process and its descendants from procfs
+
+    :param pid: Id of the process
+    :type pid: int
+    :return: Resident memory in bytes
+    :type return: int
+    """
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(name)) as fl:
+                parent = int(fl.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError):
+            continue
+        children.setdefault(parent, []).append(int(name))
+
+    rss = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, ()))
+        try:
+            with open('/proc/{}/statm'.format(current)) as fl:
+                rss += int(fl.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            continue
+    return rss
+
+
+class RegressionCheckTestCase(SimpleTestCase):
+    """
+    Tests for the check of the benchmark results against a baseline
+    """
+
+    def test_check_regressions_valid(self):
+        baseline = {
+            'ingest': {
+                'rows_per_second': 1000,
+                'write_seconds': 10,
+                'fetch_seconds': 0.01
+            }
+        }
+        metrics = {
+            'rows_per_second': 900,
+            'write_seconds': 11,
+            'fetch_seconds': 0.04
+        }
+        self.assertEqual(check_regressions('ingest', metrics, baseline), [])
+        self.assertEqual(check_regressions('other', metrics, baseline), [])
+
+    def test_check_regressions_invalid(self):
+        baseline = {'ingest': {'rows_per_second': 1000, 'write_seconds': 10}}
+        metrics = {'rows_per_second': 500, 'write_seconds': 20}
+        self.assertEqual(len(check_regressions('ingest', metrics, baseline)), 2)
+
+
+class EventListBenchmark(TestCase):
+    """
+    Latency of the events list filtered by a sale range while the number
+    of event dates out of the range grows up to BENCHMARK_SIZES
+    """
+    DATES_PER_EVENT = 10
+    MATCHING_EVENTS = 50
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.url = "{}?start_date={}&end_date={}".format(
+            reverse('events'),
+            (self.now + timedelta(days=30)).strftime("%Y-%m-%d"),
+            (self.now + timedelta(days=40)).strftime("%Y-%m-%d")
+        )
+        for index in range(self.MATCHING_EVENTS):
+            event = Event.objects.create(
+                title='Matching {}'.format(index),
+                provider_event_id=index
+            )
+            EventDate.objects.create(
+                event=event,
+                date=self.now + timedelta(days=45),
+                sale_start_date=self.now + timedelta(days=31),
+                sale_end_date=self.now + timedelta(days=39),
+                provider_date_id=index
+            )
+        self.dates_counter = self.MATCHING_EVENTS
+
+    def grow_event_dates(self, size):
+        """
+        Add event dates with their sale in the past up to the given size
+        """
+        while self.dates_counter < size:
+            events_counter = min(
+                BENCHMARK_BATCH_SIZE // self.DATES_PER_EVENT,
+                -(-(size - self.dates_counter) // self.DATES_PER_EVENT)
+            )
+            events = Event.objects.bulk_create([
+                Event(title='Past', provider_event_id=index)
+                for index in range(events_counter)
+            ])
+            if events[0].pk is None:
+                events = list(Event.objects.filter(title='Past', dates=None))
+            EventDate.objects.bulk_create([
+                EventDate(
+                    event=event,
+                    date=self.now - timedelta(days=300),
+                    sale_start_date=self.now - timedelta(days=400 + index),
+                    sale_end_date=self.now - timedelta(days=301),
+                    provider_date_id=index
+                )
+                for event in events
+                for index in range(self.DATES_PER_EVENT)
+            ])
+            self.dates_counter += len(events) * self.DATES_PER_EVENT
+        analyze()
+
+    def test_event_list_latency_flat(self):
+        latencies = []
+        for size in BENCHMARK_SIZES:
+            self.grow_event_dates(size)
+            response = self.client.get(self.url)
+            self.assertEqual(
+                len(read_json(response)['results']),
+                self.MATCHING_EVENTS
+            )
+            latency = measure(lambda: self.client.get(self.url))
+            latencies.append(latency)
+            print("EventListView {} event dates: {:.2f}ms".format(
+                self.dates_counter,
+                latency * 1000
+            ))
+            self.assertEqual(
+                record_result(
+                    'event_list.{}_dates'.format(self.dates_counter),
+                    latency_seconds=latency
+                ),
+                []
+            )
+
+        self.assertLessEqual(
+            latencies[-1],
+            max(latencies[0], 0.001) * BENCHMARK_MAX_RATIO
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', "Requires Postgres")
+class EventSearchBenchmark(TestCase):
+    """
+    Latency of a search on the events list while the number of events
+    not matching it grows up to BENCHMARK_SIZES
+    """
+    MATCHING_EVENTS = 50
+
+    def setUp(self):
+        self.url = "{}?q=concert".format(reverse('events'))
+        self.events_counter = 0
+        self.create_events('Concert', self.MATCHING_EVENTS)
+
+    def create_events(self, title, count):
+        """
+        Create events with a date on sale
+        """
+        now = timezone.now()
+        events = Event.objects.bulk_create([
+            Event(
+                title='{} {}'.format(title, index),
+                provider_event_id=index
+            )
+            for index in range(count)
+        ])
+        EventDate.objects.bulk_create([
+            EventDate(
+                event=event,
+                date=now + timedelta(days=10),
+                sale_start_date=now,
+                sale_end_date=now + timedelta(days=9),
+                provider_date_id=0
+            )
+            for event in events
+        ])
+        self.events_counter += count
+
+    def grow_events(self, size):
+        """
+        Add events not matching the search up to the given size
+        """
+        while self.events_counter < size:
+            self.create_events(
+                'Theatre',
+                min(BENCHMARK_BATCH_SIZE, size - self.events_counter)
+            )
+        Event.objects.filter(search_vector=None).update(
+            search_vector=get_search_vector()
+        )
+        analyze()
+
+    def test_event_search_latency_flat(self):
+        latencies = []
+        for size in BENCHMARK_SIZES:
+            self.grow_events(size)
+            response = self.client.get(self.url)
+            self.assertEqual(
+                len(read_json(response)['results']),
+                self.MATCHING_EVENTS
+            )
+            latency = measure(lambda: self.client.get(self.url))
+            latencies.append(latency)
+            print("EventListView search {} events: {:.2f}ms".format(
+                self.events_counter,
+                latency * 1000
+            ))
+            self.assertEqual(
+                record_result(
+                    'event_search.{}_events'.format(self.events_counter),
+                    latency_seconds=latency
+                ),
+                []
+            )
+
+        self.assertLessEqual(
+            latencies[-1],
+            max(latencies[0], 0.001) * BENCHMARK_MAX_RATIO
+        )
+
+
+class EventListRenderingBenchmark(TestCase):
+    """
+    Throughput and memory of a full page of the events list encoded
+    straight from the rows against the serializer and JSONRenderer
+    """
+
+    def setUp(self):
+        self.url = "{}?page_size={}".format(
+            reverse('events'),
+            settings.EVENTS_MAX_PAGE_SIZE
+        )
+        Event.objects.bulk_create([
+            Event(
+                title='Event {}'.format(index),
+                provider_event_id=index,
+                capacity=100,
+                rest=index % 100,
+                min_price=Decimal('10.00'),
+                max_price=Decimal('99.50')
+            )
+            for index in range(settings.EVENTS_MAX_PAGE_SIZE)
+        ])
+        EventDate.objects.bulk_create([
+            EventDate(
+                event=event,
+                date=timezone.now(),
+                sale_start_date=timezone.now(),
+                sale_end_date=timezone.now(),
+                provider_date_id=0
+            )
+            for event in Event.objects.all()
+        ])
+        analyze()
+
+    def get_content(self):
+        response = self.client.get(self.url)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def measure_rendering(self, name):
+        content = self.get_content()
+        latency = measure(self.get_content)
+        peak = measure_peak_memory(self.get_content)
+        print("EventListView {}: {:.1f} requests/s, {:.0f}KiB peak".format(
+            name,
+            1 / latency,
+            peak / 1024
+        ))
+        self.assertEqual(
+            record_result(
+                'event_list_rendering.{}'.format(name),
+                requests_per_second=1 / latency,
+                peak_memory_bytes=peak
+            ),
+            []
+        )
+        return content, latency
+
+    def test_event_list_fast_rendering(self):
+        fast_content, fast_latency = self.measure_rendering('fast')
+        with override_settings(EVENTS_FAST_RENDERING=False):
+            content, latency = self.measure_rendering('serializer')
+
+        self.assertEqual(fast_content, content)
+        self.assertLess(fast_latency, latency)
+
+
+def adapt_interpreted(schema, resource_type, record):
+    """
+    Adapt a record to the standard form interpreting the schema, every
+    path is resolved again for every value
+    """
+    def get_value(name, chain):
+        options = schema['fields'][name]
+        if isinstance(options, str):
+            options = {'path': options}
+        level_key, *keys = options['path'].split('.')
+        value = chain[schema['levels'].index(level_key)]
+        for key in keys:
+            if resource_type != XML:
+                key = key.lstrip(XML_ATTRIBUTE_PREFIX)
+            value = value[key]
+        field_type = options.get('type', STANDARD_FIELDS[name][1])
+        return COERCERS[field_type].build(options)(value)
+
+    def extract(level, chain):
+        item = {
+            name: get_value(name, chain)
+            for name, (field_level, _, _) in STANDARD_FIELDS.items()
+            if field_level == level and name in schema['fields']
+        }
+        if level < len(CHILDREN):
+            children = chain[-1].get(schema['levels'][level + 1]) or ()
+            item[CHILDREN[level]] = [
+                extract(level + 1, chain + (child,)) for child in children
+            ]
+        return item
+    return extract(0, (record,))
+
+
+def build_feed(zones):
+    """
+    Build the parsed records of a XML feed with the given number of zones
+    """
+    return list(iter_feed_records(zones))
+
+
+class SchemaNormalizeBenchmark(SimpleTestCase):
+    """
+    Normalization of a feed of BENCHMARK_FEED_ZONES zones with the
+    compiled default schema against interpreting it record by record
+    """
+
+    def test_schema_normalize_columnar(self):
+        feed = build_feed(BENCHMARK_FEED_ZONES)
+        normalize = compile_normalizer('', XML)
+        batch_size = settings.INGEST_BATCH_SIZE
+
+        def normalize_feed():
+            return [
+                normalize(records)
+                for records in iter_batches(feed, batch_size)
+            ]
+
+        def interpret_feed():
+            return columns_from_records([
+                adapt_interpreted(DEFAULT_SCHEMA, XML, record)
+                for record in feed
+            ])
+        columnar = measure(normalize_feed, 3)
+        interpreted = measure(interpret_feed, 3)
+        print(
+            "Normalize {} zones: columnar {:.2f}s, "
+            "interpreted {:.2f}s".format(
+                BENCHMARK_FEED_ZONES,
+                columnar,
+                interpreted
+            )
+        )
+        self.assertEqual(
+            record_result(
+                'schema_normalize.{}_zones'.format(BENCHMARK_FEED_ZONES),
+                columnar_seconds=columnar,
+                interpreted_seconds=interpreted
+            ),
+            []
+        )
+
+        expected = interpret_feed()
+        del expected.events['active']
+        self.assertEqual(normalize(feed), expected)
+        self.assertLess(columnar, interpreted)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Requires Postgres")
+class ProviderImportBenchmark(TestCase):
+    """
+    Initial import of a feed of BENCHMARK_FEED_ZONES zones copied into
+    staging tables and merged against the bulk save
+    """
+
+    def import_feed(self, name, feed):
+        """
+        Import the feed for a new provider, return the rows per second
+        """
+        provider_resource = ProviderResource.objects.create(
+            url='http://localhost/{}.xml'.format(name),
+            resource_type=XML
+        )
+        Provider.objects.create(
+            name=name,
+            provider_resource=provider_resource
+        )
+        provider_resource._resource = iter(feed)
+        provider_resource.adapt_resource()
+        load = getattr(provider_resource, '{}_resource'.format(name))
+        started = time.perf_counter()
+        report = load()
+        duration = time.perf_counter() - started
+        print("Import {} zones with {}: {:.2f}s, {:.0f} rows/s".format(
+            BENCHMARK_FEED_ZONES,
+            name,
+            duration,
+            report['created'] / duration
+        ))
+        self.assertEqual(
+            record_result(
+                'provider_import.{}.{}_zones'.format(
+                    name,
+                    BENCHMARK_FEED_ZONES
+                ),
+                rows_per_second=report['created'] / duration
+            ),
+            []
+        )
+        return report['created'] / duration
+
+    def test_provider_import_copy(self):
+        feed = build_feed(BENCHMARK_FEED_ZONES)
+        copy = self.import_feed('copy', feed)
+        save = self.import_feed('save', feed)
+        self.assertGreater(copy, save)
+
+
+class ProviderIngestBenchmark(TestCase):
+    """
+    Ingest of synthetic feeds of BENCHMARK_FEED_SIZES zones served by a
+    local stub server, timed by stage with the telemetry of the sync runs
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ProviderIngestBenchmark, cls).setUpClass()
+        cls.directory = TemporaryDirectory()
+        cls.server = StubServer(directory=cls.directory.name)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.directory.cleanup()
+        super(ProviderIngestBenchmark, cls).tearDownClass()
+
+    def ingest_feed(self, resource_type, zones):
+        """
+        Ingest a new provider with a synthetic feed of the given size
+        """
+        name = write_feed(self.directory.name, resource_type, zones)
+        provider_resource = ProviderResource.objects.create(
+            url=self.server.url(name)
+        )
+        provider = Provider.objects.create(
+            name=name,
+            provider_resource=provider_resource
+        )
+        report = provider.get_external_events()
+        run = provider.sync_runs.get()
+        self.assertEqual(run.records_parsed, max(1, zones // 100))
+        self.assertEqual(report['invalid'], 0)
+
+        rows = report['created']
+        print(
+            "Ingest {} {} zones: {:.2f}s, {:.0f} rows/s, fetch {:.2f}s, "
+            "parse {:.2f}s, adapt {:.2f}s, write {:.2f}s".format(
+                zones,
+                FEED_EXTENSIONS[resource_type],
+                run.duration,
+                rows / run.duration,
+                run.fetch_time,
+                run.parse_time,
+                run.adapt_time,
+                run.write_time
+            )
+        )
+        metrics = {
+            '{}_seconds'.format(stage): getattr(run, stage + '_time')
+            for stage in run.STAGES
+        }
+        self.assertEqual(
+            record_result(
+                'ingest.{}.{}_zones'.format(
+                    FEED_EXTENSIONS[resource_type],
+                    zones
+                ),
+                duration_seconds=run.duration,
+                rows_per_second=rows / run.duration,
+                **metrics
+            ),
+            []
+        )
+
+    def test_provider_ingest_xml(self):
+        for zones in BENCHMARK_FEED_SIZES:
+            self.ingest_feed(XML, zones)
+
+    def test_provider_ingest_json(self):
+        for zones in BENCHMARK_FEED_SIZES:
+            self.ingest_feed(JSON, zones)
+
+
+class EventListConcurrencyBenchmark(LiveServerTestCase):
+    """
+    Latency and throughput of the events list served to BENCHMARK_CLIENTS
+    concurrent clients, over the catalogue of a synthetic feed with the
+    largest of BENCHMARK_FEED_SIZES zones
+    """
+    QUERIES = (
+        '',
+        '?start_date=2019-03-01&end_date=2019-04-01',
+        '?available=true&min_price=20',
+        '?page_size=500',
+        '?expand=dates,zones&page_size=20',
+    )
+
+    def setUp(self):
+        self.zones = BENCHMARK_FEED_SIZES[-1]
+        create_catalogue(self.zones)
+        self.urls = [
+            '{}{}{}'.format(self.live_server_url, reverse('events'), query)
+            for query in self.QUERIES
+        ]
+
+    def test_event_list_concurrent_clients(self):
+        for clients in BENCHMARK_CLIENTS:
+            latencies, duration = load_lists(self.urls, clients)
+
+            print(
+                "EventListView {} clients over {} zones: {:.1f} requests/s, "
+                "p50 {:.2f}ms, p95 {:.2f}ms".format(
+                    clients,
+                    self.zones,
+                    len(latencies) / duration,
+                    percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.95) * 1000
+                )
+            )
+            self.assertEqual(len(latencies), BENCHMARK_REQUESTS)
+            self.assertEqual(
+                record_result(
+                    'event_list_concurrency.{}_clients.{}_zones'.format(
+                        clients,
+                        self.zones
+                    ),
+                    requests_per_second=len(latencies) / duration,
+                    p50_seconds=percentile(latencies, 0.5),
+                    p95_seconds=percentile(latencies, 0.95)
+                ),
+                []
+            )
+
+
+@skipUnless(os.path.isdir('/proc'), "Requires procfs")
+class ServerDeploymentBenchmark(TransactionTestCase):
+    """
+    Requests per second, p99 latency and resident memory of the events
+    list served by gunicorn with BENCHMARK_SERVER_WORKERS workers of the
+    WSGI application, sync workers, against the ASGI application, uvicorn
+    workers, for BENCHMARK_CLIENTS concurrent clients, without a cache and
+    with a cache shared by the workers. The servers run in other processes
+    over the test database with the test settings, so SQLite needs a test
+    database in a file
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Requires a test database shared by processes")
+        self.zones = BENCHMARK_FEED_SIZES[-1]
+        create_catalogue(self.zones)
+        self.server_url = 'http://127.0.0.1:{}'.format(BENCHMARK_SERVER_PORT)
+        self.urls = [
+            '{}{}{}'.format(self.server_url, reverse('events'), query)
+            for query in EventListConcurrencyBenchmark.QUERIES
+        ]
+
+    def start_server(self, application, worker_class, cache_backend,
+                     cache_location):
+        """
+        Start a gunicorn server and wait until it serves the events list
+        """
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn.app.wsgiapp', application,
+                '--worker-class', worker_class,
+                '--workers', str(BENCHMARK_SERVER_WORKERS),
+                '--bind', '127.0.0.1:{}'.format(BENCHMARK_SERVER_PORT),
+                '--log-level', 'warning'
+            ],
+            cwd=os.path.dirname(settings.BASE_DIR),
+            env=dict(
+                os.environ,
+                DATABASE_NAME=connection.settings_dict['NAME'],
+                CACHE_BACKEND=cache_backend,
+                CACHE_LOCATION=cache_location
+            )
+        )
+        deadline = time.monotonic() + BENCHMARK_SERVER_TIMEOUT
+        while time.monotonic() < deadline and server.poll() is None:
+            try:
+                requests.get(self.urls[0]).raise_for_status()
+                return server
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.stop_server(server)
+        self.fail("Server {} not started".format(application))
+
+    def stop_server(self, server):
+        """
+        Stop a gunicorn server and its workers
+        """
+        server.terminate()
+        try:
+            server.wait(BENCHMARK_SERVER_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    def measure_deployment(self, name, server, clients):
+        """
+        Load a server sampling its resident memory and record its metrics
+        """
+        samples = [get_process_rss(server.pid)]
+        loading = threading.Event()
+
+        def sample_rss():
+            while not loading.wait(0.1):
+                samples.append(get_process_rss(server.pid))
+
+        sampler = threading.Thread(target=sample_rss)
+        sampler.start()
+        try:
+            latencies, duration = load_lists(self.urls, clients)
+        finally:
+            loading.set()
+            sampler.join()
+
+        megabytes = max(samples) / 1024 / 1024
+        metrics = {
+            'requests_per_second': len(latencies) / duration,
+            'p99_seconds': percentile(latencies, 0.99),
+            'rss_megabytes': megabytes,
+            'requests_per_mb_per_second': len(latencies) / duration / megabytes
+        }
+        print(
+            "EventListView {} {} clients over {} zones: {:.1f} requests/s, "
+            "p99 {:.2f}ms, {:.1f}MB RSS, {:.2f} requests/s per MB".format(
+                name,
+                clients,
+                self.zones,
+                metrics['requests_per_second'],
+                metrics['p99_seconds'] * 1000,
+                megabytes,
+                metrics['requests_per_mb_per_second']
+            )
+        )
+        self.assertEqual(len(latencies), BENCHMARK_REQUESTS)
+        self.assertEqual(
+            record_result(
+                'server_deployment.{}.{}_clients.{}_zones'.format(
+                    name,
+                    clients,
+                    self.zones
+                ),
+                **metrics
+            ),
+            []
+        )
+
+    def test_server_deployments(self):
+        for name, application, worker_class in SERVER_DEPLOYMENTS:
+            for cache_name, cache_backend in SERVER_CACHES:
+                with TemporaryDirectory() as cache_location:
+                    server = self.start_server(
+                        application,
+                        worker_class,
+                        cache_backend,
+                        cache_location
+                    )
+                    try:
+                        for clients in BENCHMARK_CLIENTS:
+                            self.measure_deployment(
+                                '{}.{}'.format(name, cache_name),
+                                server,
+                                clients
+                            )
+                    finally:
+                        self.stop_server(server)
@@ -0,0 +1,168 @@
+import json
+import os
+from datetime import datetime, timedelta
+from random import Random
+from xml.sax.saxutils import quoteattr
+
+from ..parsers import JSON, XML, XML_ATTRIBUTE_PREFIX, XML_RECORD_TAG
+from ..schemas import CHILDREN, PARENT, STANDARD_FIELDS, ColumnBatch
+
+FEED_START = datetime(2019, 1, 1)
+FEED_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+FEED_PRICES = ('0.00', '12.50', '20.00', '35.00', '60.00', '99.90')
+
+FEED_EXTENSIONS = {
+    JSON: 'json',
+    XML: 'xml',
+}
+
+
+def iter_feed_records(zones, dates_per_event=10, zones_per_date=10, seed=0,
+                      prefix=XML_ATTRIBUTE_PREFIX):
+    """
+    Generate the records of a synthetic provider feed in the shape of the
+    static test resources, the same arguments generate the same records
+
+    :param zones: Number of zones of the feed, rounded down to whole events
+    :type zones: int
+    :param dates_per_event: Number of dates of every event
+    :type dates_per_event: int
+    :param zones_per_date: Number of zones of every date
+    :type zones_per_date: int
+    :param seed: Seed of the random values
+    :type seed: int
+    :param prefix: Prefix of the attribute keys, empty for JSON feeds
+    :type prefix: str
+    :return: Records of the feed
+    :type return: generator
+    """
+    random = Random(seed)
+    for event in range(max(1, zones // (dates_per_event * zones_per_date))):
+        dates = []
+        for date in range(dates_per_event):
+            day = FEED_START + timedelta(
+                days=random.randrange(365),
+                hours=random.randrange(17, 23)
+            )
+            dates.append({
+                prefix + 'event_id': str(date),
+                prefix + 'event_date': day.strftime(FEED_DATE_FORMAT),
+                prefix + 'sell_from': (day - timedelta(days=180)).strftime(
+                    FEED_DATE_FORMAT
+                ),
+                prefix + 'sell_to': (day - timedelta(hours=1)).strftime(
+                    FEED_DATE_FORMAT
+                ),
+                prefix + 'sold_out': 'false',
+                'zone': [
+                    {
+                        prefix + 'zone_id': str(zone),
+                        prefix + 'name': 'Zone {}'.format(zone),
+                        prefix + 'capacity': str(random.randrange(50, 500)),
+                        prefix + 'max_price': random.choice(FEED_PRICES),
+                        prefix + 'numbered': random.choice(('true', 'false'))
+                    }
+                    for zone in range(zones_per_date)
+                ]
+            })
+        yield {
+            prefix + 'base_event_id': str(event),
+            prefix + 'sell_mode': 'online',
+            prefix + 'title': 'Event {}'.format(event),
+            'event': dates
+        }
+
+
+def format_xml_element(tag, item):
+    """
+    Format a record as a XML element, attribute keys become attributes
+    and the lists become child elements
+
+    :param tag: Tag of the element
+    :type tag: str
+    :param item: Record data in the xmltodict attribute style
+    :type item: dict
+    :return: XML element
+    :type return: str
+    """
+    attributes = ''.join(
+        ' {}={}'.format(key[len(XML_ATTRIBUTE_PREFIX):], quoteattr(value))
+        for key, value in item.items()
+        if key.startswith(XML_ATTRIBUTE_PREFIX)
+    )
+    children = ''.join(
+        format_xml_element(key, child)
+        for key, value in item.items()
+        if not key.startswith(XML_ATTRIBUTE_PREFIX)
+        for child in value
+    )
+    if not children:
+        return '<{}{} />\n'.format(tag, attributes)
+    return '<{}{}>\n{}</{}>\n'.format(tag, attributes, children, tag)
+
+
+def write_feed(directory, resource_type, zones, **kwargs):
+    """
+    Write a synthetic provider feed in a file record by record, the file
+    is named after its size and type
+
+    :param directory: Directory of the file
+    :type directory: str
+    :param resource_type: Resource type of the feed
+    :type resource_type: int
+    :param zones: Number of zones of the feed
+    :type zones: int
+    :return: Name of the file
+    :type return: str
+    """
+    name = 'feed_{}.{}'.format(zones, FEED_EXTENSIONS[resource_type])
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as fl:
+        if resource_type == XML:
+            fl.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            fl.write('<eventList version="1.0">\n<output>\n')
+            for record in iter_feed_records(zones, **kwargs):
+                fl.write(format_xml_element(XML_RECORD_TAG, record))
+            fl.write('</output>\n</eventList>\n')
+        else:
+            separator = '[\n'
+            for record in iter_feed_records(zones, prefix='', **kwargs):
+                fl.write(separator)
+                json.dump(record, fl)
+                separator = ',\n'
+            fl.write('\n]\n')
+    return name
+
+
+def columns_from_records(records):
+    """
+    Split records already in the standard form into a ColumnBatch, the
+    optional fields missing in a record are empty
+
+    :param records: Events in the standard form
+    :type records: list
+    :return: Columns of the records
+    :type return: event.schemas.ColumnBatch
+    """
+    items = [list(records)]
+    parents = [None]
+    for name in CHILDREN:
+        level_items = []
+        level_parents = []
+        for row, item in enumerate(items[-1]):
+            children = item.get(name, [])
+            level_items.extend(children)
+            level_parents.extend([row] * len(children))
+        items.append(level_items)
+        parents.append(level_parents)
+
+    batch = []
+    for level, level_items in enumerate(items):
+        columns = {
+            name: [item.get(name) for item in level_items]
+            for name, (field_level, _, _) in STANDARD_FIELDS.items()
+            if field_level == level
+        }
+        if level:
+            columns[PARENT] = parents[level]
+        batch.append(columns)
+    return ColumnBatch(*batch, errors=[])
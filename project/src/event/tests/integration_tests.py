@@ -1,17 +1,51 @@
+import hashlib
+import hmac
+import json
+import os
+import re
 import uuid
+from base64 import urlsafe_b64encode
 from datetime import timedelta
+from decimal import Decimal
+from itertools import combinations
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from channels.testing import ApplicationCommunicator
 from model_mommy import mommy
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 
-from ..models import Event, EventDate, Provider, Zone
+from ..cache import EVENTS_LIST_PARAMS, bump_events_generation
+from ..filters import EventFilter
+from ..models import Event, EventDate, Provider, ProviderResource, Zone
+from ..routers import stick_to_primary
+from ..tasks import warm_events_cache_task
+from ..views import EventListView
 
+from events_platform.routing import application
 from utils.test_services import generate_test_application, generate_test_token
 
 
+def read_json(response):
+    """
+    Read the JSON content of a response, streamed lists included
+    """
+    if not hasattr(response, '_json'):
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        response._json = json.loads(content.decode('utf-8'))
+    return response._json
+
+
 class GetEventDatesTest(APITestCase):
     """ Test module for GET events API """
 
@@ -25,9 +59,9 @@ class GetEventDatesTest(APITestCase):
     def test_get_events_valid(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), self.events_counter)
-        self.assertEqual(uuid.UUID(response.data[0]['uuid']),
-                         self.event.uuid)
+        results = read_json(response)['results']
+        self.assertEqual(len(results), self.events_counter)
+        self.assertEqual(uuid.UUID(results[0]['uuid']), self.event.uuid)
 
     def test_get_events_data_range_valid(self):
         event = mommy.make('event.event')
@@ -36,7 +70,7 @@ class GetEventDatesTest(APITestCase):
         end_date = now + timedelta(days=2)
         date = mommy.make(
             'event.eventdate',
-            event=self.event,
+            event=event,
             sale_start_date=start_date,
             sale_end_date=end_date
         )
@@ -49,9 +83,9 @@ class GetEventDatesTest(APITestCase):
             )
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), self.events_counter)
-        self.assertEqual(uuid.UUID(response.data[0]['uuid']),
-                         event.uuid)
+        results = read_json(response)['results']
+        self.assertEqual(len(results), self.events_counter)
+        self.assertEqual(uuid.UUID(results[0]['uuid']), event.uuid)
 
     def test_get_events_data_out_range_valid(self):
         now = timezone.now()
@@ -65,21 +99,72 @@ class GetEventDatesTest(APITestCase):
             )
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(read_json(response)['results']), 0)
+
+    def test_get_events_single_query_valid(self):
+        for _ in range(3):
+            event = mommy.make('event.event')
+            mommy.make('event.eventdate', event=event, _quantity=2)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            len(read_json(response)['results']),
+            self.events_counter + 3
+        )
+
+    def test_get_events_pagination_valid(self):
+        events = [self.event]
+        for _ in range(4):
+            event = mommy.make('event.event')
+            mommy.make('event.eventdate', event=event)
+            events.append(event)
+
+        uuids = []
+        url = "{}?page_size=2".format(self.url)
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = read_json(response)
+            self.assertLessEqual(len(data['results']), 2)
+            uuids += [event['uuid'] for event in data['results']]
+            url = data['next']
+        self.assertEqual(uuids, [str(event.uuid) for event in events])
+
+        response = self.client.get("{}?page_size=2".format(self.url))
+        response = self.client.get(read_json(response)['next'])
+        response = self.client.get(read_json(response)['previous'])
+        self.assertEqual(
+            [event['uuid'] for event in read_json(response)['results']],
+            [str(event.uuid) for event in events[:2]]
+        )
+        self.assertIsNone(read_json(response)['previous'])
+
+    def test_get_events_incorrect_cursor_invalid(self):
+        response = self.client.get("{}?cursor=sda".format(self.url))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_events_incorrect_cursor_date_invalid(self):
+        cursor = urlsafe_b64encode(
+            json.dumps(['2019-13-45T00:00:00', 1, False]).encode('utf-8')
+        ).decode('ascii')
+        response = self.client.get("{}?cursor={}".format(self.url, cursor))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_get_events_inactive_event_valid(self):
         self.event.active = False
         self.event.save()
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(read_json(response)['results']), 0)
 
     def test_get_events_inactive_date_valid(self):
         self.date.active = False
         self.date.save()
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(read_json(response)['results']), 0)
 
     def test_get_events_incorrect_start_date_invalid(self):
         now = timezone.now()
@@ -110,3 +195,816 @@ class GetEventDatesTest(APITestCase):
         Event.objects.all().delete()
         EventDate.objects.all().delete()
         Zone.objects.all().delete()
+
+
+class GetEventsFiltersTest(APITestCase):
+    """ Test module for the filters of the GET events API """
+
+    FILTERS = {
+        'start_date': '2019-01-01',
+        'end_date': '2019-12-31',
+        'date_from': '2019-01-01',
+        'date_to': '2019-12-31',
+        'min_price': '10',
+        'max_price': '30',
+        'available': 'true',
+        'provider': str(uuid.uuid4()),
+        'numbered': 'true',
+    }
+    SEQUENTIAL_SCAN = re.compile(r'Seq Scan on event_|SCAN (TABLE )?event_')
+
+    def setUp(self):
+        now = timezone.now()
+        self.provider = mommy.make(
+            'event.provider',
+            provider_resource=mommy.make('event.providerresource')
+        )
+        self.cheap = mommy.make(
+            'event.event',
+            provider=self.provider,
+            capacity=10,
+            rest=5,
+            min_price=Decimal('5.00'),
+            max_price=Decimal('8.00'),
+            numbered=True
+        )
+        self.expensive = mommy.make(
+            'event.event',
+            capacity=10,
+            rest=0,
+            min_price=Decimal('50.00'),
+            max_price=Decimal('80.00'),
+            sold_out=True
+        )
+        mommy.make(
+            'event.eventdate',
+            event=self.cheap,
+            date=now + timedelta(days=5),
+            sale_start_date=now,
+            sale_end_date=now + timedelta(days=4)
+        )
+        mommy.make(
+            'event.eventdate',
+            event=self.expensive,
+            date=now + timedelta(days=20),
+            sale_start_date=now + timedelta(days=10),
+            sale_end_date=now + timedelta(days=15)
+        )
+        self.url = reverse('events')
+
+    def get_titles(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {event['title'] for event in read_json(response)['results']}
+
+    def test_get_events_filter_date_valid(self):
+        now = timezone.now()
+        self.assertEqual(
+            self.get_titles(
+                date_from=(now + timedelta(days=10)).strftime("%Y-%m-%d"),
+                date_to=(now + timedelta(days=20)).strftime("%Y-%m-%d")
+            ),
+            {self.expensive.title}
+        )
+        self.assertEqual(
+            self.get_titles(
+                end_date=(now + timedelta(days=4)).strftime("%Y-%m-%d"),
+                date_from=(now + timedelta(days=10)).strftime("%Y-%m-%d")
+            ),
+            set()
+        )
+
+    def test_get_events_filter_price_valid(self):
+        self.assertEqual(
+            self.get_titles(max_price='10'),
+            {self.cheap.title}
+        )
+        self.assertEqual(
+            self.get_titles(min_price='60'),
+            {self.expensive.title}
+        )
+        self.assertEqual(self.get_titles(min_price='9', max_price='40'), set())
+
+    def test_get_events_filter_available_valid(self):
+        self.assertEqual(
+            self.get_titles(available='true'),
+            {self.cheap.title}
+        )
+        self.assertEqual(
+            self.get_titles(available='false'),
+            {self.expensive.title}
+        )
+
+    def test_get_events_filter_provider_valid(self):
+        self.assertEqual(
+            self.get_titles(provider=str(self.provider.uuid)),
+            {self.cheap.title}
+        )
+        self.assertEqual(self.get_titles(provider=str(uuid.uuid4())), set())
+
+    def test_get_events_filter_numbered_valid(self):
+        self.assertEqual(
+            self.get_titles(numbered='true'),
+            {self.cheap.title}
+        )
+        self.assertEqual(
+            self.get_titles(numbered='false'),
+            {self.expensive.title}
+        )
+
+    def test_get_events_incorrect_filter_invalid(self):
+        response = self.client.get(self.url, {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_events_filters_indexed_valid(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+        names = list(self.FILTERS)
+        for size in range(1, len(names) + 1):
+            for combination in combinations(names, size):
+                queryset = EventFilter(
+                    {name: self.FILTERS[name] for name in combination},
+                    queryset=Event.objects.filter(active=True)
+                ).qs.order_by('created', 'id')
+                plan = queryset.explain()
+                self.assertIsNone(
+                    self.SEQUENTIAL_SCAN.search(plan),
+                    "{}:\n{}".format(combination, plan)
+                )
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+        Provider.objects.all().delete()
+        Event.objects.all().delete()
+
+
+class GetEventsExpandTest(APITestCase):
+    """ Test module for the expanded GET events API """
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.url = reverse('events')
+        self.make_events(2)
+
+    def make_events(self, count):
+        for _ in range(count):
+            event = mommy.make('event.event')
+            date = mommy.make(
+                'event.eventdate',
+                event=event,
+                date=self.now + timedelta(days=5),
+                sale_start_date=self.now,
+                sale_end_date=self.now + timedelta(days=4)
+            )
+            mommy.make('event.zone', date=date, _quantity=2)
+            mommy.make('event.zone', date=date, active=False)
+            mommy.make(
+                'event.eventdate',
+                event=event,
+                date=self.now + timedelta(days=30),
+                sale_start_date=self.now + timedelta(days=20),
+                sale_end_date=self.now + timedelta(days=25)
+            )
+            mommy.make('event.eventdate', event=event, active=False)
+
+    def test_get_events_not_expanded_valid(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('dates', read_json(response)['results'][0])
+
+    def test_get_events_expand_dates_valid(self):
+        response = self.client.get(self.url, {'expand': 'dates'})
+        dates = read_json(response)['results'][0]['dates']
+        self.assertEqual(len(dates), 2)
+        self.assertNotIn('zones', dates[0])
+
+    def test_get_events_expand_zones_valid(self):
+        response = self.client.get(self.url, {'expand': 'zones'})
+        dates = read_json(response)['results'][0]['dates']
+        self.assertEqual(len(dates), 2)
+        self.assertEqual(len(dates[0]['zones']), 2)
+        self.assertEqual(len(dates[1]['zones']), 0)
+
+    def test_get_events_expand_window_valid(self):
+        response = self.client.get(self.url, {
+            'expand': 'dates',
+            'date_from': (self.now + timedelta(days=20)).strftime("%Y-%m-%d")
+        })
+        dates = read_json(response)['results'][0]['dates']
+        self.assertEqual(len(dates), 1)
+        self.assertEqual(
+            uuid.UUID(dates[0]['uuid']),
+            EventDate.objects.get(
+                event__uuid=read_json(response)['results'][0]['uuid'],
+                active=True,
+                date__gt=self.now + timedelta(days=20)
+            ).uuid
+        )
+
+    def test_get_events_expand_queries_flat_valid(self):
+        params = {'expand': 'dates,zones'}
+        with self.assertNumQueries(3):
+            self.client.get(self.url, params)
+        self.make_events(8)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(read_json(response)['results']), 10)
+
+    def tearDown(self):
+        Event.objects.all().delete()
+
+
+class GetEventsSearchTest(APITestCase):
+    """ Test module for the search of the GET events API """
+
+    def setUp(self):
+        self.url = reverse('events')
+        self.rock = self.make_event('Rock festival', 'Main stage')
+        self.jazz = self.make_event('Jazz night', 'Rock lounge')
+        self.opera = self.make_event('Opera gala', 'Stalls')
+        mommy.make(
+            'event.zone',
+            date=self.opera.dates.get(),
+            name='Rock balcony',
+            active=False
+        )
+        if connection.vendor == 'postgresql':
+            ProviderResource()._refresh_search(
+                set(Event.objects.values_list('id', flat=True))
+            )
+
+    def make_event(self, title, zone_name):
+        event = mommy.make('event.event', title=title)
+        date = mommy.make('event.eventdate', event=event)
+        mommy.make('event.zone', date=date, name=zone_name)
+        return event
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, dict(params, q=q))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return read_json(response)
+
+    def test_get_events_search_valid(self):
+        titles = [
+            event['title'] for event in self.search('rock')['results']
+        ]
+        self.assertEqual(titles, [self.rock.title, self.jazz.title])
+
+    def test_get_events_search_no_results_valid(self):
+        self.assertEqual(self.search('ballet')['results'], [])
+
+    def test_get_events_search_pagination_valid(self):
+        titles = []
+        data = self.search('rock', page_size=1)
+        while True:
+            titles += [event['title'] for event in data['results']]
+            if not data['next']:
+                break
+            data = read_json(self.client.get(data['next']))
+        self.assertEqual(titles, [self.rock.title, self.jazz.title])
+
+        previous = read_json(self.client.get(data['previous']))
+        self.assertEqual(
+            [event['title'] for event in previous['results']],
+            [self.rock.title]
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', "Requires Postgres")
+    def test_get_events_search_typo_valid(self):
+        titles = [
+            event['title'] for event in self.search('festivl')['results']
+        ]
+        self.assertEqual(titles, [self.rock.title])
+
+    def tearDown(self):
+        Event.objects.all().delete()
+
+
+class GetEventsRenderingTest(APITestCase):
+    """ Test module for the fast rendering of the GET events API """
+
+    def setUp(self):
+        self.url = reverse('events')
+        for title, price in (
+            ('Concert "Live" \u2028 \u00f1', Decimal('12.50')),
+            ('Theatre \\ </script>', None),
+            ('Festival', Decimal('0.00')),
+        ):
+            event = mommy.make(
+                'event.event',
+                title=title,
+                capacity=20,
+                rest=3,
+                min_price=price,
+                max_price=price,
+                numbered=price is None
+            )
+            mommy.make('event.eventdate', event=event)
+
+    def get_content(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_get_events_fast_rendering_valid(self):
+        url = "{}?page_size=2".format(self.url)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        with override_settings(EVENTS_FAST_RENDERING=False):
+            serialized = self.get_content(url)
+        self.assertEqual(b''.join(response.streaming_content), serialized)
+
+        next_url = json.loads(serialized.decode('utf-8'))['next']
+        content = self.get_content(next_url)
+        with override_settings(EVENTS_FAST_RENDERING=False):
+            self.assertEqual(content, self.get_content(next_url))
+
+    def test_get_events_expanded_rendering_valid(self):
+        response = self.client.get(self.url, {'expand': 'dates'})
+        self.assertFalse(response.streaming)
+
+    def tearDown(self):
+        Event.objects.all().delete()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class GetEventsCacheTest(APITestCase):
+    """ Test module for the cache of the GET events API """
+
+    def setUp(self):
+        cache.clear()
+        self.event = mommy.make('event.event')
+        self.date = mommy.make('event.eventdate', event=self.event)
+        self.url = reverse('events')
+
+    def test_get_events_cached_valid(self):
+        response = self.client.get(self.url)
+        data = read_json(response)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(read_json(cached_response), data)
+
+    def test_get_events_equivalent_params_valid(self):
+        read_json(self.client.get(
+            "{}?start_date=2019-1-5&end_date=bad".format(self.url)
+        ))
+        with self.assertNumQueries(0):
+            self.client.get("{}?start_date=2019-01-05".format(self.url))
+        self.client.get("{}?expand=zones,dates".format(self.url))
+        with self.assertNumQueries(0):
+            self.client.get("{}?expand=dates,zones,other".format(self.url))
+
+    def test_get_events_unknown_params_valid(self):
+        read_json(self.client.get("{}?page_size=5".format(self.url)))
+        with self.assertNumQueries(0):
+            read_json(self.client.get(
+                "{}?page_size=5&_=1571400000&utm_source=mail".format(
+                    self.url
+                )
+            ))
+
+    def test_events_list_params_valid(self):
+        self.assertLessEqual(
+            set(EventFilter.base_filters),
+            EVENTS_LIST_PARAMS
+        )
+
+    def test_get_events_cached_encodings_valid(self):
+        read_json(self.client.get(self.url))
+        response = self.client.get(
+            self.url,
+            HTTP_ACCEPT='application/json; indent=2'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'\n  ', response.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertFalse(response.streaming)
+        self.assertNotIn(b'\n', response.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url,
+                HTTP_ACCEPT='application/json; indent=2'
+            )
+        self.assertIn(b'\n  ', response.content)
+
+    def test_get_events_invalidated_valid(self):
+        read_json(self.client.get(self.url))
+        self.event.title = 'Renamed'
+        self.event.save()
+        bump_events_generation()
+        response = self.client.get(self.url)
+        self.assertEqual(read_json(response)['results'][0]['title'], 'Renamed')
+
+    def test_warm_events_cache_task_valid(self):
+        warm_events_cache_task()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(read_json(response)['results']), 1)
+
+    def tearDown(self):
+        cache.clear()
+        Event.objects.all().delete()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class PostProviderAvailabilityTest(APITransactionTestCase):
+    """
+    Test module for POST provider availability deltas API, the cached
+    lists are invalidated once the deltas are committed
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.provider = mommy.make('event.provider', webhook_secret='secret')
+        self.event = mommy.make(
+            'event.event',
+            provider=self.provider,
+            provider_event_id=1,
+            capacity=100,
+            rest=50
+        )
+        self.date = mommy.make(
+            'event.eventdate',
+            event=self.event,
+            provider_date_id=2
+        )
+        self.zone = mommy.make(
+            'event.zone',
+            date=self.date,
+            provider_zone_id=3,
+            capacity=100,
+            rest=50
+        )
+        self.other_event = mommy.make(
+            'event.event',
+            provider=mommy.make('event.provider'),
+            rest=10
+        )
+        mommy.make('event.eventdate', event=self.other_event)
+        self.url = reverse(
+            'provider-availability',
+            kwargs={'uuid': self.provider.uuid}
+        )
+        self.events_url = reverse('events')
+
+    def post_deltas(self, deltas, secret='secret'):
+        body = json.dumps({'zones': deltas}).encode('utf-8')
+        signature = hmac.new(
+            secret.encode('utf-8'),
+            body,
+            hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            self.url,
+            body,
+            content_type='application/json',
+            HTTP_X_PROVIDER_SIGNATURE='sha256={}'.format(signature)
+        )
+
+    def get_delta(self, **values):
+        delta = {
+            'provider_event_id': 1,
+            'provider_date_id': 2,
+            'provider_zone_id': 3
+        }
+        delta.update(values)
+        return delta
+
+    def test_post_availability_valid(self):
+        response = self.post_deltas([
+            self.get_delta(rest=0),
+            self.get_delta(provider_zone_id=4, rest=10)
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {'updated': 1, 'unchanged': 0, 'missing': 1}
+        )
+        self.zone.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(self.zone.rest, 0)
+        self.assertTrue(self.event.sold_out)
+
+    def test_post_availability_invalidates_events_valid(self):
+        provider_url = "{}?provider={}".format(
+            self.events_url,
+            self.provider.uuid
+        )
+        other_url = "{}?provider={}".format(
+            self.events_url,
+            self.other_event.provider.uuid
+        )
+        sold_out_url = "{}?available=false".format(self.events_url)
+        for url in (provider_url, other_url, sold_out_url):
+            read_json(self.client.get(url))
+
+        self.post_deltas([self.get_delta(rest=0)])
+        with self.assertNumQueries(0):
+            read_json(self.client.get(other_url))
+        response = self.client.get(provider_url)
+        self.assertEqual(read_json(response)['results'][0]['rest'], 0)
+        response = self.client.get(sold_out_url)
+        self.assertEqual(
+            read_json(response)['results'][0]['uuid'],
+            str(self.event.uuid)
+        )
+
+    def test_post_availability_signature_invalid(self):
+        response = self.post_deltas([self.get_delta(rest=0)], 'other')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.provider.webhook_secret = ''
+        self.provider.save()
+        response = self.post_deltas([self.get_delta(rest=0)], '')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.zone.refresh_from_db()
+        self.assertEqual(self.zone.rest, 50)
+
+    def test_post_availability_delta_invalid(self):
+        response = self.post_deltas([self.get_delta()])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(INGEST_DELTA_MAX_ZONES=1):
+            response = self.post_deltas([
+                self.get_delta(rest=0),
+                self.get_delta(rest=1)
+            ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def tearDown(self):
+        cache.clear()
+        Event.objects.all().delete()
+        Provider.objects.all().delete()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class GetEventsAsgiTest(APITransactionTestCase):
+    """
+    Test module for GET events API served by the ASGI application, the
+    requests run in other threads so the rows are committed
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.event = mommy.make('event.event')
+        mommy.make('event.eventdate', event=self.event)
+        self.url = reverse('events')
+
+    def get_asgi(self, query_string='', headers=()):
+        async def get_response():
+            communicator = ApplicationCommunicator(application, {
+                'type': 'http',
+                'method': 'GET',
+                'path': self.url,
+                'query_string': query_string.encode('ascii'),
+                'headers': [(b'host', b'testserver')] + (
+                    list(headers) or [(b'accept', b'application/json')]
+                ),
+            })
+            await communicator.send_input({
+                'type': 'http.request',
+                'body': b''
+            })
+            response = await communicator.receive_output(5)
+            response['body'] = b''
+            more_body = True
+            while more_body:
+                message = await communicator.receive_output(5)
+                response['body'] += message.get('body', b'')
+                more_body = message.get('more_body', False)
+            return response
+
+        return async_to_sync(get_response)()
+
+    def test_get_events_asgi_valid(self):
+        response = self.get_asgi('expand=dates')
+        self.assertEqual(response['status'], status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response['body'].decode('utf-8')),
+            read_json(self.client.get(
+                "{}?expand=dates".format(self.url),
+                HTTP_ACCEPT='application/json'
+            ))
+        )
+
+    def test_get_events_asgi_cached_valid(self):
+        for query_string in ('', 'expand=dates'):
+            response = self.get_asgi(query_string)
+            with mock.patch.object(EventListView, 'list') as list_events:
+                cached_response = self.get_asgi(query_string)
+            list_events.assert_not_called()
+            self.assertEqual(cached_response['status'], status.HTTP_200_OK)
+            self.assertEqual(
+                json.loads(cached_response['body'].decode('utf-8')),
+                json.loads(response['body'].decode('utf-8'))
+            )
+
+    def test_get_events_asgi_cached_headers_valid(self):
+        self.get_asgi()
+        response = self.get_asgi()
+        wsgi_response = self.client.get(
+            self.url,
+            HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(
+            {
+                header.decode('latin1'): value.decode('latin1')
+                for header, value in response['headers']
+            },
+            dict(wsgi_response.items())
+        )
+
+    def test_get_events_asgi_indented_valid(self):
+        self.get_asgi()
+        response = self.get_asgi(
+            headers=[(b'accept', b'application/json; indent=4')]
+        )
+        self.assertEqual(response['status'], status.HTTP_200_OK)
+        self.assertIn(b'\n    "results"', response['body'])
+
+    def tearDown(self):
+        cache.clear()
+
+
+@override_settings(
+    DATABASE_REPLICA='replica',
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+class GetEventsReplicaTest(APITestCase):
+    """ Test module for GET events API read from the replica database """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        event = Event.objects.using('replica').create(
+            title='Replicated',
+            provider_event_id=1
+        )
+        now = timezone.now()
+        EventDate.objects.using('replica').create(
+            event=event,
+            date=now,
+            sale_start_date=now,
+            sale_end_date=now,
+            provider_date_id=1
+        )
+        self.url = reverse('events')
+
+    def test_get_events_replica_valid(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [event['title'] for event in read_json(response)['results']],
+            ['Replicated']
+        )
+
+    def test_get_events_sticky_primary_valid(self):
+        stick_to_primary()
+        response = self.client.get(self.url)
+        self.assertEqual(read_json(response)['results'], [])
+
+    def tearDown(self):
+        cache.clear()
+
+
+class GetProviderSyncRunsTest(APITestCase):
+    """ Test module for GET provider sync runs and metrics API """
+
+    def setUp(self):
+        self.provider = mommy.make('event.provider', name='Main "stage"')
+        now = timezone.now()
+        self.runs = [
+            mommy.make(
+                'event.providersyncrun',
+                provider=self.provider,
+                started=now - timedelta(days=days),
+                error=error,
+                created=days
+            )
+            for days, error in ((2, ''), (1, 'Error in provider URL'))
+        ]
+        self.url = reverse('provider-sync-runs')
+        self.metrics_url = reverse('metrics')
+
+    def test_get_sync_runs_valid(self):
+        self.client.force_authenticate(
+            mommy.make('auth.user', is_staff=True)
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = read_json(response)['results']
+        self.assertEqual([run['created'] for run in results], [1, 2])
+        self.assertEqual(
+            uuid.UUID(results[0]['provider']),
+            self.provider.uuid
+        )
+        response = self.client.get("{}?failed=false".format(self.url))
+        self.assertEqual(len(read_json(response)['results']), 1)
+
+    def test_get_sync_runs_not_staff_invalid(self):
+        self.client.force_authenticate(mommy.make('auth.user'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_get_metrics_valid(self):
+        response = self.client.get(
+            self.metrics_url,
+            HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        labels = 'provider="{}",name="Main \\"stage\\""'.format(
+            self.provider.uuid
+        )
+        lines = response.content.decode('utf-8').splitlines()
+        self.assertIn(
+            'events_provider_sync_runs_total{{{}}} 2.0'.format(labels),
+            lines
+        )
+        self.assertIn(
+            'events_provider_sync_errors_total{{{}}} 1.0'.format(labels),
+            lines
+        )
+        self.assertIn(
+            'events_provider_sync_last_success{{{}}} 0.0'.format(labels),
+            lines
+        )
+        self.assertIn(
+            'events_provider_sync_last_rows{{{},result="created"}} '
+            '1.0'.format(labels),
+            lines
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_get_metrics_token_invalid(self):
+        response = self.client.get(
+            self.metrics_url,
+            HTTP_AUTHORIZATION='Bearer other'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class GetEventsProfilingTest(APITestCase):
+    """ Test module for the profiling of the API requests """
+
+    def setUp(self):
+        cache.clear()
+        self.event = mommy.make('event.event')
+        mommy.make('event.eventdate', event=self.event)
+        self.url = reverse('events')
+
+    def test_get_events_not_profiled_valid(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(
+        PROFILING_ENABLED=True,
+        PROFILING_SLOW_REQUEST_TIME=0
+    )
+    def test_get_events_server_timing_valid(self):
+        with self.assertLogs('event.middleware', 'WARNING') as logs:
+            response = self.client.get("{}?expand=dates".format(self.url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('cache;dur=', timing)
+        self.assertIn('desc="miss"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=2)
+    def test_get_events_sampled_profile_valid(self):
+        with TemporaryDirectory() as directory:
+            with self.settings(PROFILING_DIR=directory):
+                for _ in range(3):
+                    read_json(self.client.get(self.url))
+            profiles = os.listdir(directory)
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(profiles[0].endswith('-GET-v1_events.prof'))
+
+    def tearDown(self):
+        cache.clear()
@@ -0,0 +1,73 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from django.conf import settings
+
+STATIC_DIR = os.path.join(settings.BASE_DIR, 'static')
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP server serving the static provider resources
+    """
+    daemon_threads = True
+
+    def __init__(self, directory=STATIC_DIR, validators=True):
+        self.directory = directory
+        self.validators = validators
+        self.requests = []
+        super(StubServer, self).__init__(('127.0.0.1', 0), StubHandler)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def url(self, name):
+        return "http://127.0.0.1:{}/static/{}".format(self.server_port, name)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serve a static file with ETag validation if enabled in the server
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self)
+        name = os.path.basename(self.path)
+        path = os.path.join(self.server.directory, name)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as fl:
+            body = fl.read()
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+
+        if self.server.validators and \
+                self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header(
+            'Content-Type',
+            mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        )
+        self.send_header('Content-Length', str(len(body)))
+        if self.server.validators:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -1,10 +1,44 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 from model_mommy import mommy
 
 from django.conf import settings
-from django.test import TestCase
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from ..exceptions import ProviderURLException
-from ..models import Event, EventDate, Provider, Zone
+from ..exceptions import ProviderLockedException, ProviderURLException
+from ..loaders import LOCK_NAMESPACE, encode_copy_rows, get_staged_rows
+from ..models import (
+    Event, EventDate, Provider, ProviderResource, ProviderSyncRun, Zone
+)
+from ..parsers import (
+    JSON, XML, detect_resource_type, iter_json_records, iter_xml_records
+)
+from ..routers import read_from_replica, stick_to_primary
+from ..schemas import PARENT, compile_normalizer
+from ..services import Telemetry, fingerprint, iter_batches, spool_chunks
+from ..tasks import (
+    get_provider_events_subtask,
+    get_provider_events_task,
+    summarize_provider_events_task,
+    summarize_provider_sync_runs_task,
+    warm_events_cache_task
+)
+from .feeds import columns_from_records
+from .stub_server import STATIC_DIR, StubServer
 
 
 class ProviderResourceTestCase(TestCase):
@@ -118,3 +152,1154 @@ class ProviderResourceTestCase(TestCase):
     def tearDown(self):
         Provider.objects.all().delete()
         Event.objects.all().delete()
+
+
+def build_resource_data(events, dates, zones):
+    """
+    Build adapted resource data with the given number of items per level
+    """
+    now = timezone.now()
+    return [
+        {
+            'provider_event_id': event,
+            'title': 'Event {}'.format(event),
+            'dates': [
+                {
+                    'provider_date_id': date,
+                    'date': now + timedelta(days=10),
+                    'sale_start_date': now,
+                    'sale_end_date': now + timedelta(days=9),
+                    'zones': [
+                        {
+                            'provider_zone_id': zone,
+                            'name': 'Zone {}'.format(zone),
+                            'capacity': 100,
+                            'rest': 50,
+                            'price': Decimal('20.00'),
+                            'numbered': False
+                        }
+                        for zone in range(zones)
+                    ]
+                }
+                for date in range(dates)
+            ]
+        }
+        for event in range(events)
+    ]
+
+
+class ProviderResourceBulkSaveTestCase(TestCase):
+    """
+    Tests for the bulk save of ProviderResource data
+    """
+    # Queries refreshing the search vectors, only stored on Postgres
+    SEARCH_QUERIES = 1 if connection.vendor == 'postgresql' else 0
+    # Query taking the advisory lock of the provider, only on Postgres
+    LOCK_QUERIES = 1 if connection.vendor == 'postgresql' else 0
+
+    def setUp(self):
+        self.provider_resource = mommy.make('event.providerresource')
+        self.provider = mommy.make(
+            'event.provider',
+            provider_resource=self.provider_resource
+        )
+
+    def save_data(self, data):
+        self.provider_resource._data = [columns_from_records(data)]
+        return self.provider_resource.save_resource()
+
+    def test_save_resource_creates_valid(self):
+        report = self.save_data(build_resource_data(2, 2, 3))
+        self.assertEqual(self.provider.events.count(), 2)
+        self.assertEqual(EventDate.objects.count(), 4)
+        self.assertEqual(Zone.objects.count(), 12)
+        self.assertEqual(report['created'], 18)
+
+    def test_save_resource_updates_valid(self):
+        data = build_resource_data(1, 1, 2)
+        self.save_data(data)
+        data[0]['title'] = 'Renamed'
+        data[0]['dates'][0]['zones'][0]['rest'] = 0
+        report = self.save_data(data)
+        self.assertEqual(Event.objects.get().title, 'Renamed')
+        self.assertEqual(Zone.objects.count(), 2)
+        self.assertEqual(Zone.objects.filter(rest=0).count(), 1)
+        self.assertEqual(report['updated'], 2)
+        self.assertEqual(report['unchanged'], 2)
+
+    def test_save_resource_unchanged_valid(self):
+        data = build_resource_data(2, 2, 2)
+        self.save_data(data)
+        updated = Zone.objects.values_list('updated', flat=True).first()
+        report = self.save_data(data)
+        self.assertEqual(report['unchanged'], 14)
+        self.assertEqual(report['created'] + report['updated'], 0)
+        self.assertEqual(
+            Zone.objects.values_list('updated', flat=True).first(),
+            updated
+        )
+
+    def test_save_resource_deactivates_missing_valid(self):
+        data = build_resource_data(2, 2, 2)
+        self.save_data(data)
+        removed_event = data.pop()
+        data[0]['dates'][0]['zones'].pop()
+        report = self.save_data(data)
+        self.assertEqual(report['deactivated'], 1 + 2 + 4 + 1)
+        self.assertFalse(
+            Event.objects.get(
+                provider_event_id=removed_event['provider_event_id']
+            ).active
+        )
+        self.assertEqual(Zone.objects.filter(active=True).count(), 3)
+
+        data.append(removed_event)
+        report = self.save_data(data)
+        self.assertEqual(report['updated'], 1 + 2 + 4)
+        self.assertEqual(Event.objects.filter(active=True).count(), 2)
+
+    def test_save_resource_availability_valid(self):
+        data = build_resource_data(1, 2, 2)
+        data[0]['dates'][1]['zones'][0]['price'] = Decimal('5.00')
+        for zone in data[0]['dates'][0]['zones']:
+            zone['rest'] = 0
+        self.save_data(data)
+        sold_out_date = EventDate.objects.get(provider_date_id=0)
+        self.assertEqual(sold_out_date.capacity, 200)
+        self.assertEqual(sold_out_date.rest, 0)
+        self.assertTrue(sold_out_date.is_sold_out())
+        event = Event.objects.get()
+        self.assertEqual(event.capacity, 400)
+        self.assertEqual(event.rest, 100)
+        self.assertEqual(event.min_price, Decimal('5.00'))
+        self.assertEqual(event.max_price, Decimal('20.00'))
+        self.assertFalse(event.sold_out)
+
+        data[0]['dates'].pop()
+        self.save_data(data)
+        event.refresh_from_db()
+        self.assertEqual(event.rest, 0)
+        self.assertTrue(event.sold_out)
+
+    @skipUnless(connection.vendor == 'postgresql', "Requires Postgres")
+    def test_save_resource_search_vector_valid(self):
+        data = build_resource_data(2, 1, 1)
+        data[1]['dates'][0]['zones'][0]['name'] = 'Backstage'
+        self.save_data(data)
+        query = SearchQuery('backstage', config=settings.EVENTS_SEARCH_CONFIG)
+        self.assertEqual(
+            list(Event.objects.filter(
+                search_vector=query
+            ).values_list('provider_event_id', flat=True)),
+            [1]
+        )
+
+        data[0]['title'] = 'Backstage tour'
+        self.save_data(data)
+        self.assertEqual(
+            Event.objects.filter(search_vector=query).count(),
+            2
+        )
+
+    def test_save_resource_insert_queries_flat_valid(self):
+        queries = 19 + self.SEARCH_QUERIES + self.LOCK_QUERIES
+        with self.assertNumQueries(queries):
+            self.save_data(build_resource_data(1, 1, 1))
+        Event.objects.all().delete()
+        with self.assertNumQueries(queries):
+            self.save_data(build_resource_data(4, 2, 5))
+
+    def test_save_resource_update_queries_flat_valid(self):
+        small = build_resource_data(1, 1, 1)
+        large = build_resource_data(4, 2, 5)
+        self.save_data(small)
+        with self.assertNumQueries(8 + self.LOCK_QUERIES):
+            self.save_data(small)
+        self.save_data(large)
+        for event in large:
+            event['title'] = 'Renamed'
+            for date in event['dates']:
+                for zone in date['zones']:
+                    zone['rest'] = 0
+        queries = 16 + self.SEARCH_QUERIES + self.LOCK_QUERIES
+        with self.assertNumQueries(queries):
+            self.save_data(large)
+
+    def test_save_resource_invalid_rows_valid(self):
+        data = build_resource_data(2, 1, 2)
+        self.save_data(data)
+        batch = columns_from_records(data)
+        batch.errors.append({
+            'record': 1,
+            'level': 'zone',
+            'field': 'price',
+            'error': "Invalid value 'free'"
+        })
+        for column in batch.zones.values():
+            column.pop()
+        self.provider_resource._data = [batch]
+        report = self.provider_resource.save_resource()
+        self.assertEqual(report['invalid'], 1)
+        self.assertEqual(report['deactivated'], 1)
+        self.assertEqual(Zone.objects.filter(active=True).count(), 3)
+
+    def test_save_resource_out_of_range_zones_invalid(self):
+        zones = [
+            {'max_price': '20.00'},
+            {'max_price': '123456.789'},
+            {'max_price': 'NaN'},
+            {'capacity': '-5'},
+            {'numbered': 'maybe'},
+        ]
+        for zone_id, zone in enumerate(zones):
+            zone.setdefault('max_price', '10.00')
+            zone.setdefault('capacity', '10')
+            zone.setdefault('numbered', 'true')
+            zone.update(zone_id=str(zone_id), name='Zone')
+        self.provider_resource.resource_type = JSON
+        self.provider_resource._resource = iter([{
+            'base_event_id': '1',
+            'title': 'Concert',
+            'event': [{
+                'event_id': '1',
+                'event_date': '2019-06-30T21:00:00',
+                'sell_from': '2019-01-01T00:00:00',
+                'sell_to': '2019-06-30T20:00:00',
+                'zone': zones
+            }]
+        }])
+        self.provider_resource.adapt_resource()
+        report = self.provider_resource.save_resource()
+
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(report['invalid'], 4)
+        zone = Zone.objects.get()
+        self.assertEqual(zone.provider_zone_id, 0)
+        self.assertEqual(zone.price, Decimal('20.00'))
+
+    def test_save_resource_unique_natural_keys_invalid(self):
+        self.save_data(build_resource_data(1, 1, 1))
+        date = EventDate.objects.get()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            mommy.make(
+                'event.event',
+                provider=self.provider,
+                provider_event_id=date.event.provider_event_id
+            )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            mommy.make(
+                'event.eventdate',
+                event=date.event,
+                provider_date_id=date.provider_date_id
+            )
+        zone = Zone.objects.get()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            mommy.make(
+                'event.zone',
+                date=date,
+                provider_zone_id=zone.provider_zone_id
+            )
+
+    def test_apply_deltas_valid(self):
+        data = build_resource_data(2, 1, 2)
+        self.save_data(data)
+        other_resource = mommy.make('event.providerresource')
+        mommy.make('event.provider', provider_resource=other_resource)
+        other_resource._data = [columns_from_records(data)]
+        other_resource.save_resource()
+
+        keys = {
+            'provider_event_id': 0,
+            'provider_date_id': 0,
+            'provider_zone_id': 0
+        }
+        with CaptureQueriesContext(connection) as queries:
+            report = self.provider_resource.apply_deltas([
+                dict(keys, rest=0, price=Decimal('35.00')),
+                dict(keys, provider_zone_id=1, rest=50),
+                dict(keys, provider_zone_id=5, rest=10),
+            ])
+        self.assertEqual(report, {'updated': 1, 'unchanged': 1, 'missing': 1})
+        self.assertEqual(
+            len([
+                query for query in queries.captured_queries
+                if query['sql'].startswith('UPDATE "event_zone"')
+            ]),
+            1
+        )
+        event = self.provider.events.get(provider_event_id=0)
+        self.assertEqual(event.rest, 50)
+        self.assertEqual(event.max_price, Decimal('35.00'))
+        self.assertEqual(Zone.objects.filter(rest=0).count(), 1)
+        self.assertEqual(
+            other_resource.provider.events.get(provider_event_id=0).rest,
+            100
+        )
+
+        data[0]['dates'][0]['zones'][0].update(
+            rest=0,
+            price=Decimal('35.00')
+        )
+        self.assertEqual(self.save_data(data)['updated'], 0)
+
+    @skipUnless(connection.vendor == 'postgresql', "Requires Postgres")
+    def test_save_resource_locked_invalid(self):
+        other = connection.copy()
+        try:
+            with other.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_lock(%s, %s)',
+                    [LOCK_NAMESPACE, self.provider.id]
+                )
+            with self.assertRaises(ProviderLockedException):
+                self.save_data(build_resource_data(1, 1, 1))
+        finally:
+            other.close()
+        self.assertFalse(Event.objects.exists())
+
+    def tearDown(self):
+        Provider.objects.all().delete()
+        Event.objects.all().delete()
+
+
+class LoadersTestCase(SimpleTestCase):
+    """
+    Tests for the COPY loader of ProviderResource data
+    """
+    def test_encode_copy_rows_valid(self):
+        data = encode_copy_rows([
+            (1, None, True, 'a\tb\\c\nd'),
+            (Decimal('20.00'), timezone.make_aware(datetime(2019, 1, 1)))
+        ])
+        self.assertEqual(
+            data.getvalue().decode('utf-8'),
+            '1\t\\N\tt\ta\\tb\\\\c\\nd\n'
+            '20.00\t2019-01-01T00:00:00+00:00\n'
+        )
+
+    def test_get_staged_rows_valid(self):
+        batch = columns_from_records(build_resource_data(2, 1, 2))
+        events, dates, zones = get_staged_rows(batch, (10, 20, 30))
+        self.assertEqual(
+            [(event[0], event[2]) for event in events],
+            [(10, 0), (11, 1)]
+        )
+        self.assertEqual(
+            [(date[0], date[1]) for date in dates],
+            [(20, 10), (21, 11)]
+        )
+        self.assertEqual(
+            [(zone[0], zone[1], zone[3]) for zone in zones],
+            [(30, 20, 0), (31, 20, 1), (32, 21, 0), (33, 21, 1)]
+        )
+        self.assertEqual(events[0][-1], fingerprint(['Event 0', True]))
+        self.assertEqual(zones[0][-1], fingerprint(
+            ['Zone 0', 100, 50, Decimal('20.00'), False, True]
+        ))
+
+
+class ImportProviderCommandTestCase(TestCase):
+    """
+    Tests for the import_provider command
+    """
+    def setUp(self):
+        self.provider = mommy.make(
+            'event.provider',
+            provider_resource=mommy.make('event.providerresource')
+        )
+
+    def import_provider(self, *args, **options):
+        stdout = StringIO()
+        with mock.patch(
+            'event.management.commands.import_provider.'
+            'warm_events_cache_task'
+        ):
+            call_command(
+                'import_provider',
+                *args,
+                stdout=stdout,
+                stderr=StringIO(),
+                **options
+            )
+        return stdout.getvalue()
+
+    def test_import_provider_file_valid(self):
+        output = self.import_provider(
+            self.provider.id,
+            file=os.path.join(STATIC_DIR, 'test.xml')
+        )
+        self.assertIn('5 created', output)
+        self.assertIn('rows/s', output)
+        self.assertEqual(self.provider.events.count(), 2)
+        self.assertEqual(Zone.objects.count(), 2)
+
+        output = self.import_provider(
+            self.provider.id,
+            file=os.path.join(STATIC_DIR, 'test.json')
+        )
+        self.assertIn('5 unchanged', output)
+
+    def test_import_provider_unknown_invalid(self):
+        with self.assertRaises(CommandError):
+            self.import_provider(self.provider.id + 1)
+
+    @skipUnless(connection.vendor == 'postgresql', "Requires Postgres")
+    def test_copy_resource_valid(self):
+        provider_resource = self.provider.provider_resource
+        data = build_resource_data(3, 2, 2)
+        provider_resource._data = [columns_from_records(data)]
+        report = provider_resource.copy_resource()
+        self.assertEqual(report['created'], 3 + 6 + 12)
+        event = Event.objects.get(provider_event_id=0)
+        self.assertEqual(event.capacity, 400)
+        self.assertEqual(event.min_price, Decimal('20.00'))
+
+        data.pop()
+        data[0]['title'] = 'Renamed'
+        provider_resource._data = [columns_from_records(data)]
+        report = provider_resource.copy_resource()
+        self.assertEqual(report['updated'], 1)
+        self.assertEqual(report['unchanged'], 1 + 4 + 8)
+        self.assertEqual(report['deactivated'], 1 + 2 + 4)
+
+        provider_resource._data = [columns_from_records(data)]
+        report = provider_resource.save_resource()
+        self.assertEqual(report['unchanged'], 2 + 4 + 8)
+
+    def tearDown(self):
+        Provider.objects.all().delete()
+        Event.objects.all().delete()
+
+
+def read_static_chunks(name, chunk_size=7):
+    """
+    Read a static file in small chunks to emulate a streamed download
+    """
+    path = os.path.join(STATIC_DIR, name)
+    with open(path, 'rb') as fl:
+        for chunk in iter(lambda: fl.read(chunk_size), b''):
+            yield chunk
+
+
+class ParsersTestCase(SimpleTestCase):
+    """
+    Tests for the streaming resource parsers
+    """
+    def test_iter_json_records_valid(self):
+        path = os.path.join(STATIC_DIR, 'test.json')
+        with open(path) as fl:
+            data = json.load(fl)
+        records = list(iter_json_records(read_static_chunks('test.json')))
+        self.assertEqual(records, data)
+
+    def test_iter_json_records_adapt_invalid_valid(self):
+        records = iter_json_records(read_static_chunks('adapt_invalid.json'))
+        self.assertEqual(next(records)['name'], 'Concert')
+        self.assertEqual(next(records)['title'], 'Theater')
+        self.assertIsNone(next(records, None))
+
+    def test_iter_json_records_incorrect_resource_invalid(self):
+        chunks = read_static_chunks('test_incorrect_res.json')
+        with self.assertRaises(ValueError):
+            list(iter_json_records(chunks))
+
+    def test_iter_json_records_truncated_invalid(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_records([b'[{"base_event_id": "291"}, {"ti']))
+
+    def test_iter_json_records_split_record_valid(self):
+        record = {
+            'title': 'Concert ]} "quoted" \\',
+            'event': [{'event_id': str(date)} for date in range(500)]
+        }
+        content = json.dumps([record, record]).encode('utf-8')
+        for size in (1, 7, 1024):
+            chunks = [
+                content[start:start + size]
+                for start in range(0, len(content), size)
+            ]
+            with mock.patch(
+                'event.parsers.JSON_DECODER.decode',
+                wraps=json.JSONDecoder().decode
+            ) as decode:
+                records = list(iter_json_records(chunks))
+            self.assertEqual(records, [record, record])
+            self.assertEqual(decode.call_count, 2)
+
+    def test_iter_json_records_split_scalar_valid(self):
+        self.assertEqual(list(iter_json_records([b'[12', b'34]'])), [1234])
+        self.assertEqual(
+            list(iter_json_records([b'[12', b' ,"3', b'4", true]'])),
+            [12, '34', True]
+        )
+
+    def test_iter_json_records_object_invalid(self):
+        with self.assertRaises(ValueError):
+            detect_resource_type(None, [b'{"title": "Concert"}'])
+
+    def test_iter_xml_records_valid(self):
+        records = list(iter_xml_records(read_static_chunks('test.xml')))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['@title'], 'Concert')
+        self.assertEqual(len(records[0]['event']), 2)
+        self.assertEqual(len(records[0]['event'][0]['zone']), 2)
+        self.assertEqual(records[0]['event'][0]['zone'][0]['@zone_id'], '40')
+        self.assertNotIn('zone', records[0]['event'][1])
+        self.assertNotIn('event', records[1])
+
+    def test_detect_resource_type_content_type_valid(self):
+        chunks = read_static_chunks('test.xml')
+        resource_type, detected_chunks = detect_resource_type(
+            'application/json; charset=utf-8',
+            chunks
+        )
+        self.assertEqual(resource_type, JSON)
+        self.assertIs(detected_chunks, chunks)
+
+    def test_detect_resource_type_first_byte_valid(self):
+        resource_type, chunks = detect_resource_type(
+            'text/plain',
+            read_static_chunks('test.xml', chunk_size=1)
+        )
+        self.assertEqual(resource_type, XML)
+        self.assertEqual(len(list(iter_xml_records(chunks))), 2)
+
+        resource_type, chunks = detect_resource_type(
+            None,
+            read_static_chunks('test.json', chunk_size=1)
+        )
+        self.assertEqual(resource_type, JSON)
+        self.assertEqual(len(list(iter_json_records(chunks))), 2)
+
+    def test_detect_resource_type_unknown_invalid(self):
+        with self.assertRaises(ValueError):
+            detect_resource_type(
+                None,
+                read_static_chunks('test_incorrect_res.json')
+            )
+
+
+class SchemasTestCase(SimpleTestCase):
+    """
+    Tests for the compiled schemas normalizing resource records
+    """
+    def normalize_static(self, name, parse, resource_type, schema=''):
+        normalize = compile_normalizer(schema, resource_type)
+        return normalize(parse(read_static_chunks(name)))
+
+    def test_compile_normalizer_default_json_valid(self):
+        batch = self.normalize_static('test.json', iter_json_records, JSON)
+        self.assertEqual(batch.events, {
+            'provider_event_id': [291, 322],
+            'title': ['Concert', 'Theater']
+        })
+        self.assertEqual(batch.dates['provider_date_id'], [291, 291])
+        self.assertEqual(batch.dates[PARENT], [0, 0])
+        self.assertEqual(
+            batch.dates['sale_start_date'][0],
+            timezone.make_aware(datetime(2014, 7, 1))
+        )
+        self.assertEqual(batch.zones, {
+            'provider_zone_id': [40, 38],
+            'name': ['Platea', 'test'],
+            'capacity': [243, 100],
+            'rest': [243, 100],
+            'price': [Decimal('20.00'), Decimal('0.00')],
+            'numbered': [True, False],
+            PARENT: [0, 0]
+        })
+        self.assertEqual(batch.errors, [])
+
+    def test_compile_normalizer_default_xml_valid(self):
+        self.assertEqual(
+            self.normalize_static('test.xml', iter_xml_records, XML),
+            self.normalize_static('test.json', iter_json_records, JSON)
+        )
+
+    def test_compile_normalizer_missing_value_invalid(self):
+        batch = self.normalize_static(
+            'adapt_invalid.json',
+            iter_json_records,
+            JSON
+        )
+        self.assertEqual(batch.events['provider_event_id'], [322])
+        self.assertEqual(batch.dates['provider_date_id'], [])
+        self.assertEqual(batch.zones['provider_zone_id'], [])
+        self.assertEqual(batch.errors, [{
+            'record': 0,
+            'level': 'event',
+            'field': 'title',
+            'error': "Missing value"
+        }])
+
+    def test_compile_normalizer_custom_valid(self):
+        schema = json.dumps({
+            'levels': ['show', 'session', 'area'],
+            'fields': {
+                'provider_event_id': 'show.id',
+                'title': 'show.info.name',
+                'active': {'path': 'show.enabled', 'default': True},
+                'provider_date_id': 'session.id',
+                'date': {'path': 'session.day', 'format': '%d/%m/%Y %H:%M'},
+                'sale_start_date': 'show.on_sale',
+                'sale_end_date': 'session.off_sale',
+                'provider_zone_id': 'area.id',
+                'name': 'area.name',
+                'capacity': 'area.seats',
+                'rest': {'path': 'area.free', 'default': 0},
+                'price': {'path': 'area.price', 'type': 'decimal'},
+                'numbered': 'area.numbered',
+            }
+        })
+        normalize = compile_normalizer(schema, JSON)
+        self.assertIs(compile_normalizer(schema, JSON), normalize)
+        batch = normalize([{
+            'id': '7',
+            'info': {'name': 'Circus'},
+            'on_sale': '2019-01-01T10:00:00+00:00',
+            'session': {
+                'id': 1,
+                'day': '05/02/2019 20:30',
+                'off_sale': '2019-02-05T20:00:00+00:00',
+                'area': [
+                    {
+                        'id': 3,
+                        'name': 'Ring',
+                        'seats': 10,
+                        'price': 9.5,
+                        'numbered': 1
+                    }
+                ]
+            }
+        }])
+        self.assertEqual(batch.errors, [])
+        self.assertEqual(batch.events['provider_event_id'], [7])
+        self.assertEqual(batch.events['title'], ['Circus'])
+        self.assertEqual(batch.events['active'], [True])
+        self.assertEqual(
+            batch.dates['date'],
+            [timezone.make_aware(datetime(2019, 2, 5, 20, 30))]
+        )
+        self.assertEqual(batch.dates['sale_start_date'][0].year, 2019)
+        self.assertEqual(batch.zones['rest'], [0])
+        self.assertEqual(batch.zones['price'], [Decimal('9.5')])
+        self.assertEqual(batch.zones['numbered'], [True])
+
+    def test_compile_normalizer_invalid_rows_valid(self):
+        normalize = compile_normalizer('', JSON)
+        records = [
+            {
+                'base_event_id': str(event),
+                'title': 'Event {}'.format(event),
+                'event': [
+                    {
+                        'event_id': str(date),
+                        'event_date': '2019-06-30T21:00:00',
+                        'sell_from': '2019-01-01T00:00:00',
+                        'sell_to': '2019-06-30T20:00:00',
+                        'zone': [
+                            {
+                                'zone_id': str(zone),
+                                'name': 'Zone',
+                                'capacity': '10',
+                                'max_price': '5.00',
+                                'numbered': 'false'
+                            }
+                            for zone in range(2)
+                        ]
+                    }
+                    for date in range(2)
+                ]
+            }
+            for event in range(3)
+        ]
+        del records[0]['title']
+        records[1]['event'][0]['sell_to'] = 'tomorrow'
+        records[2]['event'][1]['zone'][0]['max_price'] = 'free'
+        batch = normalize(records, 10)
+
+        self.assertEqual(batch.events['provider_event_id'], [1, 2])
+        self.assertEqual(batch.dates['provider_date_id'], [1, 0, 1])
+        self.assertEqual(batch.dates[PARENT], [0, 1, 1])
+        self.assertEqual(batch.zones['provider_zone_id'], [0, 1, 0, 1, 1])
+        self.assertEqual(batch.zones[PARENT], [0, 0, 1, 1, 2])
+        self.assertEqual(
+            [
+                (error['record'], error['level'], error['field'])
+                for error in batch.errors
+            ],
+            [
+                (10, 'event', 'title'),
+                (11, 'date', 'sale_end_date'),
+                (12, 'zone', 'price')
+            ]
+        )
+        self.assertEqual(batch.errors[0]['error'], "Missing value")
+        self.assertEqual(batch.errors[2]['error'], "Invalid value 'free'")
+
+    def test_compile_normalizer_null_value_invalid(self):
+        normalize = compile_normalizer('', JSON)
+        batch = normalize([
+            {'base_event_id': None, 'title': 'Concert'},
+            {'base_event_id': '1', 'title': None},
+            {'base_event_id': '2', 'title': 'Circus'},
+        ])
+
+        self.assertEqual(batch.events['provider_event_id'], [2])
+        self.assertEqual(batch.events['title'], ['Circus'])
+        self.assertEqual(
+            [
+                (error['record'], error['field'], error['error'])
+                for error in batch.errors
+            ],
+            [
+                (0, 'provider_event_id', "Missing value"),
+                (1, 'title', "Missing value")
+            ]
+        )
+
+    def test_compile_normalizer_schema_invalid(self):
+        for schema in (
+            {'levels': ['event'], 'fields': {}},
+            {'levels': ['a', 'b', 'c'], 'fields': {'other': 'a.x'}},
+            {'levels': ['a', 'b', 'c'], 'fields': {'title': 'a.title'}},
+        ):
+            with self.assertRaises(ValueError):
+                compile_normalizer(json.dumps(schema), JSON)
+
+
+class ProviderEventsTasksTestCase(TestCase):
+    """
+    Tests for the provider events ingest tasks
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(ProviderEventsTasksTestCase, cls).setUpClass()
+        cls.server = StubServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super(ProviderEventsTasksTestCase, cls).tearDownClass()
+
+    def test_get_provider_events_subtask_error_valid(self):
+        provider_resource = mommy.make(
+            'event.providerresource',
+            url=self.server.url('incorrect_url.json')
+        )
+        provider = mommy.make(
+            'event.provider',
+            provider_resource=provider_resource
+        )
+        summary = get_provider_events_subtask.apply(args=(provider.id,)).get()
+        self.assertEqual(summary['provider'], provider.id)
+        self.assertIsNotNone(summary['error'])
+        run = provider.sync_runs.get()
+        self.assertEqual(run.error, summary['error'])
+        self.assertEqual(run.created, 0)
+
+    def test_get_provider_events_task_valid(self):
+        providers = mommy.make('event.provider', _quantity=3)
+        with mock.patch('event.tasks.chord') as dispatch:
+            get_provider_events_task()
+        header = list(dispatch.call_args[0][0])
+        self.assertEqual(
+            [subtask.args for subtask in header],
+            [(provider.id,) for provider in providers]
+        )
+        callback = dispatch.return_value.call_args[0][0]
+        self.assertEqual(callback.task, 'summarize_provider_events_task')
+        errback = callback.options['link_error'][0]
+        self.assertEqual(errback['task'], 'summarize_provider_sync_runs_task')
+        self.assertEqual(
+            errback['args'][0],
+            [provider.id for provider in providers]
+        )
+
+    def test_summarize_provider_events_task_valid(self):
+        providers = [
+            {'created': 2, 'updated': 1, 'error': None, 'duration': 1},
+            {'created': 0, 'updated': 0, 'error': 'E', 'duration': 2},
+            {'created': 5, 'updated': 3, 'error': None, 'duration': 4}
+        ]
+        with mock.patch.object(warm_events_cache_task, 'delay') as warm:
+            with mock.patch('event.tasks.time.time', return_value=110):
+                result = summarize_provider_events_task(providers, 100)
+        warm.assert_called_once_with()
+        self.assertEqual(len(result['providers']), 3)
+        self.assertEqual(result['created'], 7)
+        self.assertEqual(result['updated'], 4)
+        self.assertEqual(result['errors'], 1)
+        self.assertEqual(result['duration'], 10)
+
+    def test_summarize_provider_sync_runs_task_valid(self):
+        synced, failed, killed = mommy.make('event.provider', _quantity=3)
+        started = timezone.now()
+        mommy.make(
+            'event.providersyncrun',
+            provider=synced,
+            started=started - timedelta(days=1),
+            created=9
+        )
+        mommy.make(
+            'event.providersyncrun',
+            provider=synced,
+            started=started,
+            created=2,
+            updated=1,
+            duration=3
+        )
+        mommy.make(
+            'event.providersyncrun',
+            provider=failed,
+            started=started,
+            error='E'
+        )
+        with mock.patch.object(warm_events_cache_task, 'delay') as warm:
+            result = summarize_provider_sync_runs_task(
+                'task',
+                [synced.id, failed.id, killed.id],
+                started.timestamp()
+            )
+        warm.assert_called_once_with()
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(
+            [summary['error'] for summary in result['providers']],
+            [None, 'E', "Killed by the time limit"]
+        )
+        self.assertEqual(result['errors'], 2)
+
+
+class ServicesTestCase(SimpleTestCase):
+    """
+    Tests for the ingest services
+    """
+    def test_iter_batches_valid(self):
+        batches = list(iter_batches(range(5), 2))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+    def test_spool_chunks_valid(self):
+        chunks = [b'[{"a": 1},', b' {"a": 2}]']
+        content_hash, replayed = spool_chunks(iter(chunks))
+        self.assertEqual(
+            content_hash,
+            hashlib.sha256(b''.join(chunks)).hexdigest()
+        )
+        self.assertEqual(b''.join(replayed), b''.join(chunks))
+
+    def test_telemetry_nested_stages_valid(self):
+        clock = [0]
+
+        def fetch():
+            for chunk in (b'ab', b'cde'):
+                clock[0] += 1
+                yield chunk
+
+        def parse(chunks):
+            for chunk in chunks:
+                clock[0] += 10
+                yield chunk.decode('utf-8')
+
+        telemetry = Telemetry()
+        records = telemetry.iter_stage(
+            parse(telemetry.iter_stage(fetch(), 'fetch', 'bytes', len)),
+            'parse',
+            'records'
+        )
+        with mock.patch('event.services.perf_counter', lambda: clock[0]):
+            with telemetry.stage('write'):
+                for _ in records:
+                    clock[0] += 100
+        self.assertEqual(telemetry.values, {
+            'fetch_time': 2,
+            'parse_time': 20,
+            'write_time': 200,
+            'bytes': 5,
+            'records': 2
+        })
+
+
+class ProviderResourceFetchTestCase(TestCase):
+    """
+    Tests for getting the ProviderResource from a provider server
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(ProviderResourceFetchTestCase, cls).setUpClass()
+        cls.server = StubServer()
+        cls.server.start()
+        cls.plain_server = StubServer(validators=False)
+        cls.plain_server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.plain_server.stop()
+        super(ProviderResourceFetchTestCase, cls).tearDownClass()
+
+    def setUp(self):
+        self.provider_resource = mommy.make(
+            'event.providerresource',
+            url=self.server.url('test.json')
+        )
+        mommy.make(
+            'event.provider',
+            provider_resource=self.provider_resource
+        )
+
+    def save_empty_resource(self):
+        self.provider_resource.stream_external_resource()
+        self.provider_resource._data = []
+        self.provider_resource.save_resource()
+        return ProviderResource.objects.get(id=self.provider_resource.id)
+
+    def test_get_external_resource_json_valid(self):
+        with open(os.path.join(STATIC_DIR, 'test.json')) as fl:
+            data = json.load(fl)
+        self.provider_resource.get_external_resource()
+        self.assertEqual(self.provider_resource._resource, data)
+        self.provider_resource.refresh_from_db()
+        self.assertEqual(
+            self.provider_resource.resource_type,
+            ProviderResource.JSON
+        )
+
+    def test_get_external_resource_xml_valid(self):
+        self.provider_resource.url = self.server.url('test.xml')
+        self.provider_resource.get_external_resource()
+        self.assertEqual(len(self.provider_resource._resource), 2)
+        self.provider_resource.refresh_from_db()
+        self.assertEqual(
+            self.provider_resource.resource_type,
+            ProviderResource.XML
+        )
+
+    def test_save_resource_json_valid(self):
+        report = self.provider_resource.save_resource()
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(Event.objects.count(), 2)
+        self.assertEqual(EventDate.objects.count(), 1)
+        self.assertEqual(
+            set(Zone.objects.values_list('name', flat=True)),
+            {'Platea', 'test'}
+        )
+
+    def test_get_external_events_sync_run_valid(self):
+        provider = self.provider_resource.provider
+        report = provider.get_external_events()
+        run = ProviderSyncRun.objects.get()
+        self.assertEqual(run.provider, provider)
+        self.assertEqual(run.created, report['created'])
+        self.assertEqual(run.records_parsed, 2)
+        with open(os.path.join(STATIC_DIR, 'test.json'), 'rb') as fl:
+            self.assertEqual(run.bytes_downloaded, len(fl.read()))
+        self.assertFalse(run.error)
+        self.assertGreater(run.write_time, 0)
+        self.assertLessEqual(
+            sum(getattr(run, stage + '_time') for stage in run.STAGES),
+            run.duration
+        )
+
+    def test_save_resource_xml_valid(self):
+        self.provider_resource.url = self.server.url('test.xml')
+        report = self.provider_resource.save_resource()
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(
+            EventDate.objects.get().capacity,
+            343
+        )
+
+    def test_get_external_resource_incorrect_url_invalid(self):
+        self.provider_resource.url = self.server.url('incorrect_url.json')
+        with self.assertRaises(ProviderURLException):
+            self.provider_resource.get_external_resource()
+
+    def test_get_external_resource_incorrect_resource_invalid(self):
+        self.provider_resource.url = self.server.url(
+            'test_incorrect_res.json'
+        )
+        with self.assertRaises(ValueError):
+            self.provider_resource.get_external_resource()
+
+    def test_get_external_resource_compressed_valid(self):
+        self.provider_resource.get_external_resource()
+        request = self.server.requests[-1]
+        self.assertIn('gzip', request.headers['Accept-Encoding'])
+
+    def test_stream_external_resource_not_modified_valid(self):
+        provider_resource = self.save_empty_resource()
+        self.assertTrue(provider_resource.etag)
+        provider_resource.stream_external_resource()
+        request = self.server.requests[-1]
+        self.assertEqual(
+            request.headers['If-None-Match'],
+            provider_resource.etag
+        )
+        self.assertTrue(provider_resource._unchanged)
+        self.assertEqual(
+            provider_resource.save_resource(),
+            {
+                'created': 0,
+                'updated': 0,
+                'unchanged': 0,
+                'deactivated': 0,
+                'invalid': 0
+            }
+        )
+
+    def test_stream_external_resource_same_content_valid(self):
+        self.provider_resource.url = self.plain_server.url('test.json')
+        self.provider_resource.save()
+        provider_resource = self.save_empty_resource()
+        self.assertFalse(provider_resource.etag)
+        self.assertTrue(provider_resource.content_hash)
+        provider_resource.stream_external_resource()
+        self.assertTrue(provider_resource._unchanged)
+
+    def tearDown(self):
+        Provider.objects.all().delete()
+
+
+@override_settings(
+    DATABASE_REPLICA='replica',
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+)
+class ReplicaRouterTestCase(TestCase):
+    """
+    Tests for the routing of the API reads to the replica database
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        Event.objects.using('replica').create(
+            title='Replicated',
+            provider_event_id=1
+        )
+
+    def test_read_from_replica_valid(self):
+        with read_from_replica():
+            self.assertEqual(Event.objects.get().title, 'Replicated')
+        self.assertFalse(Event.objects.exists())
+
+    def test_write_to_primary_valid(self):
+        with read_from_replica():
+            Event.objects.create(title='Written', provider_event_id=2)
+        self.assertEqual(Event.objects.get().title, 'Written')
+        self.assertEqual(Event.objects.using('replica').count(), 1)
+
+    def test_stick_to_primary_valid(self):
+        stick_to_primary()
+        with read_from_replica():
+            self.assertFalse(Event.objects.exists())
+
+    @override_settings(DATABASE_REPLICA=None)
+    def test_read_without_replica_valid(self):
+        with read_from_replica():
+            self.assertFalse(Event.objects.exists())
+
+    def tearDown(self):
+        cache.clear()
+
+
+@skipUnless(
+    settings.MIGRATION_MODULES.get('event', True) is not None,
+    "Requires the event migrations"
+)
+class NaturalKeysMigrationTestCase(TransactionTestCase):
+    """
+    Tests for the removal of the duplicated natural keys by the
+    0012_natural_keys migration
+    """
+    migrate_from = [('event', '0011_providersyncrun')]
+    migrate_to = [('event', '0012_natural_keys')]
+
+    def migrate(self, targets):
+        """
+        Migrate the event app to the given targets
+
+        :param targets: migrations to migrate to
+        :type targets: list
+        :return: models of the state after the migration
+        :type return: django.apps.registry.Apps
+        """
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        apps = self.migrate(self.migrate_from)
+        ProviderResource = apps.get_model('event', 'ProviderResource')
+        Provider = apps.get_model('event', 'Provider')
+        Event = apps.get_model('event', 'Event')
+        EventDate = apps.get_model('event', 'EventDate')
+        Zone = apps.get_model('event', 'Zone')
+
+        provider = Provider.objects.create(
+            name='Provider',
+            provider_resource=ProviderResource.objects.create(
+                url='http://www.provider.com'
+            )
+        )
+        kept, duplicate = [
+            Event.objects.create(
+                title='Event',
+                provider=provider,
+                provider_event_id=1
+            ) for _ in range(2)
+        ]
+        now = timezone.now()
+        for event, date_ids in ((kept, (1,)), (duplicate, (1, 2))):
+            for date_id in date_ids:
+                date = EventDate.objects.create(
+                    event=event,
+                    date=now,
+                    sale_start_date=now,
+                    sale_end_date=now,
+                    provider_date_id=date_id
+                )
+                for zone_id in (1, 2):
+                    Zone.objects.create(
+                        date=date,
+                        name='Zone',
+                        capacity=10,
+                        rest=5,
+                        provider_zone_id=zone_id
+                    )
+        self.kept_id = kept.id
+
+    def test_remove_duplicates_children_valid(self):
+        apps = self.migrate(self.migrate_to)
+        Event = apps.get_model('event', 'Event')
+        EventDate = apps.get_model('event', 'EventDate')
+        Zone = apps.get_model('event', 'Zone')
+
+        self.assertEqual(
+            list(Event.objects.values_list('id', flat=True)),
+            [self.kept_id]
+        )
+        self.assertEqual(
+            sorted(EventDate.objects.filter(
+                event_id=self.kept_id
+            ).values_list('provider_date_id', flat=True)),
+            [1, 2]
+        )
+        self.assertEqual(EventDate.objects.count(), 2)
+        self.assertEqual(
+            sorted(Zone.objects.values_list(
+                'date__provider_date_id',
+                'provider_zone_id'
+            )),
+            [(1, 1), (1, 2), (2, 1), (2, 2)]
+        )
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
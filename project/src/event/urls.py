@@ -1,13 +1,29 @@
-from django.conf import settings
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
-from .views import EventListView
+from .views import (
+    EventListView, MetricsView, ProviderAvailabilityView,
+    ProviderSyncRunListView
+)
 
 urlpatterns = [
     path(
         '',
-        cache_page(settings.CACHE_DEFAULT_TIME)(EventListView.as_view()),
+        EventListView.as_view(),
         name='events'
     ),
+    path(
+        'sync-runs/',
+        ProviderSyncRunListView.as_view(),
+        name='provider-sync-runs'
+    ),
+    path(
+        'metrics/',
+        MetricsView.as_view(),
+        name='metrics'
+    ),
+    path(
+        'providers/<uuid:uuid>/availability/',
+        ProviderAvailabilityView.as_view(),
+        name='provider-availability'
+    ),
 ]
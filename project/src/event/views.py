@@ -1,8 +1,30 @@
-from rest_framework.generics import ListAPIView
+from rest_framework import status
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Event, EventDate
-from .serializers import EventSerializer
-from .services import check_date
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .cache import (
+    get_cached_events, get_events_cache_key, get_events_stamp,
+    set_cached_events
+)
+from .filters import EventFilter, ProviderSyncRunFilter
+from .metrics import CONTENT_TYPE, render_metrics
+from .middleware import profile_stage
+from .models import Event, EventDate, Provider, ProviderSyncRun, Zone
+from .pagination import KeysetPagination
+from .permissions import HasMetricsToken, HasProviderSignature
+from .renderers import get_row_encoder, iter_page_json
+from .routers import read_from_replica
+from .serializers import (
+    AvailabilityDeltaSerializer, EventSerializer, ProviderSyncRunSerializer
+)
+from .services import check_expand
 
 
 class EventListView(ListAPIView):
@@ -10,25 +32,211 @@ class EventListView(ListAPIView):
     GET Events
     """
     serializer_class = EventSerializer
+    pagination_class = KeysetPagination
+    filterset_class = EventFilter
     permission_classes = ()
+    page_events = ()
 
     def dispatch(self, request, *args, **kwargs):
-        self.start_date = check_date(request.GET.get('start_date'))
-        self.end_date = check_date(request.GET.get('end_date'))
-        return super(EventListView, self).dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            return super(EventListView, self).dispatch(
+                request,
+                *args,
+                **kwargs
+            )
 
-    def get_queryset(self):
-        event_dates = EventDate.objects.filter(active=True)
+    def initial(self, request, *args, **kwargs):
+        super(EventListView, self).initial(request, *args, **kwargs)
+        self.expand = check_expand(request.query_params.get('expand'))
+        if request.query_params.get('q', '').strip():
+            self.keyset_ordering = ('-rank', 'id')
 
-        if self.start_date:
-            event_dates = event_dates.filter(
-                sale_start_date__date__gte=self.start_date
-            )
+    def get(self, request, *args, **kwargs):
+        fast_rendering = self.is_fast_rendering()
+        key = get_events_cache_key(
+            request.query_params,
+            data=not fast_rendering
+        )
+        with profile_stage(request, 'cache') as values:
+            data = get_cached_events(key, request.query_params)
+            values['cache_hits' if data is not None else 'cache_misses'] += 1
+        if data is not None:
+            if fast_rendering:
+                return HttpResponse(
+                    data,
+                    content_type=request.accepted_renderer.media_type
+                )
+            return Response(data)
+
+        stamp = get_events_stamp()
+        response = super(EventListView, self).get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            if response.streaming:
+                response.streaming_content = self.cache_content(
+                    key,
+                    stamp,
+                    response.streaming_content
+                )
+            else:
+                with profile_stage(request, 'cache'):
+                    set_cached_events(
+                        key,
+                        stamp,
+                        self.page_events,
+                        response.data
+                    )
+        return response
 
-        if self.end_date:
-            event_dates = event_dates.filter(
-                sale_end_date__date__lte=self.end_date
+    def list(self, request, *args, **kwargs):
+        """
+        List the events, the flat JSON list is encoded straight from the
+        rows of the page and streamed
+        """
+        if not self.is_fast_rendering():
+            with profile_stage(request, 'serialize'):
+                return super(EventListView, self).list(
+                    request,
+                    *args,
+                    **kwargs
+                )
+
+        serializer = self.get_serializer()
+        fields = dict.fromkeys(
+            [
+                field.lstrip('-')
+                for field in self.paginator.get_ordering(self)
+            ] +
+            [field.source for field in serializer.fields.values()]
+        )
+        rows = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).values_list(
+                *fields,
+                named=True
             )
+        )
+        return StreamingHttpResponse(
+            iter_page_json(
+                rows,
+                get_row_encoder(serializer),
+                self.paginator.get_next_link(),
+                self.paginator.get_previous_link()
+            ),
+            content_type=request.accepted_renderer.media_type
+        )
+
+    def is_fast_rendering(self):
+        """
+        Get if the list can be encoded without the serializer, it has to
+        be a flat list rendered in compact JSON
+
+        :return: Whether the fast rendering applies
+        :type return: bool
+        """
+        return (
+            settings.EVENTS_FAST_RENDERING and
+            not self.expand and
+            type(self.request.accepted_renderer) is JSONRenderer and
+            'indent' not in self.request.accepted_media_type
+        )
+
+    def cache_content(self, key, stamp, chunks):
+        """
+        Cache the content of a streamed list once it is complete
+
+        :param key: Cache key of the list
+        :type key: str
+        :param stamp: Stamp of the events lists before the query
+        :type stamp: int
+        :param chunks: Bytes chunks of the content
+        :type chunks: iterable
+        :return: Bytes chunks of the content
+        :type return: generator
+        """
+        content = []
+        for chunk in chunks:
+            content.append(chunk)
+            yield chunk
+        set_cached_events(key, stamp, self.page_events, b''.join(content))
+
+    def paginate_queryset(self, queryset):
+        page = super(EventListView, self).paginate_queryset(queryset)
+        self.page_events = [item.id for item in page]
+        return page
+
+    def get_queryset(self):
+        return Event.objects.filter(active=True)
+
+    def filter_queryset(self, queryset):
+        queryset = super(EventListView, self).filter_queryset(queryset)
+        if 'dates' in self.expand:
+            queryset = queryset.prefetch_related(self.get_dates_prefetch())
+        return queryset
+
+    def get_dates_prefetch(self):
+        """
+        Get the prefetch of the active dates in the requested window and,
+        if they are expanded, of their active zones
+
+        :return: Prefetch of the expanded dates
+        :type return: django.db.models.Prefetch
+        """
+        filterset = self.filterset_class(self.request.query_params)
+        filterset.is_valid()
+        dates = filterset.filter_dates(EventDate.objects.filter(active=True))
+        if 'zones' in self.expand:
+            dates = dates.prefetch_related(Prefetch(
+                'zones',
+                queryset=Zone.objects.filter(active=True),
+                to_attr='active_zones'
+            ))
+        return Prefetch('dates', queryset=dates, to_attr='expanded_dates')
+
+    def get_serializer_context(self):
+        context = super(EventListView, self).get_serializer_context()
+        context['expand'] = self.expand
+        return context
+
+
+class ProviderSyncRunListView(ListAPIView):
+    """
+    GET Provider sync runs, the last ones first
+    """
+    serializer_class = ProviderSyncRunSerializer
+    pagination_class = KeysetPagination
+    filterset_class = ProviderSyncRunFilter
+    permission_classes = (IsAdminUser,)
+    keyset_ordering = ('-started', '-id')
+
+    def get_queryset(self):
+        return ProviderSyncRun.objects.select_related('provider')
+
+
+class MetricsView(APIView):
+    """
+    GET Metrics of the provider syncs in the Prometheus text format
+    """
+    permission_classes = (HasMetricsToken,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+class ProviderAvailabilityView(GenericAPIView):
+    """
+    POST Availability deltas of the zones of a provider, signed with the
+    webhook secret of the provider
+    """
+    serializer_class = AvailabilityDeltaSerializer
+    permission_classes = (HasProviderSignature,)
+    lookup_field = 'uuid'
+
+    def get_queryset(self):
+        return Provider.objects.select_related('provider_resource')
 
-        event_dates_ids = [event_date.id for event_date in event_dates]
-        return Event.objects.filter(id__in=event_dates_ids, active=True)
+    def post(self, request, *args, **kwargs):
+        provider = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(provider.provider_resource.apply_deltas(
+            serializer.validated_data['zones']
+        ))
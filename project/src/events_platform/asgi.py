@@ -0,0 +1,18 @@
+"""
+ASGI config for project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``, served with uvicorn workers of gunicorn:
+
+    gunicorn events_platform.asgi:application \
+        -k uvicorn.workers.UvicornWorker
+
+For more information on this file, see
+https://channels.readthedocs.io/en/2.x/deploying.html
+"""
+
+import django
+from channels.routing import get_default_application
+
+django.setup()
+application = get_default_application()
@@ -0,0 +1,6 @@
+from channels.http import AsgiHandler
+from channels.routing import ProtocolTypeRouter
+
+application = ProtocolTypeRouter({
+    'http': AsgiHandler,
+})
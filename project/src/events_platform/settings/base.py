@@ -9,7 +9,7 @@ SECRET_KEY = os.environ['SECRET_KEY']
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': "postgres",
+        'NAME': os.getenv('DATABASE_NAME', "postgres"),
         'USER': os.environ['DATABASE_USER'],
         'PASSWORD': os.environ['DATABASE_PASSWORD'],
         'HOST': os.environ['DATABASE_HOST'],
@@ -17,12 +17,27 @@ DATABASES = {
     }
 }
 
+# Read only replica of the default database for the public API, the
+# writes and the ingest always go to the default one
+if os.getenv('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST=os.environ['DATABASE_REPLICA_HOST']
+    )
+
+DATABASE_ROUTERS = ['event.routers.ReplicaRouter']
+DATABASE_REPLICA = 'replica' if 'replica' in DATABASES else None
+DATABASE_REPLICA_STICKY_TIME = int(
+    os.getenv('DATABASE_REPLICA_STICKY_TIME', 30)
+)
+
 INSTALLED_APPS = [
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -36,13 +51,13 @@ PROJECT_APPS = [
 INSTALLED_APPS += THIRD_PARTY_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
+    'event.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.middleware.common.CommonMiddleware',
 ]
 
 TEMPLATES = [
@@ -63,6 +78,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'events_platform.wsgi.application'
 
+ASGI_APPLICATION = 'events_platform.routing.application'
+
 LANGUAGE_CODE = 'es-ES'
 
 TIME_ZONE = 'UTC'
@@ -109,4 +126,60 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'events_platform/static'),
 ]
 
-CACHE_DEFAULT_TIME = 60 * 60 * 24 * 7
\ No newline at end of file
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'memcached:11211'),
+    }
+}
+
+CACHE_DEFAULT_TIME = 60 * 60 * 24 * 7
+
+EVENTS_CACHE_WARM_RANGES = (
+    (None, None),
+    (0, 7),
+    (0, 30),
+)
+
+EVENTS_PAGE_SIZE = 100
+EVENTS_MAX_PAGE_SIZE = 1000
+EVENTS_FAST_RENDERING = True
+EVENTS_STREAM_CHUNK_ROWS = 100
+EVENTS_SEARCH_CONFIG = 'simple'
+
+INGEST_BATCH_SIZE = 1000
+INGEST_CHUNK_SIZE = 64 * 1024
+INGEST_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+INGEST_CONNECT_TIMEOUT = 5
+INGEST_READ_TIMEOUT = 60
+INGEST_RETRIES = 3
+INGEST_RETRY_BACKOFF = 1
+INGEST_POOL_HOSTS = 10
+INGEST_MAX_CONNECTIONS_PER_HOST = 4
+INGEST_QUEUE = 'ingest'
+INGEST_CONCURRENCY = int(os.getenv('INGEST_CONCURRENCY', 4))
+INGEST_PROVIDER_SOFT_TIME_LIMIT = 60 * 30
+INGEST_PROVIDER_TIME_LIMIT = INGEST_PROVIDER_SOFT_TIME_LIMIT + 60
+INGEST_SYNC_RUNS_KEEP_DAYS = 90
+INGEST_DELTA_MAX_ZONES = 1000
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '').lower() == 'true'
+PROFILING_SLOW_REQUEST_TIME = float(
+    os.getenv('PROFILING_SLOW_REQUEST_TIME', 1)
+)
+PROFILING_SLOW_QUERIES = 10
+PROFILING_SAMPLE_RATE = int(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/profiles')
+
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
+CELERY_RESULT_BACKEND = os.getenv(
+    'CELERY_RESULT_BACKEND',
+    'redis://redis:6379/0'
+)
+# The provider ingests run in their own worker of INGEST_CONCURRENCY
+# processes
+CELERY_TASK_ROUTES = {
+    'get_provider_events_subtask': {'queue': INGEST_QUEUE},
+}
@@ -1,3 +1,5 @@
+import os
+
 from .base import *
 
 DEBUG = True
@@ -6,8 +8,22 @@ ALLOWED_HOSTS = [LOCAL_IP]
 
 ROOT_URLCONF = 'events_platform.urls.urls'
 
+# Second database standing for the replica, the tests of the routing
+# enable it with DATABASE_REPLICA
+DATABASES['replica'] = dict(
+    DATABASES['default'],
+    TEST={'NAME': 'test_replica'}
+)
+DATABASE_REPLICA = None
+
+# No cache by default, the server benchmarks set one shared by the
+# processes of the servers
 CACHES = {
     'default': {
-            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-        }
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.dummy.DummyCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
 }